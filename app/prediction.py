@@ -0,0 +1,136 @@
+"""
+Batch prediction service: the model and team stats stay resident, requests are micro-batched.
+
+POST /predict with a batch of fixtures:
+  {"fixtures": [{"home": "Arsenal", "away": "Chelsea"}, ["Lyon", "Nice"], ...]}
+returns one probability triple per fixture, in request order:
+  {"snapshot": 3, "predictions": [{"home": "Arsenal", "away": "Chelsea", "known": true,
+                                   "home_win": 0.52, "draw": 0.27, "away_win": 0.21}, ...]}
+"known" is false when either team has no stats (the fallback means are used for it).
+
+Concurrent requests are coalesced by src/batch_predictor.MicroBatcher into one predict_proba call.
+The model and team_stats artifacts are watched (src/artifact_watcher.py) and hot-reloaded. Names
+are resolved to DB team ids independently of any snapshot; "snapshot" and "known" describe the
+snapshot that scored the request's batch, which may be newer than the one current when the request
+arrived.
+
+The Flask app is thread-safe: run it with the development server (threaded) or any threaded WSGI
+server, e.g. `gunicorn --threads 64 app.prediction:app`.
+
+Usage:
+  python -m app.prediction --port 5002
+  curl -XPOST localhost:5002/predict -H 'Content-Type: application/json' \
+       -d '{"fixtures": [["Arsenal", "Chelsea"]]}'
+"""
+from flask import Flask, Response, request
+import argparse
+import json
+import os
+import threading
+
+from src.artifact_watcher import ArtifactWatcher
+from src.batch_predictor import ResidentPredictor, MicroBatcher, OUTCOMES, MODEL_ARTIFACT, TEAM_STATS_ARTIFACT
+
+HOST = os.environ.get("PREDICT_HOST", "127.0.0.1")
+PORT = int(os.environ.get("PREDICT_PORT", "5002"))
+PREDICT_TIMEOUT = float(os.environ.get("PREDICT_TIMEOUT", "10"))
+MAX_FIXTURES = int(os.environ.get("PREDICT_MAX_FIXTURES", "10000"))
+
+app = Flask(__name__)
+
+predictor = ResidentPredictor(MODEL_ARTIFACT, TEAM_STATS_ARTIFACT, load=False)
+batcher = None
+_watcher = None
+_start_lock = threading.Lock()
+
+
+def start():
+    """
+    Load the artifacts, start the batcher and the artifact watcher (idempotent).
+    """
+    global batcher, _watcher
+    with _start_lock:
+        if batcher is None:
+            predictor.reload()
+            batcher = MicroBatcher(predictor.predict_batch)
+            _watcher = ArtifactWatcher([MODEL_ARTIFACT, TEAM_STATS_ARTIFACT],
+                                       on_change=lambda changed: predictor.reload_if_changed()).start()
+            print(f"[prediction] watching artifacts ({_watcher.mode})")
+    return batcher
+
+
+def _json(status, payload):
+    return Response(json.dumps(payload), status=status, mimetype="application/json")
+
+
+def parse_fixtures(body):
+    """
+    (home names, away names) from {"fixtures": [...]} with [home, away] pairs or {"home", "away"} objects.
+    """
+    fixtures = body.get("fixtures") if isinstance(body, dict) else None
+    if not isinstance(fixtures, list):
+        raise ValueError('expected {"fixtures": [...]}')
+    if len(fixtures) > MAX_FIXTURES:
+        raise ValueError(f"at most {MAX_FIXTURES} fixtures per request")
+    home, away = [], []
+    for f in fixtures:
+        if isinstance(f, dict):
+            h, a = f.get("home"), f.get("away")
+        elif isinstance(f, (list, tuple)) and len(f) == 2:
+            h, a = f
+        else:
+            h = a = None
+        if not isinstance(h, str) or not isinstance(a, str):
+            raise ValueError(f"invalid fixture {f!r}")
+        home.append(h)
+        away.append(a)
+    return home, away
+
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    start()
+    try:
+        home, away = parse_fixtures(request.get_json(force=True, silent=True))
+    except ValueError as e:
+        return _json(400, {"error": str(e)})
+    if predictor.snapshot is None:
+        return _json(503, {"error": "no model loaded"})
+    home_ids, away_ids = predictor.resolve(home, away)
+    try:
+        proba, snapshot = batcher.predict(home_ids, away_ids, timeout=PREDICT_TIMEOUT)
+    except Exception as e:
+        return _json(503, {"error": f"prediction failed: {e}"})
+    known = predictor.known(home_ids, away_ids, snapshot).tolist()
+    rows = proba.tolist()
+    predictions = [
+        {"home": h, "away": a, "known": k, **dict(zip(OUTCOMES, p))}
+        for h, a, k, p in zip(home, away, known, rows)
+    ]
+    return _json(200, {"snapshot": snapshot.version, "predictions": predictions})
+
+
+@app.route("/health")
+def health():
+    snapshot = predictor.snapshot
+    payload = {
+        "status": "ok" if snapshot else "no model",
+        "snapshot": snapshot.version if snapshot else None,
+        "loaded_at": snapshot.loaded_at if snapshot else None,
+        "teams": len(snapshot.team_ids) if snapshot else 0,
+        "batcher": batcher.stats() if batcher else None,
+    }
+    return _json(200, payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch prediction service")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    start()
+    app.run(host=args.host, port=args.port, debug=False, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
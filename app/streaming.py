@@ -2,46 +2,313 @@
 Small SSE (Server-Sent Events) endpoint that emits a message when artifacts (team_stats or model)
 are updated on disk. This is a convenient way to get near-real-time notifications in a UI.
 
+One shared watcher (inotify when available, a single poller otherwise) publishes change events to an
+in-process broadcast hub; every connected client is fed from the hub, so clients cost neither a
+thread nor stat() calls. By default the stream is served by a small asyncio server that holds
+thousands of idle connections cheaply; the Flask app is kept for development (--flask).
+
+team_stats changes are not sent as pings: the server diffs the new artifact against the previous
+one and streams only the changed teams as a "team_stats" event with a monotonically increasing
+version (see src/team_stats_publisher.py). GET /team_stats/snapshot returns the full dict with its
+version, for initial sync or after a version gap.
+
+GET /metrics serves Prometheus text: this process's metrics plus the snapshots other processes
+(live_updater) export to METRICS_DIR, see src/metrics.py. The asyncio server runs these plain routes
+in a worker thread, so serializing a large snapshot never stalls the open streams; a route that
+raises answers 500.
+
+Events carry an id: reconnecting clients (EventSource does this automatically) send Last-Event-ID
+and get the missed events replayed from a bounded ring buffer, or a "reset" event if they are too
+far behind. A comment heartbeat is sent every SSE_HEARTBEAT_SECONDS.
+
+Flask is only imported when the Flask app is used (--flask, or `app` from a WSGI server), and the
+team_stats reader (numpy) when the watcher first loads the artifact.
+
 Usage:
-  python app/streaming.py
+  python -m app.streaming            # asyncio server
+  python -m app.streaming --flask    # Flask development server
 
 Connect from browser / client:
   const es = new EventSource("http://127.0.0.1:5001/updates");
   es.onmessage = (e) => console.log("update:", e.data);
+  es.addEventListener("team_stats", (e) => applyDelta(JSON.parse(e.data)));
 """
-from flask import Flask, Response
+import argparse
+import asyncio
 import time
 import os
 import json
+import threading
+from http import HTTPStatus
+
+from src.broadcast_hub import hub, Event, format_sse, format_comment
+from src.artifact_watcher import ArtifactWatcher
+from src.team_stats_publisher import TeamStatsPublisher
+from src.metrics import render_prometheus
+
+TEAM_STATS_ARTIFACT = os.environ.get("TEAM_STATS_ARTIFACT", "artifacts/team_stats.ftstats")
+ARTIFACTS = [TEAM_STATS_ARTIFACT, "artifacts/model.joblib"]
+HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+RETRY_MS = int(os.environ.get("SSE_RETRY_MS", "3000"))
+HOST = os.environ.get("SSE_HOST", "127.0.0.1")
+PORT = int(os.environ.get("SSE_PORT", "5001"))
+BACKLOG = int(os.environ.get("SSE_BACKLOG", "2048"))
+
+_watcher = None
+_watcher_lock = threading.Lock()
+_flask_app = None
+_app_lock = threading.Lock()
+
+
+def load_team_stats(path):
+    from src.team_stats_store import load_team_stats
+
+    return load_team_stats(path)
+
+
+team_stats_publisher = TeamStatsPublisher(TEAM_STATS_ARTIFACT, hub, loader=load_team_stats)
+
+# handlers for plain (non-streaming) GET endpoints, shared by the Flask app and the asyncio server:
+# path -> function returning (status, content_type, body)
+PLAIN_ROUTES = {}
+
+
+def plain_route(path):
+    def register(fn):
+        PLAIN_ROUTES[path] = fn
+        return fn
+    return register
+
+
+def publish_changes(changed):
+    if TEAM_STATS_ARTIFACT in changed:
+        team_stats_publisher.refresh()
+    others = [p for p in changed if p != TEAM_STATS_ARTIFACT]
+    if others:
+        hub.publish({"changed": others, "timestamp": time.time()})
+
+
+def start_watcher():
+    """
+    Start the process-wide artifact watcher (idempotent).
+    """
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            if os.path.exists(TEAM_STATS_ARTIFACT):
+                team_stats_publisher.refresh()
+            _watcher = ArtifactWatcher(ARTIFACTS, on_change=publish_changes).start()
+            print(f"[streaming] watching {len(ARTIFACTS)} artifacts ({_watcher.mode})")
+    return _watcher
+
+
+def parse_last_event_id(value):
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def initial_messages(last_event_id):
+    """
+    Messages sent right after a client connects: retry hint, connected ping and, for a resuming
+    client, the missed events (or a reset event when they are no longer buffered).
+    Returns (text, last id sent).
+    """
+    parts = [f"retry: {RETRY_MS}\n\n", f"data: {json.dumps({'status': 'connected'})}\n\n"]
+    sent = hub.last_id
+    if last_event_id is not None:
+        events, complete = hub.events_after(last_event_id)
+        if complete:
+            parts.extend(format_sse(e) for e in events)
+            sent = events[-1].id if events else last_event_id
+        else:
+            parts.append(format_sse(Event(hub.last_id, "reset", {"reason": "events no longer buffered"})))
+    return "".join(parts), sent
+
+
+@plain_route("/health")
+def health():
+    payload = {
+        "status": "ok",
+        "subscribers": hub.subscriber_count(),
+        "last_event_id": hub.last_id,
+        "watcher": _watcher.mode if _watcher else None,
+    }
+    return 200, "application/json", json.dumps(payload)
+
+
+@plain_route("/metrics")
+def metrics():
+    return 200, "text/plain; version=0.0.4", render_prometheus()
+
+
+@plain_route("/team_stats/snapshot")
+def team_stats_snapshot():
+    start_watcher()
+    return 200, "application/json", json.dumps(team_stats_publisher.snapshot())
+
+
+def create_app():
+    """
+    The Flask app serving the plain routes and /updates (created once, on first use).
+    """
+    global _flask_app
+    with _app_lock:
+        if _flask_app is None:
+            _flask_app = _build_flask_app()
+    return _flask_app
+
+
+def _build_flask_app():
+    from flask import Flask, Response, request
+
+    flask_app = Flask(__name__)
+
+    def plain_view(fn):
+        def view():
+            status, content_type, body = fn()
+            return Response(body, status=status, mimetype=content_type)
+        return view
+
+    for path, fn in PLAIN_ROUTES.items():
+        flask_app.add_url_rule(path, endpoint=fn.__name__, view_func=plain_view(fn))
+
+    def updates():
+        start_watcher()
+        last_event_id = parse_last_event_id(
+            request.headers.get("Last-Event-ID") or request.args.get("lastEventId"))
+
+        def stream():
+            text, sent = initial_messages(last_event_id)
+            yield text
+            while True:
+                hub.wait_after(sent, timeout=HEARTBEAT_SECONDS)
+                events, complete = hub.events_after(sent)
+                if not complete:
+                    yield format_sse(Event(hub.last_id, "reset", {"reason": "events no longer buffered"}))
+                    sent = hub.last_id
+                    continue
+                if not events:
+                    yield format_comment("heartbeat")
+                    continue
+                for e in events:
+                    yield format_sse(e)
+                sent = events[-1].id
+        return Response(stream(), mimetype="text/event-stream")
+
+    flask_app.add_url_rule("/updates", endpoint="updates", view_func=updates)
+    return flask_app
+
+
+def __getattr__(name):
+    # `app` stays importable for WSGI servers (gunicorn app.streaming:app) without importing Flask eagerly
+    if name == "app":
+        return create_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# ---- asyncio server ---------------------------------------------------------------
+
+async def _read_request(reader):
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode("latin-1")
+        if line in ("\r\n", "\n", ""):
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    method, _, rest = request_line.partition(" ")
+    target = rest.rpartition(" ")[0] if " " in rest else rest
+    path, _, query = target.partition("?")
+    params = dict(p.partition("=")[::2] for p in query.split("&") if p)
+    return method, path, params, headers
+
+
+def _head(status, content_type, extra=""):
+    reason = HTTPStatus(status).phrase
+    return (
+        f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+        f"Access-Control-Allow-Origin: *\r\n{extra}"
+    )
+
+
+async def _stream_updates(writer, last_event_id):
+    q = hub.subscribe()
+    try:
+        writer.write((
+            _head(200, "text/event-stream", "Cache-Control: no-cache\r\nConnection: keep-alive\r\n") + "\r\n"
+        ).encode())
+        text, sent = initial_messages(last_event_id)
+        writer.write(text.encode())
+        await writer.drain()
+        while not q.overflowed:
+            try:
+                event = await asyncio.wait_for(q.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                writer.write(format_comment("heartbeat").encode())
+            else:
+                if event.id <= sent:
+                    continue
+                writer.write(format_sse(event).encode())
+                sent = event.id
+            await writer.drain()
+    finally:
+        hub.unsubscribe(q)
 
-ARTIFACTS = ["artifacts/team_stats.joblib", "artifacts/model.joblib"]
 
-app = Flask(__name__)
+async def handle_client(reader, writer):
+    try:
+        method, path, params, headers = await asyncio.wait_for(_read_request(reader), timeout=10)
+        if method != "GET":
+            body = b"method not allowed"
+            writer.write((_head(405, "text/plain", f"Content-Length: {len(body)}\r\n") + "\r\n").encode() + body)
+        elif path == "/updates":
+            last_event_id = parse_last_event_id(headers.get("last-event-id") or params.get("lastEventId"))
+            await _stream_updates(writer, last_event_id)
+        else:
+            handler = PLAIN_ROUTES.get(path)
+            if handler is None:
+                status, content_type, body = 404, "text/plain", "not found"
+            else:
+                # off the event loop: the handler may serialize every team or read many files
+                try:
+                    status, content_type, body = await asyncio.to_thread(handler)
+                except Exception as e:
+                    print(f"[streaming] {path} failed:", repr(e))
+                    status, content_type, body = 500, "text/plain", "internal server error"
+            body = body.encode() if isinstance(body, str) else body
+            writer.write((
+                _head(status, content_type, f"Content-Length: {len(body)}\r\nConnection: close\r\n") + "\r\n"
+            ).encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
 
 
-def file_mtimes():
-    return {p: os.path.getmtime(p) if os.path.exists(p) else 0 for p in ARTIFACTS}
+async def serve_async(host=HOST, port=PORT):
+    start_watcher()
+    server = await asyncio.start_server(handle_client, host, port, backlog=BACKLOG)
+    print(f"[streaming] serving SSE on http://{host}:{port}/updates")
+    async with server:
+        await server.serve_forever()
 
 
-@app.route("/updates")
-def updates():
-    def stream():
-        last = file_mtimes()
-        # initial ping
-        yield f"data: {json.dumps({'status': 'connected'})}\n\n"
-        while True:
-            time.sleep(2)
-            current = file_mtimes()
-            changed = []
-            for p in ARTIFACTS:
-                if current[p] != last[p]:
-                    changed.append(p)
-            if changed:
-                payload = {"changed": changed, "timestamp": time.time()}
-                yield f"data: {json.dumps(payload)}\n\n"
-                last = current
-    return Response(stream(), mimetype="text/event-stream")
+def main():
+    parser = argparse.ArgumentParser(description="SSE artifact update stream")
+    parser.add_argument("--flask", action="store_true", help="use the Flask development server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    if args.flask:
+        start_watcher()
+        create_app().run(host=args.host, port=args.port, debug=False, threaded=True)
+    else:
+        asyncio.run(serve_async(args.host, args.port))
 
 
 if __name__ == "__main__":
-    app.run(port=5001, debug=False)
+    main()
@@ -1,49 +1,203 @@
 """
-Generate a small synthetic football matches dataset for testing.
+Generate a synthetic football matches dataset, from a small test file to tens of millions of rows.
 
-This version keeps the CSV output for compatibility, and also optionally imports into the DB
-if you want the DB to be immediately populated. To import automatically set IMPORT_TO_DB=1 env var.
+Teams are split evenly into leagues; each league plays SEASON_DAYS days per season starting on
+August 1st. Matches are spread randomly over the season days; each match draws a league (weighted by
+its number of teams) and two distinct teams from it, or with probability --cross-league a home team
+and an opponent from another league (cup ties). Scores are Poisson with per-team attack / defence
+strengths and a home advantage. The latest --unfinished fraction of fixtures (by date) has no score,
+like fixtures not played yet.
+
+Rows are generated with NumPy one chunk of consecutive days at a time (about --chunk-size rows) and
+streamed to the output, so memory stays bounded whatever the number of matches. The same parameters,
+seed and chunk size always give the same rows. (date, home, away) is unique, as in the matches table.
+
+Outputs:
+  csv      data/matches.csv layout (date, home_team, away_team, home_score, away_score, league)
+  parquet  same columns, one row group per chunk (needs pyarrow)
+  db       straight into the DB through the bulk import path, one transaction per chunk
+
+IMPORT_TO_DB=1 still imports the CSV into the DB after writing it.
+
+Usage:
+  python -m data.generate_synthetic                                  # 600 matches, 20 teams
+  python -m data.generate_synthetic --teams 20000 --leagues 400 --seasons 10 --matches 10000000 \\
+      --cross-league 0.02 --unfinished 0.001 --format parquet --out data/matches_10m.parquet
+  python -m data.generate_synthetic --matches 1000000 --teams 2000 --leagues 40 --format db
 """
-import random
-import pandas as pd
-from datetime import datetime, timedelta
 import os
+import time
+import argparse
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+SEASON_DAYS = 300
+CHUNK_SIZE = int(os.environ.get("SYNTHETIC_CHUNK_SIZE", "500000"))
+CSV_PATH = "data/matches.csv"
+COLUMNS = ["date", "home_team", "away_team", "home_score", "away_score", "league"]
+HOME_ADVANTAGE = 0.25
+BASE_RATE = 0.1
+
+
+def season_days(seasons, start_year):
+    """
+    datetime64[D] array of every match day, season after season.
+    """
+    starts = np.array([np.datetime64(date(start_year + s, 8, 1), "D") for s in range(seasons)])
+    return (starts[:, None] + np.arange(SEASON_DAYS)).ravel()
+
+
+def generate_chunks(teams=20, leagues=1, seasons=2, matches=600, cross_league=0.0, unfinished=0.0,
+                    seed=0, start_year=2023, chunk_size=CHUNK_SIZE):
+    """
+    Yield DataFrames of COLUMNS in date order, about chunk_size rows each (whole days per chunk).
+    Unfinished fixtures have <NA> scores.
+    """
+    if teams < 2:
+        raise ValueError("need at least 2 teams")
+    leagues = max(1, min(leagues, teams // 2))
+    rng = np.random.default_rng(seed)
+
+    team_names = np.array([f"Team {i}" for i in range(1, teams + 1)], dtype=object)
+    league_names = np.array([f"League {j}" for j in range(1, leagues + 1)], dtype=object)
+    # contiguous blocks of teams per league
+    league_start = np.arange(leagues) * teams // leagues
+    league_size = np.diff(np.append(league_start, teams))
+    league_of_team = np.repeat(np.arange(leagues), league_size)
+    attack = rng.normal(0.0, 0.25, teams)
+    defence = rng.normal(0.0, 0.25, teams)
+
+    days = season_days(seasons, start_year)
+    per_day = rng.multinomial(matches, np.full(len(days), 1.0 / len(days)))
+    finished_rows = int(round(matches * (1.0 - unfinished)))
+    league_p = league_size / teams
+
+    offset = 0
+    day = 0
+    while day < len(days):
+        # whole days until the chunk holds about chunk_size rows
+        end = int(np.searchsorted(np.cumsum(per_day[day:]), chunk_size, side="left")) + day + 1
+        end = min(max(end, day + 1), len(days))
+        counts = per_day[day:end]
+        n = int(counts.sum())
+        if n:
+            dates = np.repeat(days[day:end], counts)
+            league = rng.choice(leagues, size=n, p=league_p)
+            size = league_size[league]
+            home_off = rng.integers(0, size)
+            home = league_start[league] + home_off
+            away = league_start[league] + (home_off + rng.integers(1, size)) % size
+            if leagues > 1 and cross_league > 0:
+                cross = rng.random(n) < cross_league
+                other = (league[cross] + rng.integers(1, leagues, cross.sum())) % leagues
+                away[cross] = league_start[other] + rng.integers(0, league_size[other])
 
-random.seed(0)
-
-TEAMS = [f"Team {i}" for i in range(1, 21)]
-LEAGUE = "Premier"
-
-start_date = datetime(2023, 1, 1)
-matches = []
-date = start_date
-# create random fixtures over ~600 matches
-for _ in range(600):
-    home, away = random.sample(TEAMS, 2)
-    # bias a bit towards low scores
-    home_goals = max(0, int(random.gauss(1.3, 1.2)))
-    away_goals = max(0, int(random.gauss(1.0, 1.1)))
-    matches.append({
-        "date": date.strftime("%Y-%m-%d"),
-        "home_team": home,
-        "away_team": away,
-        "home_score": home_goals,
-        "away_score": away_goals,
-        "league": LEAGUE
-    })
-    date += timedelta(days=random.randint(1, 3))
-
-df = pd.DataFrame(matches)
-os.makedirs("data", exist_ok=True)
-csv_path = "data/matches.csv"
-df.to_csv(csv_path, index=False)
-print("Wrote data/matches.csv with", len(df), "rows")
-
-# optional: import into DB immediately
-if os.environ.get("IMPORT_TO_DB") == "1":
+            home_goals = rng.poisson(np.exp(BASE_RATE + HOME_ADVANTAGE + attack[home] - defence[away]))
+            away_goals = rng.poisson(np.exp(BASE_RATE + attack[away] - defence[home]))
+            chunk = pd.DataFrame({
+                "date": dates,
+                "home_team": team_names[home],
+                "away_team": team_names[away],
+                "home_score": pd.array(home_goals, dtype="Int64"),
+                "away_score": pd.array(away_goals, dtype="Int64"),
+                "league": league_names[league_of_team[home]],
+            })
+            rows = np.arange(offset, offset + n)
+            chunk.loc[rows >= finished_rows, ["home_score", "away_score"]] = pd.NA
+            # chunks hold whole days, so this removes every duplicate (date, home, away)
+            chunk = chunk[~chunk.duplicated(["date", "home_team", "away_team"])].reset_index(drop=True)
+            offset += n
+            yield chunk
+        day = end
+
+
+def write_csv(chunks, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rows = 0
+    with open(path, "w", newline="") as f:
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(f, index=False, header=(i == 0), date_format="%Y-%m-%d")
+            rows += len(chunk)
+    return rows
+
+
+def write_parquet(chunks, path):
     try:
-        from src.import_csv_to_db import import_csv
-        inserted = import_csv(csv_path)
-        print(f"Imported {inserted} rows into DB")
-    except Exception as e:
-        print("Failed to import to DB:", e)
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("parquet output needs pyarrow (pip install pyarrow)")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def write_db(chunks):
+    from src.db import init_db, WriterSession
+    from src.import_csv_to_db import import_frame
+
+    init_db()
+    rows = 0
+    with WriterSession() as session:
+        for chunk in chunks:
+            frame = chunk.assign(date=pd.to_datetime(chunk["date"]).dt.date)
+            rows += import_frame(session, frame)
+            session.commit()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic football matches")
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--leagues", type=int, default=1)
+    parser.add_argument("--seasons", type=int, default=2)
+    parser.add_argument("--matches", type=int, default=600)
+    parser.add_argument("--cross-league", type=float, default=0.0, help="fraction of cross-league fixtures")
+    parser.add_argument("--unfinished", type=float, default=0.0, help="fraction of fixtures without a score")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-year", type=int, default=2023)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--format", choices=["csv", "parquet", "db"], default="csv")
+    parser.add_argument("--out", default=None, help="output path (csv / parquet)")
+    args = parser.parse_args()
+
+    chunks = generate_chunks(
+        teams=args.teams, leagues=args.leagues, seasons=args.seasons, matches=args.matches,
+        cross_league=args.cross_league, unfinished=args.unfinished, seed=args.seed,
+        start_year=args.start_year, chunk_size=args.chunk_size,
+    )
+    started = time.perf_counter()
+    if args.format == "db":
+        rows = write_db(chunks)
+        print(f"Inserted {rows} rows into DB in {time.perf_counter() - started:.1f}s")
+        return
+    path = args.out or (CSV_PATH if args.format == "csv" else "data/matches.parquet")
+    rows = (write_csv if args.format == "csv" else write_parquet)(chunks, path)
+    print(f"Wrote {path} with {rows} rows in {time.perf_counter() - started:.1f}s")
+
+    # optional: import into DB immediately
+    if args.format == "csv" and os.environ.get("IMPORT_TO_DB") == "1":
+        try:
+            from src.import_csv_to_db import import_csv
+            inserted = import_csv(path)
+            print(f"Imported {inserted} rows into DB")
+        except Exception as e:
+            print("Failed to import to DB:", e)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+"""
+Cold-season archive: finished seasons move out of the matches table into Parquet partitions.
+
+Matches dated before the archive cutoff never change again, yet every load_matches_from_db re-reads
+them from the DB. `archive` moves them to ARCHIVE_DIR, one directory per league and season
+(league=<id>/season=<year>/part-<generation>.parquet, seasons start on the first of
+SEASON_START_MONTH), each file sorted by (date, id), with the loader's typed columns (ids, date32
+date, scores, league id). Every archive run is one generation: it writes new part files for the rows
+dated before its cutoff, then deletes those rows from the DB and stores the manifest (cutoff,
+partitions with row counts and checksums, snapshot) in the meta table in the same transaction, so
+readers either see the old DB rows or the new partitions. Files of an interrupted run are simply
+rewritten by the next one.
+
+Invariants that keep results identical with or without the archive:
+ - the cutoff is lowered to the earliest unfinished fixture, so every archived match is final and
+   insert_matches_db never has to update one; import_frame and insert_matches_db drop incoming rows
+   dated before the cutoff (they are already archived or would sort into the cold range)
+ - the largest match id stays in the DB, so SQLite never reuses an archived id and the id
+   high-water marks of the feature cache, feature state and team index stay valid
+ - the loader reads cold rows (date < cutoff) before hot ones (date >= cutoff), with the same dtypes
+
+The end-of-archive snapshot holds each team's last ARCHIVE_SNAPSHOT_MATCHES archived matches and
+the global score sums. src/feature_state.py starts from it instead of reading the partitions; windows
+longer than the snapshot read the partitions. The change journal (src/change_journal.py) does not
+record archiving: archived rows are moved, not changed.
+
+Archiving needs pyarrow, and so does reading an archived DB: current_archive checks for it as soon
+as it finds a manifest, so the loader fails before reading anything instead of halfway through.
+
+Usage:
+  python -m src.archive archive --keep-seasons 2     # or --cutoff 2024-08-01; verifies before deleting
+  python -m src.archive verify                       # partitions, snapshot and DB against the manifest
+  python -m src.archive status
+"""
+import os
+import json
+import zlib
+import argparse
+import datetime
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+ARCHIVE_DIR = os.environ.get("ARCHIVE_DIR", "data/archive")
+ARCHIVE_SNAPSHOT_MATCHES = int(os.environ.get("ARCHIVE_SNAPSHOT_MATCHES", "10"))
+SEASON_START_MONTH = int(os.environ.get("SEASON_START_MONTH", "8"))
+MANIFEST_KEY = "archive_manifest"
+FORMAT_VERSION = 1
+
+COLUMNS = ["id", "date", "home_team_id", "away_team_id", "home_score", "away_score", "league_id"]
+INT_COLUMNS = [c for c in COLUMNS if c != "date"]
+# dtype the loader gives dates parsed from SQLite's ISO strings
+DATE_DTYPE = pd.to_datetime(pd.Series(["1970-01-01"]), format="%Y-%m-%d").dtype
+SNAPSHOT_ARRAYS = ("keys", "match_ids", "scored", "conceded")
+
+_UNSET = object()
+_override = _UNSET
+_cache = {}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("the cold-season archive needs pyarrow (pip install pyarrow, see requirements.txt); "
+                          "it is required to archive and to read a DB with archived seasons") from None
+    return pyarrow, pyarrow.parquet
+
+
+def season_of(dates):
+    """
+    Season (year it starts in) of each date.
+    """
+    d = pd.DatetimeIndex(dates)
+    return np.asarray(d.year - (d.month < SEASON_START_MONTH), dtype=np.int64)
+
+
+def season_start(season):
+    return datetime.date(int(season), SEASON_START_MONTH, 1)
+
+
+def _checksum(frame):
+    crc = 0
+    for col in INT_COLUMNS:
+        crc = zlib.crc32(np.ascontiguousarray(frame[col].to_numpy(dtype=np.int64)).tobytes(), crc)
+    days = frame["date"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    return zlib.crc32(np.ascontiguousarray(days).tobytes(), crc)
+
+
+def _write_partition(path, frame):
+    from src.artifact_io import atomic_write
+
+    pa, pq = _require_pyarrow()
+    arrays = {col: pa.array(frame[col].to_numpy(dtype=np.int64), pa.int64()) for col in INT_COLUMNS}
+    arrays["date"] = pa.array(frame["date"].to_numpy().astype("datetime64[D]"), pa.date32())
+    table = pa.table({col: arrays[col] for col in COLUMNS})
+    atomic_write(path, lambda tmp: pq.write_table(table, tmp))
+
+
+def _read_partition(path):
+    _, pq = _require_pyarrow()
+    table = pq.read_table(path, columns=COLUMNS)
+    frame = pd.DataFrame({col: table.column(col).to_numpy() for col in INT_COLUMNS})
+    frame.insert(1, "date", table.column("date").to_numpy().astype("datetime64[D]").astype(DATE_DTYPE))
+    return frame
+
+
+def _last_per_team(keys, match_ids, scored, conceded, window):
+    """
+    Keep the last `window` entries of each team from entries sorted by (key, match id).
+    """
+    teams = keys >> 32
+    if not len(teams):
+        return keys, match_ids, scored, conceded
+    # position of each entry counted from its team's last entry
+    ends = np.flatnonzero(np.append(teams[1:] != teams[:-1], True))
+    from_end = np.repeat(ends, np.diff(np.append(-1, ends))) - np.arange(len(teams))
+    keep = from_end < window
+    return keys[keep], match_ids[keep], scored[keep], conceded[keep]
+
+
+class Archive:
+    """
+    Read side of one archive generation, built from the manifest stored in the meta table.
+    """
+
+    def __init__(self, manifest):
+        self.manifest = manifest
+        self.generation = manifest["generation"]
+        self.cutoff = datetime.date.fromisoformat(manifest["cutoff"])
+        self.directory = manifest["directory"]
+        self.partitions = manifest["partitions"]
+        self.rows = manifest["rows"]
+        self.max_id = manifest["max_id"]
+        self.sum_scores = manifest["sum_scores"]
+        self._snapshot = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def seasons(self, date_from=None, date_to=None, league_ids=None):
+        """
+        [(season, [partition, ...])] that may hold rows matching the filters, oldest season first.
+        """
+        lo = season_of([date_from])[0] if date_from is not None else None
+        hi = season_of([date_to])[0] if date_to is not None else None
+        wanted = None if league_ids is None else {int(i) for i in league_ids}
+        by_season = {}
+        for part in self.partitions:
+            if (lo is not None and part["season"] < lo) or (hi is not None and part["season"] > hi):
+                continue
+            if wanted is not None and part["league_id"] not in wanted:
+                continue
+            by_season.setdefault(part["season"], []).append(part)
+        return sorted(by_season.items())
+
+    def _season_frame(self, parts, date_from, date_to, after_id):
+        frames = [_read_partition(self.path(p["path"])) for p in parts]
+        frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        keep = np.ones(len(frame), dtype=bool)
+        if date_from is not None:
+            keep &= (frame["date"] >= pd.Timestamp(date_from)).to_numpy()
+        if date_to is not None:
+            keep &= (frame["date"] <= pd.Timestamp(date_to)).to_numpy()
+        if after_id is not None:
+            keep &= (frame["id"] > after_id).to_numpy()
+        if not keep.all():
+            frame = frame[keep]
+        if len(frames) > 1:
+            frame = frame.sort_values(["date", "id"], kind="mergesort")
+        return frame.reset_index(drop=True)
+
+    def iter_frames(self, chunk_size, date_from=None, date_to=None, league_ids=None, after_id=None):
+        """
+        Archived rows matching the filters ordered by (date, id), in chunks of at most chunk_size
+        rows; one season's partitions are read at a time.
+        """
+        for _, parts in self.seasons(date_from, date_to, league_ids):
+            frame = self._season_frame(parts, date_from, date_to, after_id)
+            for start in range(0, len(frame), chunk_size):
+                yield frame.iloc[start:start + chunk_size].reset_index(drop=True)
+
+    def tail_frames(self, n, chunk_size, date_from=None, date_to=None, league_ids=None, after_id=None):
+        """
+        The n most recent archived rows matching the filters, like iter_frames; seasons are read
+        newest first until n rows are found.
+        """
+        frames = []
+        for _, parts in reversed(self.seasons(date_from, date_to, league_ids)):
+            frame = self._season_frame(parts, date_from, date_to, after_id)
+            frames.append(frame.iloc[max(0, len(frame) - n):])
+            n -= len(frames[-1])
+            if n <= 0:
+                break
+        if not frames:
+            return
+        frame = pd.concat(frames[::-1], ignore_index=True)
+        for start in range(0, len(frame), chunk_size):
+            yield frame.iloc[start:start + chunk_size].reset_index(drop=True)
+
+    def snapshot(self):
+        """
+        {keys, match_ids, scored, conceded} of each team's last snapshot_matches archived matches,
+        sorted like src/team_index.py entries (team << 32 | day, match id).
+        """
+        if self._snapshot is None:
+            with np.load(self.path(self.manifest["snapshot"])) as data:
+                self._snapshot = {name: data[name] for name in SNAPSHOT_ARRAYS}
+        return self._snapshot
+
+    def team_entries(self, last_n, teams=None):
+        """
+        (team id, date ordinal, match id, scored, conceded) of the last last_n archived matches of
+        each team (of the given team ids only, if any), sorted by (team, date, match id). Served from
+        the snapshot when its window is large enough, otherwise from the partitions.
+        """
+        if last_n <= self.manifest["snapshot_matches"]:
+            entries = self.snapshot()
+            keys, match_ids, scored, conceded = (entries[name] for name in SNAPSHOT_ARRAYS)
+        else:
+            from src.team_index import _long_entries
+
+            frames = list(self.iter_frames(1 << 62))
+            frame = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+            keys, match_ids, scored, conceded = _long_entries(frame)
+        keys, match_ids, scored, conceded = _last_per_team(keys, match_ids, scored, conceded, last_n)
+        team = keys >> 32
+        if teams is not None:
+            keep = np.isin(team, np.asarray(list(teams), dtype=np.int64))
+            keys, team, match_ids, scored, conceded = keys[keep], team[keep], match_ids[keep], scored[keep], conceded[keep]
+        days = (keys & 0xFFFFFFFF) - (1 << 31)
+        ordinals = days + datetime.date(1970, 1, 1).toordinal()
+        return list(zip(team.tolist(), ordinals.tolist(), match_ids.tolist(), scored.tolist(), conceded.tolist()))
+
+
+def current_archive(session=None):
+    """
+    The Archive of the DB (None if nothing was archived), honouring use_archive().
+    """
+    if _override is not _UNSET:
+        return _override
+    from src.db import ReaderSession, get_meta
+
+    if session is None:
+        with ReaderSession() as own:
+            raw = get_meta(own, MANIFEST_KEY)
+    else:
+        raw = get_meta(session, MANIFEST_KEY)
+    if raw is None:
+        return None
+    archive = _cache.get(raw)
+    if archive is None:
+        _require_pyarrow()
+        manifest = json.loads(raw)
+        if manifest.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported archive manifest version {manifest.get('version')!r}")
+        _cache.clear()
+        archive = _cache[raw] = Archive(manifest)
+    return archive
+
+
+@contextmanager
+def use_archive(archive):
+    """
+    Make the loader and feature state read through archive (None: the DB alone) in this block.
+    """
+    global _override
+    previous, _override = _override, archive
+    try:
+        yield archive
+    finally:
+        _override = previous
+
+
+def archive_cutoff(session):
+    archive = current_archive(session)
+    return None if archive is None else archive.cutoff
+
+
+def drop_archived(session, frame):
+    """
+    Rows of a matches frame dated on or after the archive cutoff (all of them without an archive).
+    """
+    cutoff = archive_cutoff(session)
+    if cutoff is None or frame.empty:
+        return frame
+    return frame[(pd.to_datetime(frame["date"]) >= pd.Timestamp(cutoff)).to_numpy()]
+
+
+# ---- archiving ---------------------------------------------------------------------------------
+
+
+def _effective_cutoff(session, cutoff):
+    from sqlalchemy import select, func, or_
+    from src.models import Match
+
+    t = Match.__table__
+    unfinished = session.execute(
+        select(func.min(t.c.date)).where(or_(t.c.home_score.is_(None), t.c.away_score.is_(None)))
+    ).scalar()
+    if unfinished is not None and unfinished < cutoff:
+        print(f"[archive] unfinished fixture on {unfinished}, archiving before that instead of {cutoff}")
+        cutoff = unfinished
+    return cutoff
+
+
+def _cutoff_for_seasons(session, keep_seasons):
+    from sqlalchemy import select, func
+    from src.models import Match
+
+    latest = session.execute(select(func.max(Match.__table__.c.date))).scalar()
+    if latest is None:
+        raise ValueError("the matches table is empty")
+    return season_start(season_of([latest])[0] - keep_seasons + 1)
+
+
+def _write_season(directory, generation, season, frame, partitions):
+    for league_id, part in frame.groupby("league_id", sort=True):
+        league = "none" if league_id < 0 else int(league_id)
+        name = os.path.join(f"league={league}", f"season={int(season)}", f"part-{generation:04d}.parquet")
+        part = part.sort_values(["date", "id"], kind="mergesort").reset_index(drop=True)
+        _write_partition(os.path.join(directory, name), part)
+        partitions.append({
+            "path": name, "league_id": int(league_id), "season": int(season), "generation": generation,
+            "rows": len(part), "min_date": str(part["date"].min().date()), "max_date": str(part["date"].max().date()),
+            "max_id": int(part["id"].max()), "checksum": _checksum(part),
+        })
+
+
+def _write_snapshot(path, entries):
+    from src.artifact_io import atomic_write
+
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            np.savez(f, **entries)
+
+    atomic_write(path, write)
+
+
+def archive_matches(cutoff=None, keep_seasons=None, directory=ARCHIVE_DIR, verify=True,
+                    snapshot_matches=ARCHIVE_SNAPSHOT_MATCHES, chunk_size=None):
+    """
+    Move every match dated before cutoff (or before the last keep_seasons seasons) to the archive.
+    verify=True checks, before anything is deleted, that the loader, the features and the feature
+    state are identical through the new archive. Returns the new Archive, or the current one when
+    there is nothing to archive.
+    """
+    from sqlalchemy import select, func, delete, case
+    from src.db import init_db, ReaderSession, WriterSession, set_meta
+    from src.models import Match
+    from src.data_loader import _iter_db, _matches_query, LOAD_CHUNK_SIZE
+    from src.team_index import _long_entries
+
+    _require_pyarrow()
+    init_db()
+    t = Match.__table__
+    with ReaderSession() as session:
+        previous = current_archive(session)
+        if cutoff is None:
+            if keep_seasons is None:
+                raise ValueError("pass a cutoff date or a number of seasons to keep")
+            cutoff = _cutoff_for_seasons(session, keep_seasons)
+        cutoff = _effective_cutoff(session, pd.Timestamp(cutoff).date())
+        if previous is not None and cutoff <= previous.cutoff:
+            print(f"[archive] nothing to archive before {cutoff} (archived before {previous.cutoff})")
+            return previous
+        cold = t.c.date < cutoff
+        rows, cold_max_id, hot_max_id = session.execute(select(
+            func.count(case((cold, t.c.id))), func.max(case((cold, t.c.id))), func.max(case((~cold, t.c.id))),
+        )).one()
+    if not rows:
+        print(f"[archive] no matches before {cutoff}")
+        return previous
+    if hot_max_id is None or cold_max_id > hot_max_id:
+        raise ValueError(
+            f"the newest match id ({cold_max_id}) is dated before {cutoff}: archiving it would let the DB "
+            "reuse archived ids; choose an earlier cutoff"
+        )
+
+    generation = previous.generation + 1 if previous is not None else 1
+    directory = previous.directory if previous is not None else os.path.abspath(directory)
+    partitions = list(previous.partitions) if previous is not None else []
+    if previous is not None:
+        entries = dict(previous.snapshot())
+        snapshot_matches = previous.manifest["snapshot_matches"]
+    else:
+        entries = {name: np.zeros(0, dtype=np.int64) for name in SNAPSHOT_ARRAYS}
+    sum_scores = previous.sum_scores if previous is not None else 0
+
+    # rows are read in (date, id) order, so each season's rows arrive together
+    season, buffered = None, []
+
+    def flush():
+        if buffered:
+            frame = pd.concat(buffered, ignore_index=True)
+            _write_season(directory, generation, season, frame, partitions)
+            buffered.clear()
+
+    q = _matches_query(date_to=cutoff - datetime.timedelta(days=1))
+    for chunk in _iter_db(q, chunk_size or LOAD_CHUNK_SIZE):
+        sum_scores += int(chunk["home_score"].sum() + chunk["away_score"].sum())
+        new = _long_entries(chunk)
+        merged = [np.concatenate([entries[name], values]) for name, values in zip(SNAPSHOT_ARRAYS, new)]
+        order = np.lexsort((merged[1], merged[0]))
+        entries = dict(zip(SNAPSHOT_ARRAYS, _last_per_team(*(m[order] for m in merged), snapshot_matches)))
+        seasons = season_of(chunk["date"])
+        for s in np.unique(seasons):
+            if s != season:
+                flush()
+                season = s
+            buffered.append(chunk[seasons == s])
+    flush()
+
+    snapshot_name = f"snapshot-{generation:04d}.npz"
+    _write_snapshot(os.path.join(directory, snapshot_name), entries)
+    archive = Archive({
+        "version": FORMAT_VERSION, "generation": generation, "cutoff": cutoff.isoformat(),
+        "directory": directory, "partitions": partitions, "snapshot": snapshot_name,
+        "snapshot_matches": snapshot_matches, "rows": (previous.rows if previous is not None else 0) + rows,
+        "max_id": max(cold_max_id, previous.max_id if previous is not None else 0), "sum_scores": sum_scores,
+        "created_at": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+    })
+    if verify:
+        compare_views(previous, archive)
+
+    with WriterSession() as session:
+        deleted = session.execute(delete(t).where(t.c.date < cutoff)).rowcount
+        if deleted != rows:
+            session.rollback()
+            raise RuntimeError(f"expected to delete {rows} archived rows, found {deleted}; nothing was changed")
+        set_meta(session, MANIFEST_KEY, json.dumps(archive.manifest))
+        session.commit()
+    print(f"[archive] generation {generation}: moved {rows} matches before {cutoff} to {directory} "
+          f"({len(partitions)} partitions, {archive.rows} archived matches)")
+    return archive
+
+
+def compare_views(before, after, last_n=5):
+    """
+    Raise AssertionError unless the loaded matches, their features, team_stats and the feature
+    state are identical through archive `before` and archive `after` (None: the DB alone).
+    """
+    from src.data_loader import load_matches_from_db
+    from src.features import compute_recent_stats
+    from src.feature_state import FeatureState
+    from src.db import ReaderSession
+
+    results = []
+    for archive in (before, after):
+        with use_archive(archive):
+            df = load_matches_from_db()
+            features, team_stats = compute_recent_stats(df, last_n=last_n)
+            state = FeatureState(last_n=last_n)
+            with ReaderSession() as session:
+                state.bootstrap(session)
+            results.append((df, features, team_stats, state.team_stats(), state.global_means(), state.last_id))
+    (df0, f0, s0, st0, m0, id0), (df1, f1, s1, st1, m1, id1) = results
+    pd.testing.assert_frame_equal(df0, df1)
+    pd.testing.assert_frame_equal(f0, f1)
+    assert s0 == s1, "team_stats differ"
+    assert (st0, m0, id0) == (st1, m1, id1), "feature state differs"
+    print(f"[archive] verified {len(df1)} matches: loader, features, team_stats and feature state identical")
+
+
+def verify_archive():
+    """
+    Check the archive against its manifest: partition row counts and checksums, the snapshot
+    rebuilt from the partitions, and no DB row dated before the cutoff. Returns a list of problems.
+    """
+    from sqlalchemy import select, func
+    from src.db import ReaderSession
+    from src.models import Match
+    from src.team_index import _long_entries
+
+    archive = current_archive()
+    if archive is None:
+        return []
+    problems = []
+    rows = 0
+    sum_scores = 0
+    frames = []
+    for part in archive.partitions:
+        path = archive.path(part["path"])
+        if not os.path.exists(path):
+            problems.append(f"missing partition {part['path']}")
+            continue
+        frame = _read_partition(path)
+        rows += len(frame)
+        sum_scores += int(frame["home_score"].sum() + frame["away_score"].sum())
+        if len(frame) != part["rows"] or _checksum(frame) != part["checksum"]:
+            problems.append(f"partition {part['path']} does not match its manifest entry")
+        if len(frame) and pd.Timestamp(frame["date"].max()).date() >= archive.cutoff:
+            problems.append(f"partition {part['path']} has rows on or after the cutoff")
+        frames.append(frame)
+    if rows != archive.rows or sum_scores != archive.sum_scores:
+        problems.append(f"partitions hold {rows} rows / score sum {sum_scores}, "
+                        f"manifest says {archive.rows} / {archive.sum_scores}")
+    if frames:
+        frame = pd.concat(frames, ignore_index=True).sort_values(["date", "id"], kind="mergesort")
+        if frame["id"].duplicated().any():
+            problems.append("duplicate match ids across partitions")
+        expected = _last_per_team(*_long_entries(frame), archive.manifest["snapshot_matches"])
+        snapshot = archive.snapshot()
+        if any(not np.array_equal(snapshot[name], values) for name, values in zip(SNAPSHOT_ARRAYS, expected)):
+            problems.append("snapshot does not match the partitions")
+    t = Match.__table__
+    with ReaderSession() as session:
+        stray, hot_max_id = session.execute(select(
+            func.count().filter(t.c.date < archive.cutoff), func.max(t.c.id),
+        )).one()
+    if stray:
+        problems.append(f"{stray} DB rows are dated before the cutoff {archive.cutoff}")
+    if hot_max_id is not None and hot_max_id < archive.max_id:
+        problems.append(f"archived match id {archive.max_id} is above the DB's largest id {hot_max_id}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-season archive of finished matches")
+    parser.add_argument("command", choices=["archive", "verify", "status"])
+    parser.add_argument("--cutoff", default=None, help="archive matches dated before this day (YYYY-MM-DD)")
+    parser.add_argument("--keep-seasons", type=int, default=None, help="archive all but the last N seasons")
+    parser.add_argument("--dir", default=ARCHIVE_DIR, help="archive directory (first archive only)")
+    parser.add_argument("--skip-verify", action="store_true", help="do not compare results before deleting")
+    args = parser.parse_args()
+
+    if args.command == "archive":
+        archive_matches(cutoff=args.cutoff, keep_seasons=args.keep_seasons, directory=args.dir,
+                        verify=not args.skip_verify)
+    elif args.command == "verify":
+        problems = verify_archive()
+        for problem in problems:
+            print("[archive] PROBLEM:", problem)
+        if problems:
+            raise SystemExit(1)
+        print("[archive] archive consistent with its manifest and the DB")
+    else:
+        archive = current_archive()
+        if archive is None:
+            print("[archive] nothing archived")
+            return
+        seasons = sorted({p["season"] for p in archive.partitions})
+        print(f"[archive] generation {archive.generation}: {archive.rows} matches before {archive.cutoff} "
+              f"in {len(archive.partitions)} partitions, seasons {seasons[0]}-{seasons[-1]}, {archive.directory}")
+
+
+if __name__ == "__main__":
+    main()
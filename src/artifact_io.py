@@ -0,0 +1,43 @@
+"""
+Helpers to publish artifacts atomically: write to a temporary file in the same directory, fsync,
+then rename over the target. Readers see either the old or the new file, never a partial one, and
+processes that still have the old file open (or mmapped) keep reading the old inode.
+"""
+import os
+import tempfile
+
+
+def atomic_write(path, write):
+    """
+    Call write(tmp_path) and atomically move the result to path.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        write(tmp)
+        with open(tmp, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def atomic_write_bytes(path, payload):
+    """
+    Atomically replace path with the bytes payload.
+    """
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(payload)
+
+    atomic_write(path, write)
+
+
+def atomic_joblib_dump(obj, path):
+    import joblib
+
+    atomic_write(path, lambda tmp: joblib.dump(obj, tmp))
@@ -0,0 +1,92 @@
+"""
+One shared watcher for artifact files (team_stats, model).
+
+Uses inotify on the artifact directories when the optional inotify_simple package is available
+(Linux), otherwise a single thread polls the files' mtimes. Either way there is exactly one watcher
+per process, whatever the number of connected clients; it calls on_change(changed_paths) once per
+burst of writes.
+
+Usage:
+  watcher = ArtifactWatcher(["artifacts/team_stats.joblib"], on_change=print)
+  watcher.start()
+"""
+import os
+import time
+import threading
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # optional dependency
+    INotify = None
+
+POLL_INTERVAL = float(os.environ.get("ARTIFACT_POLL_SECONDS", "2"))
+# writes landing within this window are reported as one change
+DEBOUNCE_SECONDS = 0.05
+
+
+def file_mtimes(paths):
+    return {p: os.path.getmtime(p) if os.path.exists(p) else 0 for p in paths}
+
+
+class ArtifactWatcher:
+    def __init__(self, paths, on_change, poll_interval=POLL_INTERVAL, use_inotify=True):
+        self.paths = [os.path.abspath(p) for p in paths]
+        self._display = dict(zip(self.paths, paths))
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify and INotify is not None
+        self._stop = threading.Event()
+        self._thread = None
+        self._mtimes = file_mtimes(self.paths)
+
+    @property
+    def mode(self):
+        return "inotify" if self.use_inotify else "poll"
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        target = self._run_inotify if self.use_inotify else self._run_poll
+        self._thread = threading.Thread(target=target, name="artifact-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _emit_changed(self):
+        current = file_mtimes(self.paths)
+        changed = [p for p in self.paths if current[p] != self._mtimes[p]]
+        self._mtimes = current
+        if changed:
+            try:
+                self.on_change([self._display[p] for p in changed])
+            except Exception as e:
+                print("[artifact_watcher] on_change failed:", e)
+
+    def _run_poll(self):
+        while not self._stop.wait(self.poll_interval):
+            self._emit_changed()
+
+    def _run_inotify(self):
+        inotify = INotify()
+        mask = inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.CREATE | inotify_flags.DELETE
+        watched = {}
+        for d in sorted({os.path.dirname(p) for p in self.paths}):
+            os.makedirs(d, exist_ok=True)
+            watched[inotify.add_watch(d, mask)] = d
+        names = set(self.paths)
+        try:
+            while not self._stop.is_set():
+                events = inotify.read(timeout=1000)
+                if not any(os.path.join(watched.get(e.wd, ""), e.name) in names for e in events):
+                    continue
+                # coalesce the burst of events produced by one write / rename
+                time.sleep(DEBOUNCE_SECONDS)
+                inotify.read(timeout=0)
+                self._emit_changed()
+        finally:
+            inotify.close()
@@ -0,0 +1,276 @@
+"""
+Walk-forward backtesting over the match history.
+
+The history is featurized once (compute_recent_stats over the whole table, the same pre-match
+features the model is trained on). Because rows are sorted by date, every fold is a pair of
+contiguous row ranges: train [a, b) and test [b, c). Folds are evaluated in parallel by a process
+pool; the feature matrix, targets and dates are placed in shared memory once and every worker maps
+them read-only, so only the fold's four integers are sent to a worker.
+
+Fold schedules:
+  - "window": test windows of --step-days, trained on the preceding --train-days (expanding window
+    when omitted)
+  - "retrain": simulates live_updater's policy: polls once per --poll-days and retrains when at least
+    --threshold (RETRAIN_THRESHOLD) finished matches arrived since the last retrain; each fold tests
+    the model on the matches played until the next retrain
+
+Only finished matches are trained on and scored. Per fold the report has the date ranges, sizes,
+log-loss, accuracy and wall time.
+
+Usage:
+  python -m src.backtest --mode window --train-days 365 --step-days 30 --workers 4
+  python -m src.backtest --mode retrain --threshold 20 --out artifacts/backtest.csv
+"""
+import os
+import time
+import argparse
+import importlib
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.features import compute_recent_stats, FEATURE_COLUMNS
+
+RETRAIN_THRESHOLD = int(os.environ.get("RETRAIN_THRESHOLD", "20"))
+BACKTEST_WORKERS = int(os.environ.get("BACKTEST_WORKERS", str(os.cpu_count() or 1)))
+DEFAULT_MODEL = "src.backtest:default_model"
+LABELS = [0, 1, 2]
+
+Fold = namedtuple("Fold", ["fold", "train_start", "train_end", "test_end"])
+
+
+def default_model():
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    return make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000))
+
+
+def resolve_model(spec):
+    """
+    "module:function" -> the model factory (a zero-argument callable returning an estimator).
+    """
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def featurize_history(df, last_n=5):
+    """
+    Pre-match features for the whole history, then only the finished matches, in date order.
+    Returns (X float64 array, y int64 array, dates datetime64[D] array).
+    """
+    df_features, _ = compute_recent_stats(df, last_n=last_n)
+    finished = (df_features["home_score"] >= 0) & (df_features["away_score"] >= 0)
+    df_features = df_features[finished.to_numpy()]
+    X = np.ascontiguousarray(df_features[FEATURE_COLUMNS].to_numpy(dtype=np.float64))
+    y = df_features["target"].to_numpy(dtype=np.int64)
+    dates = df_features["date"].to_numpy().astype("datetime64[D]")
+    return X, y, dates
+
+
+# ---- fold schedules ------------------------------------------------------------------
+
+def window_folds(dates, step_days=30, train_days=None, start=None, min_train=100):
+    """
+    Walk-forward folds with test windows of step_days, trained on the previous train_days
+    (all history when None). start: first test date (default: the date after min_train matches).
+    """
+    if len(dates) == 0:
+        return []
+    first_test = np.datetime64(start, "D") if start is not None else dates[min(min_train, len(dates) - 1)]
+    step = np.timedelta64(step_days, "D")
+    folds = []
+    test_start = first_test
+    while test_start <= dates[-1]:
+        b = int(np.searchsorted(dates, test_start, side="left"))
+        c = int(np.searchsorted(dates, test_start + step, side="left"))
+        a = 0 if train_days is None else int(np.searchsorted(dates, test_start - np.timedelta64(train_days, "D")))
+        if c > b and b - a >= min_train:
+            folds.append(Fold(len(folds), a, b, c))
+        test_start = test_start + step
+    return folds
+
+
+def retrain_folds(dates, threshold=RETRAIN_THRESHOLD, poll_days=1, train_days=None, min_train=100):
+    """
+    Folds reproducing the live retrain policy: at each poll (every poll_days), retrain if at least
+    threshold matches arrived since the previous retrain. The first model is trained once min_train
+    matches exist; each fold tests a model on the matches until the next retrain.
+    """
+    if len(dates) == 0:
+        return []
+    poll = np.timedelta64(poll_days, "D")
+    # row index reached at each poll boundary: all matches dated before the boundary are in the DB
+    boundaries = np.arange(dates[0] + poll, dates[-1] + 2 * poll, poll)
+    rows_at = np.searchsorted(dates, boundaries, side="left")
+    retrains = []
+    last = None
+    for boundary, rows in zip(boundaries, rows_at):
+        if last is None:
+            if rows >= min_train:
+                retrains.append((boundary, int(rows)))
+                last = rows
+        elif rows - last >= threshold:
+            retrains.append((boundary, int(rows)))
+            last = rows
+    folds = []
+    for i, (boundary, b) in enumerate(retrains):
+        c = retrains[i + 1][1] if i + 1 < len(retrains) else len(dates)
+        a = 0 if train_days is None else int(np.searchsorted(dates, boundary - np.timedelta64(train_days, "D")))
+        if c > b:
+            folds.append(Fold(len(folds), a, b, c))
+    return folds
+
+
+# ---- shared memory -------------------------------------------------------------------
+
+def _share(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+_worker = {}
+
+
+def _attach(specs):
+    """
+    Pool initializer: map the shared arrays read-only in the worker.
+    """
+    for key, (name, shape, dtype) in specs.items():
+        # spawned workers share the parent's resource tracker; the parent unlinks the segments
+        shm = shared_memory.SharedMemory(name=name)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False
+        _worker[key] = (shm, view)
+
+
+def _run_fold(fold, model_spec):
+    from sklearn.metrics import log_loss, accuracy_score
+
+    X, y, dates = (_worker[k][1] for k in ("X", "y", "dates"))
+    started = time.perf_counter()
+    X_train, y_train = X[fold.train_start:fold.train_end], y[fold.train_start:fold.train_end]
+    X_test, y_test = X[fold.train_end:fold.test_end], y[fold.train_end:fold.test_end]
+    result = {
+        "fold": fold.fold,
+        "train_from": str(dates[fold.train_start]),
+        "test_from": str(dates[fold.train_end]),
+        "test_to": str(dates[fold.test_end - 1]),
+        "n_train": len(y_train),
+        "n_test": len(y_test),
+        "log_loss": np.nan,
+        "accuracy": np.nan,
+    }
+    if len(np.unique(y_train)) < 2:
+        result["error"] = "single class in training window"
+    else:
+        model = resolve_model(model_spec)()
+        model.fit(X_train, y_train)
+        proba = np.zeros((len(y_test), len(LABELS)))
+        proba[:, model.classes_] = model.predict_proba(X_test)
+        result["log_loss"] = float(log_loss(y_test, proba, labels=LABELS))
+        result["accuracy"] = float(accuracy_score(y_test, proba.argmax(axis=1)))
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_backtest(X, y, dates, folds, model=DEFAULT_MODEL, workers=BACKTEST_WORKERS):
+    """
+    Evaluate folds in a process pool over shared-memory copies of X / y / dates.
+    model: "module:function" model factory. Returns a DataFrame with one row per fold.
+    """
+    if not folds:
+        return pd.DataFrame()
+    arrays = {"X": X, "y": y, "dates": dates}
+    if workers <= 1:
+        _worker.update({key: (None, array) for key, array in arrays.items()})
+        try:
+            return pd.DataFrame([_run_fold(f, model) for f in folds])
+        finally:
+            _worker.clear()
+    shared, specs = {}, {}
+    try:
+        for key, array in arrays.items():
+            shared[key], specs[key] = _share(np.ascontiguousarray(array))
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_attach, initargs=(specs,)) as pool:
+            results = list(pool.map(_run_fold, folds, [model] * len(folds)))
+    finally:
+        for shm in shared.values():
+            shm.close()
+            shm.unlink()
+    return pd.DataFrame(results)
+
+
+def summarize(report):
+    """
+    Test-size weighted log-loss / accuracy over the scored folds, plus the summed fold time.
+    """
+    scored = report.dropna(subset=["log_loss"]) if len(report) else report
+    if not len(scored):
+        return {"folds": len(report), "n_test": 0, "log_loss": np.nan, "accuracy": np.nan, "seconds": 0.0}
+    w = scored["n_test"]
+    return {
+        "folds": len(report),
+        "n_test": int(w.sum()),
+        "log_loss": float(np.average(scored["log_loss"], weights=w)),
+        "accuracy": float(np.average(scored["accuracy"], weights=w)),
+        "seconds": float(report["seconds"].sum()),
+    }
+
+
+def main():
+    from src.data_loader import load_matches_from_db
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest")
+    parser.add_argument("--mode", choices=["window", "retrain"], default="window")
+    parser.add_argument("--last-n", type=int, default=5)
+    parser.add_argument("--train-days", type=int, default=None, help="training window (default: expanding)")
+    parser.add_argument("--step-days", type=int, default=30, help="test window length (window mode)")
+    parser.add_argument("--start", default=None, help="first test date (window mode)")
+    parser.add_argument("--threshold", type=int, default=RETRAIN_THRESHOLD, help="retrain threshold (retrain mode)")
+    parser.add_argument("--poll-days", type=int, default=1, help="poll interval in days (retrain mode)")
+    parser.add_argument("--min-train", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS)
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model factory as module:function")
+    parser.add_argument("--out", default=None, help="write the per-fold report (.csv or .json)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    X, y, dates = featurize_history(load_matches_from_db(), last_n=args.last_n)
+    print(f"[backtest] featurized {len(y)} finished matches in {time.perf_counter() - started:.2f}s")
+    if args.mode == "window":
+        folds = window_folds(dates, step_days=args.step_days, train_days=args.train_days,
+                             start=args.start, min_train=args.min_train)
+    else:
+        folds = retrain_folds(dates, threshold=args.threshold, poll_days=args.poll_days,
+                              train_days=args.train_days, min_train=args.min_train)
+    print(f"[backtest] {len(folds)} folds, {args.workers} workers")
+
+    started = time.perf_counter()
+    report = run_backtest(X, y, dates, folds, model=args.model, workers=args.workers)
+    wall = time.perf_counter() - started
+    if len(report):
+        with pd.option_context("display.max_rows", 200, "display.width", 160):
+            print(report.to_string(index=False))
+    summary = summarize(report)
+    print(f"[backtest] {summary['folds']} folds, {summary['n_test']} test matches: "
+          f"log_loss={summary['log_loss']:.4f} accuracy={summary['accuracy']:.4f} "
+          f"fold time {summary['seconds']:.2f}s, wall {wall:.2f}s")
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        if args.out.endswith(".json"):
+            report.to_json(args.out, orient="records", indent=2)
+        else:
+            report.to_csv(args.out, index=False)
+        print("[backtest] wrote", args.out)
+
+
+if __name__ == "__main__":
+    main()
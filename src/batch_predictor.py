@@ -0,0 +1,271 @@
+"""
+Resident model + team stats for low-latency batch predictions.
+
+ResidentPredictor keeps the fitted model and a dense stats table indexed by team id in memory. The
+table is built from the team_stats binary artifact (src/team_stats_store.py): one float64 row
+(avg_scored, avg_conceded, form) per DB team id, plus the artifact's fallback means for teams without
+history. Feature rows for a batch of fixtures are two fancy-index gathers, in FEATURE_COLUMNS order,
+and the model is called once per batch. Names are resolved to DB ids through src.interning, not
+through a snapshot, so ids stay valid whichever snapshot ends up scoring them; known() tells which
+ids have stats in a given snapshot.
+
+Artifacts are hot-reloaded: reload() builds a complete new Snapshot and swaps one reference, so a
+batch that is already running finishes on the snapshot it started with and no request is dropped.
+A failed reload (e.g. a half-copied file) keeps serving the previous snapshot.
+
+MicroBatcher coalesces concurrent requests: a single worker thread takes the first queued request,
+collects whatever else arrives within PREDICT_BATCH_WAIT_MS (up to PREDICT_MAX_BATCH fixtures), runs
+one predict_proba over all of them and hands each caller its slice, together with the snapshot that
+scored the batch (a reload may swap snapshots while a request waits in the queue). Under load the
+model call is amortized over many requests instead of being paid per request.
+
+Usage:
+  predictor = ResidentPredictor()
+  batcher = MicroBatcher(predictor.predict_batch)
+  home_ids, away_ids = predictor.resolve(["Arsenal"], ["Chelsea"])
+  proba, snapshot = batcher.predict(home_ids, away_ids)           # (n, 3): home, draw, away
+  known = predictor.known(home_ids, away_ids, snapshot)           # both teams have stats in it
+"""
+import os
+import time
+import queue
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.features import FEATURE_COLUMNS
+from src.team_stats_store import TeamStatsArtifact, STAT_FIELDS
+
+MODEL_ARTIFACT = os.environ.get("MODEL_ARTIFACT", "artifacts/model.joblib")
+TEAM_STATS_ARTIFACT = os.environ.get("TEAM_STATS_ARTIFACT", "artifacts/team_stats.ftstats")
+PREDICT_MAX_BATCH = int(os.environ.get("PREDICT_MAX_BATCH", "4096"))
+PREDICT_BATCH_WAIT_MS = float(os.environ.get("PREDICT_BATCH_WAIT_MS", "2"))
+
+# target labels: 0 home win, 1 draw, 2 away win
+OUTCOMES = ["home_win", "draw", "away_win"]
+
+# has_stats[id]: DB team id `id` has an artifact record (a row of stats other than the fallback)
+Snapshot = namedtuple("Snapshot", ["model", "stats", "fallback", "team_ids", "has_stats", "loaded_at", "version"])
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+def build_stats_table(artifact, team_ids):
+    """
+    Dense (max id + 2, 3) stats table: row id holds the artifact record of DB team id `id`, the
+    last row (index -1) holds the fallback used for unknown teams and teams without history.
+    team_ids: DB id of every artifact record (aligned with artifact.names, -1 if not in the DB).
+    """
+    meta = artifact.meta
+    fallback = np.array([
+        meta.get("fallback_scored", 1.0), meta.get("fallback_conceded", 1.0), meta.get("fallback_form", 0.0),
+    ])
+    records = np.asarray(artifact.records)
+    size = int(team_ids.max(initial=-1)) + 2
+    stats = np.tile(fallback, (size, 1))
+    known = team_ids >= 0
+    for j, field in enumerate(STAT_FIELDS):
+        stats[team_ids[known], j] = records[field][known]
+    return stats, fallback
+
+
+def stats_mask(team_ids, size):
+    """
+    Boolean array of length size: True at the DB ids in team_ids (artifact records found in the DB).
+    """
+    mask = np.zeros(size, dtype=bool)
+    mask[team_ids[team_ids >= 0]] = True
+    return mask
+
+
+class ResidentPredictor:
+    def __init__(self, model_path=MODEL_ARTIFACT, team_stats_path=TEAM_STATS_ARTIFACT, load=True):
+        self.model_path = model_path
+        self.team_stats_path = team_stats_path
+        self.snapshot = None
+        self._signatures = None
+        self._reload_lock = threading.Lock()
+        if load:
+            self.reload()
+
+    def reload(self):
+        """
+        Load both artifacts into a new snapshot and swap it in. Returns True if a snapshot was built.
+        """
+        from src.interning import teams
+
+        with self._reload_lock:
+            signatures = (_signature(self.model_path), _signature(self.team_stats_path))
+            if None in signatures:
+                print("[batch_predictor] artifacts missing:", self.model_path, self.team_stats_path)
+                return False
+            try:
+                model = joblib.load(self.model_path)
+                artifact = TeamStatsArtifact(self.team_stats_path)
+                names = [n.decode("utf-8") for n in np.asarray(artifact.names)]
+                ids = teams.lookup(names) if names else np.zeros(0, dtype=np.int64)
+                stats, fallback = build_stats_table(artifact, ids)
+            except Exception as e:
+                print("[batch_predictor] reload failed, keeping the previous snapshot:", e)
+                return False
+            version = (self.snapshot.version + 1) if self.snapshot else 1
+            self.snapshot = Snapshot(
+                model=model,
+                stats=stats,
+                fallback=fallback,
+                team_ids={name: int(i) for name, i in zip(names, ids) if i >= 0},
+                has_stats=stats_mask(ids, len(stats) - 1),
+                loaded_at=time.time(),
+                version=version,
+            )
+            self._signatures = signatures
+        print(f"[batch_predictor] loaded snapshot {version}: {len(names)} teams")
+        return True
+
+    def reload_if_changed(self):
+        if (_signature(self.model_path), _signature(self.team_stats_path)) == self._signatures:
+            return False
+        return self.reload()
+
+    def resolve(self, home_teams, away_teams):
+        """
+        Team names -> DB id arrays (-1 for names not in the DB). The ids do not depend on a
+        snapshot: the batch may be scored by a newer one than the snapshot current now.
+        """
+        from src.interning import teams
+
+        ids = teams.lookup(list(home_teams) + list(away_teams))
+        return ids[:len(home_teams)], ids[len(home_teams):]
+
+    @staticmethod
+    def known(home_ids, away_ids, snapshot):
+        """
+        Boolean array: both teams of the fixture have stats in snapshot (False means a fallback row
+        was used for at least one of them).
+        """
+        has_stats = np.append(snapshot.has_stats, False)  # index -1: unknown or out-of-range ids
+        size = len(snapshot.has_stats)
+        home = np.asarray(home_ids, dtype=np.int64)
+        away = np.asarray(away_ids, dtype=np.int64)
+        home = np.where((home >= 0) & (home < size), home, -1)
+        away = np.where((away >= 0) & (away < size), away, -1)
+        return has_stats[home] & has_stats[away]
+
+    def features(self, home_ids, away_ids, snapshot=None):
+        """
+        (n, 6) feature matrix in FEATURE_COLUMNS order; unknown ids get the fallback row.
+        """
+        snapshot = snapshot or self._require()
+        size = len(snapshot.stats) - 1
+        home = np.asarray(home_ids, dtype=np.int64)
+        away = np.asarray(away_ids, dtype=np.int64)
+        home = np.where((home >= 0) & (home < size), home, -1)
+        away = np.where((away >= 0) & (away < size), away, -1)
+        return np.hstack([snapshot.stats[home], snapshot.stats[away]])
+
+    def predict_ids(self, home_ids, away_ids, snapshot=None):
+        """
+        (n, 3) probabilities of OUTCOMES with one model call.
+        """
+        snapshot = snapshot or self._require()
+        X = pd.DataFrame(self.features(home_ids, away_ids, snapshot), columns=FEATURE_COLUMNS)
+        proba = np.zeros((len(X), len(OUTCOMES)))
+        if len(X):
+            proba[:, snapshot.model.classes_] = snapshot.model.predict_proba(X)
+        return proba
+
+    def predict_batch(self, home_ids, away_ids):
+        """
+        (probabilities, snapshot that computed them): the MicroBatcher predict function.
+        """
+        snapshot = self._require()
+        return self.predict_ids(home_ids, away_ids, snapshot), snapshot
+
+    def _require(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            raise RuntimeError("no model loaded yet")
+        return snapshot
+
+
+class MicroBatcher:
+    def __init__(self, predict, max_batch=PREDICT_MAX_BATCH, max_wait_ms=PREDICT_BATCH_WAIT_MS):
+        """
+        predict: function(home_ids, away_ids) -> ((n, k) array, context), called from the worker
+                 thread only; every request of the batch gets (its rows, context)
+        """
+        self.predict_fn = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, home_ids, away_ids):
+        future = Future()
+        self._queue.put((np.asarray(home_ids, dtype=np.int64), np.asarray(away_ids, dtype=np.int64), future))
+        return future
+
+    def predict(self, home_ids, away_ids, timeout=None):
+        return self.submit(home_ids, away_ids).result(timeout)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, rows = [item], len(item[0])
+            deadline = time.monotonic() + self.max_wait
+            while rows < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch):
+        home = np.concatenate([b[0] for b in batch])
+        away = np.concatenate([b[1] for b in batch])
+        try:
+            result, context = self.predict_fn(home, away)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        self.rows += len(home)
+        start = 0
+        for h, _, future in batch:
+            future.set_result((result[start:start + len(h)], context))
+            start += len(h)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "queued": self._queue.qsize(),
+        }
@@ -0,0 +1,419 @@
+"""
+Benchmark suite for the data pipeline: import, load, featurize, upsert, poll and SSE fan-out.
+
+Every dataset size runs in its own worker process with a fresh SQLite DB and working directory
+(artifacts, fetch cache) under --workdir, so sizes neither share caches nor inherit each other's
+peak memory. Datasets come from data/generate_synthetic.py with a fixed seed, so the same size is the
+same data on every run.
+
+Phases per size:
+  generate               synthetic CSV (1% unfinished fixtures at the end)
+  import_csv             bulk CSV import into the empty DB
+  load_matches_from_db   full table load
+  compute_recent_stats   featurize the loaded history
+  insert_matches_db      upsert of UPSERT_ROWS fetched rows: 60% duplicates, 20% NULL-to-final
+                         score updates, 20% new fixtures
+  poll_and_update        one live_updater poll against src/fake_football_api.py (rate limit off)
+and once per run:
+  sse_fanout             BENCH_SSE_EVENTS events to --sse-clients /updates clients on the asyncio server
+
+Each phase records wall seconds, rows, rows/s, the peak RSS of the worker during the phase and its
+growth over the RSS at phase start (sampled every 10 ms). Results are written as JSON; with --baseline
+every phase slower or using more memory than the baseline by more than --tolerance is flagged (exit
+status 1 with --fail-on-regression).
+
+Usage:
+  python -m src.benchmark --sizes 10k,1m --out artifacts/benchmark.json
+  python -m src.benchmark --sizes 10k --baseline artifacts/benchmark.json --fail-on-regression
+  python -m src.benchmark --sizes 200000:500 --phases import_csv,load_matches_from_db   # matches:teams
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import threading
+import subprocess
+from datetime import datetime, timezone
+
+from src.metrics import current_rss
+
+BENCH_SEED = 2024
+UPSERT_ROWS = int(os.environ.get("BENCH_UPSERT_ROWS", "5000"))
+BENCH_SSE_EVENTS = int(os.environ.get("BENCH_SSE_EVENTS", "100"))
+SAMPLE_SECONDS = 0.01
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIZES = {
+    "10k": {"matches": 10_000, "teams": 20, "leagues": 1, "seasons": 3},
+    "1m": {"matches": 1_000_000, "teams": 2_000, "leagues": 40, "seasons": 10},
+    "10m": {"matches": 10_000_000, "teams": 20_000, "leagues": 400, "seasons": 10},
+}
+PHASES = ["generate", "import_csv", "load_matches_from_db", "compute_recent_stats", "insert_matches_db",
+          "poll_and_update"]
+
+
+def parse_size(spec):
+    """
+    "10k" / "1m" / "10m" presets, or "matches:teams" (one league per 50 teams).
+    """
+    if spec in SIZES:
+        return dict(SIZES[spec])
+    matches, _, teams = spec.partition(":")
+    teams = int(teams or 20)
+    return {"matches": int(matches), "teams": teams, "leagues": max(1, teams // 50), "seasons": 5}
+
+
+# ---- measurement ---------------------------------------------------------------------
+
+class PeakRSS:
+    """
+    Context manager sampling the process RSS in a background thread; .peak / .start in bytes.
+    """
+
+    def __enter__(self):
+        self.start = self.peak = current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_SECONDS):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+
+
+def measure(results, size, phase, fn):
+    """
+    Run fn() -> (value, rows), append its record to results and return value (None on error).
+    """
+    record = {"size": size, "phase": phase}
+    value = None
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        try:
+            value, rows = fn()
+        except Exception as e:
+            rows = 0
+            record["error"] = f"{type(e).__name__}: {e}"
+        seconds = time.perf_counter() - started
+    record.update({
+        "seconds": round(seconds, 4),
+        "rows": int(rows),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 and rows else None,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "rss_growth_mb": round((rss.peak - rss.start) / 2 ** 20, 1),
+    })
+    results.append(record)
+    status = record.get("error") or f"{record['rows']} rows, {record['rows_per_sec']} rows/s"
+    print(f"[benchmark] {size} {phase}: {seconds:.2f}s, peak {record['peak_rss_mb']} MiB ({status})")
+    return value
+
+
+# ---- per-size worker -------------------------------------------------------------------
+
+def upsert_frame(df, rows=UPSERT_ROWS, seed=BENCH_SEED):
+    """
+    A fetched-like frame mixing duplicates of existing rows, score updates of unfinished fixtures
+    and new fixtures after the last date.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    pending = df[(df["home_score"] < 0) | (df["away_score"] < 0)]
+    n_update = min(len(pending), rows // 5)
+    n_new = rows // 5
+    n_dup = rows - n_update - n_new
+    columns = ["date", "home_team", "away_team", "home_score", "away_score", "league"]
+
+    dups = df.iloc[rng.integers(0, len(df), n_dup)][columns].astype({"home_team": str, "away_team": str,
+                                                                     "league": str})
+    scores = dups[["home_score", "away_score"]]
+    dups[["home_score", "away_score"]] = scores.where(scores >= 0)
+    updates = pending.iloc[:n_update][columns].astype({"home_team": str, "away_team": str, "league": str})
+    updates["home_score"] = rng.integers(0, 4, n_update)
+    updates["away_score"] = rng.integers(0, 4, n_update)
+    names = pd.unique(df["home_team"].astype(str))
+    home = rng.integers(0, len(names), n_new)
+    away = (home + rng.integers(1, len(names), n_new)) % len(names)
+    new = pd.DataFrame({
+        "date": df["date"].max() + pd.to_timedelta(1 + np.arange(n_new) // max(1, len(names) // 2), unit="D"),
+        "home_team": names[home],
+        "away_team": names[away],
+        "home_score": rng.integers(0, 4, n_new),
+        "away_score": rng.integers(0, 4, n_new),
+        "league": df["league"].astype(str).iloc[0],
+    })
+    frame = pd.concat([dups, updates, new], ignore_index=True)
+    frame["date"] = pd.to_datetime(frame["date"]).dt.strftime("%Y-%m-%d")
+    return frame.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def run_size(label, params, phases):
+    from data.generate_synthetic import generate_chunks, write_csv
+
+    results = []
+    csv_path = os.path.abspath("matches.csv")
+    df = None
+
+    def generate():
+        chunks = generate_chunks(unfinished=0.01, cross_league=0.02 if params["leagues"] > 1 else 0.0,
+                                 seed=BENCH_SEED, **params)
+        return None, write_csv(chunks, csv_path)
+
+    def import_phase():
+        from src.import_csv_to_db import import_csv_bulk
+
+        counts = import_csv_bulk(csv_path)
+        return counts, counts["inserted"]
+
+    def load_phase():
+        from src.data_loader import load_matches_from_db
+
+        frame = load_matches_from_db()
+        return frame, len(frame)
+
+    def featurize_phase():
+        from src.features import compute_recent_stats
+
+        df_features, _ = compute_recent_stats(df)
+        return None, len(df_features)
+
+    def upsert_phase():
+        from src.live_fetcher import insert_matches_db
+
+        frame = upsert_frame(df)
+        counts = insert_matches_db(frame)
+        print(f"[benchmark] upsert of {len(frame)} rows: {counts}")
+        return counts, len(frame)
+
+    def poll_phase():
+        from src import live_fetcher
+        from src.fetch_client import FetchClient, ResponseCache, RateLimiter
+        from src.fake_football_api import FakeFootballAPI
+
+        api = FakeFootballAPI(teams=min(params["teams"], 1000), matches_per_day=min(params["teams"] // 2, 200),
+                              seed=BENCH_SEED)
+        api.start()
+        try:
+            live_fetcher._client = FetchClient(api.url, cache=ResponseCache(os.path.abspath("fetch_cache")),
+                                               rate_limiter=RateLimiter(0))
+            from src.live_updater import poll_and_update
+
+            poll_and_update()
+            return None, api.requests
+        finally:
+            api.stop()
+
+    steps = {
+        "generate": generate,
+        "import_csv": import_phase,
+        "load_matches_from_db": load_phase,
+        "compute_recent_stats": featurize_phase,
+        "insert_matches_db": upsert_phase,
+        "poll_and_update": poll_phase,
+    }
+    selected = [p for p in PHASES if p in phases]
+    # every phase builds on the previous ones (data, DB, loaded frame): unselected phases before
+    # the last selected one still run, unmeasured
+    for phase in PHASES[:PHASES.index(selected[-1]) + 1] if selected else []:
+        if phase in phases:
+            value = measure(results, label, phase, steps[phase])
+        elif phase != "poll_and_update":
+            value = steps[phase]()[0]
+        if phase == "load_matches_from_db":
+            df = value
+    return results
+
+
+# ---- SSE fan-out -----------------------------------------------------------------------
+
+async def _sse_client(host, port, last_id, connected):
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b"GET /updates HTTP/1.1\r\nHost: bench\r\n\r\n")
+    await writer.drain()
+    target = f"id: {last_id}\n".encode()
+    buffer = b""
+    connected()
+    try:
+        while target not in buffer:
+            chunk = await reader.read(65536)
+            if not chunk:
+                raise ConnectionError("stream closed")
+            buffer = buffer[-len(target):] + chunk
+        return time.perf_counter()
+    finally:
+        writer.close()
+
+
+def run_sse(clients, events):
+    from app import streaming
+    from src.broadcast_hub import hub
+
+    server_loop = asyncio.new_event_loop()
+    server = server_loop.run_until_complete(
+        asyncio.start_server(streaming.handle_client, "127.0.0.1", 0, backlog=max(clients, 128)))
+    port = server.sockets[0].getsockname()[1]
+    threading.Thread(target=server_loop.run_forever, daemon=True).start()
+
+    ready = threading.Semaphore(0)
+    target = hub.last_id + events
+    client_loop = asyncio.new_event_loop()
+
+    async def all_clients():
+        tasks = [asyncio.ensure_future(_sse_client("127.0.0.1", port, target, ready.release)) for _ in range(clients)]
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    outcome = {}
+    client_thread = threading.Thread(
+        target=lambda: outcome.update(done=client_loop.run_until_complete(all_clients())), daemon=True)
+    results = []
+
+    def fanout():
+        client_thread.start()
+        for _ in range(clients):
+            ready.acquire()
+        deadline = time.monotonic() + 30
+        while hub.subscriber_count() < clients and time.monotonic() < deadline:
+            time.sleep(0.01)
+        started = time.perf_counter()
+        for i in range(events):
+            hub.publish({"benchmark": i, "timestamp": time.time()})
+        client_thread.join(timeout=120)
+        finished = [t for t in outcome.get("done", []) if isinstance(t, float)]
+        if len(finished) < clients:
+            raise RuntimeError(f"only {len(finished)} of {clients} clients received every event")
+        print(f"[benchmark] sse: {clients} clients x {events} events, last delivery after "
+              f"{max(finished) - started:.3f}s")
+        return None, clients * events
+
+    measure(results, f"{clients}_clients", "sse_fanout", fanout)
+    server_loop.call_soon_threadsafe(server.close)
+    server_loop.call_soon_threadsafe(server_loop.stop)
+    return results
+
+
+# ---- driver -------------------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_worker(job, workdir, phases, sse_clients):
+    """
+    Run one job in a child process with its own DB and working directory; returns its records.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    for name in ("matches.db", "matches.db-wal", "matches.db-shm", "matches.csv"):
+        if os.path.exists(os.path.join(workdir, name)):
+            os.remove(os.path.join(workdir, name))
+    out = os.path.join(workdir, "results.json")
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": REPO_ROOT + os.pathsep + env.get("PYTHONPATH", ""),
+        "MATCHES_DATABASE_URL": "sqlite:///" + os.path.join(workdir, "matches.db"),
+        "FETCH_CACHE_DIR": os.path.join(workdir, "fetch_cache"),
+        "FETCH_RATE_PER_MINUTE": "0",
+        "FEATURE_CACHE": "0",
+    })
+    cmd = [sys.executable, "-m", "src.benchmark", "--worker", job, "--phases", ",".join(phases),
+           "--sse-clients", str(sse_clients), "--out", out]
+    proc = subprocess.run(cmd, cwd=workdir, env=env)
+    if proc.returncode != 0 or not os.path.exists(out):
+        return [{"size": job, "phase": "worker", "error": f"exit status {proc.returncode}"}]
+    with open(out) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Records of phases slower (seconds) or hungrier (peak RSS) than the baseline by more than tolerance.
+    """
+    base = {(r["size"], r["phase"]): r for r in baseline.get("results", []) if "error" not in r}
+    regressions = []
+    for r in results:
+        b = base.get((r["size"], r["phase"]))
+        if b is None or "error" in r:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if b.get(metric) and r[metric] > b[metric] * (1 + tolerance):
+                regressions.append({
+                    "size": r["size"], "phase": r["phase"], "metric": metric,
+                    "baseline": b[metric], "current": r[metric], "ratio": round(r[metric] / b[metric], 3),
+                })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pipeline benchmark suite")
+    parser.add_argument("--sizes", default="10k", help="comma separated: 10k, 1m, 10m or matches:teams")
+    parser.add_argument("--phases", default=",".join(PHASES + ["sse_fanout"]))
+    parser.add_argument("--sse-clients", type=int, default=500)
+    parser.add_argument("--workdir", default="artifacts/benchmark")
+    parser.add_argument("--out", default="artifacts/benchmark.json")
+    parser.add_argument("--baseline", default=None, help="previous results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    phases = [p for p in args.phases.split(",") if p]
+
+    if args.worker is not None:
+        if args.worker == "sse":
+            results = run_sse(args.sse_clients, BENCH_SSE_EVENTS)
+        else:
+            results = run_size(args.worker, parse_size(args.worker), phases)
+        with open(args.out, "w") as f:
+            json.dump(results, f)
+        return
+
+    results = []
+    for size in [s for s in args.sizes.split(",") if s]:
+        print(f"[benchmark] size {size}: {parse_size(size)}")
+        results += run_worker(size, os.path.abspath(os.path.join(args.workdir, size.replace(":", "_"))),
+                              phases, args.sse_clients)
+    if "sse_fanout" in phases:
+        results += run_worker("sse", os.path.abspath(os.path.join(args.workdir, "sse")), phases, args.sse_clients)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "host": socket.gethostname(),
+            "cpus": os.cpu_count(),
+            "seed": BENCH_SEED,
+            "sizes": {s: parse_size(s) for s in args.sizes.split(",") if s},
+        },
+        "results": results,
+    }
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f), args.tolerance)
+        for r in report["regressions"]:
+            print(f"[benchmark] REGRESSION {r['size']} {r['phase']} {r['metric']}: "
+                  f"{r['baseline']} -> {r['current']} (x{r['ratio']})")
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("[benchmark] wrote", args.out)
+    if args.fail_on_regression and report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
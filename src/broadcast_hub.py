@@ -0,0 +1,118 @@
+"""
+In-process broadcast hub for server-sent events.
+
+A single producer (e.g. the artifact watcher thread) publishes events; any number of consumers
+receive them, either as asyncio queues (one wake-up per event loop, not per client) or by blocking on
+a condition from worker threads. Recent events are kept in a bounded ring buffer so reconnecting
+clients can resume from their Last-Event-ID.
+"""
+import os
+import json
+import asyncio
+import threading
+from collections import deque, namedtuple
+
+EVENT_BUFFER_SIZE = int(os.environ.get("SSE_EVENT_BUFFER_SIZE", "1000"))
+SUBSCRIBER_QUEUE_SIZE = int(os.environ.get("SSE_SUBSCRIBER_QUEUE_SIZE", "256"))
+
+Event = namedtuple("Event", ["id", "type", "data"])
+
+
+def format_sse(event):
+    """
+    Encode an Event in the text/event-stream wire format.
+    """
+    lines = [f"id: {event.id}"]
+    if event.type and event.type != "message":
+        lines.append(f"event: {event.type}")
+    lines.append(f"data: {json.dumps(event.data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_comment(text):
+    return f": {text}\n\n"
+
+
+class BroadcastHub:
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self._events = deque(maxlen=buffer_size)
+        self._last_id = 0
+        self._cond = threading.Condition()
+        self._queue_size = queue_size
+        self._loops = {}  # event loop -> set of subscriber queues
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def publish(self, data, event_type="message"):
+        with self._cond:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self._events.append(event)
+            self._cond.notify_all()
+            loops = list(self._loops.items())
+        for loop, queues in loops:
+            # one thread-safe wake-up per loop; the fan-out to its queues runs inside the loop
+            try:
+                loop.call_soon_threadsafe(self._fanout, queues, event)
+            except RuntimeError:
+                # loop closed
+                with self._cond:
+                    self._loops.pop(loop, None)
+        return event
+
+    @staticmethod
+    def _fanout(queues, event):
+        for q in list(queues):
+            try:
+                q.put_nowait(event)
+            except asyncio.QueueFull:
+                # slow client: drop it, it will reconnect and resume from its Last-Event-ID
+                queues.discard(q)
+                q.overflowed = True
+
+    def events_after(self, last_id):
+        """
+        Buffered events with id > last_id. Returns (events, complete) where complete is False when
+        some events after last_id already fell out of the ring buffer (or last_id is unknown), so
+        the client has to resynchronize.
+        """
+        with self._cond:
+            events = [e for e in self._events if e.id > last_id]
+            oldest = self._events[0].id if self._events else self._last_id + 1
+            # ids above the last published one come from a previous server process
+            complete = oldest - 1 <= last_id <= self._last_id
+        return events, complete
+
+    def wait_after(self, last_id, timeout):
+        """
+        Block (in a worker thread) until an event newer than last_id is published or timeout.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id > last_id, timeout=timeout)
+
+    def subscribe(self):
+        """
+        Register an asyncio.Queue receiving new events on the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        q = asyncio.Queue(maxsize=self._queue_size)
+        q.overflowed = False
+        with self._cond:
+            self._loops.setdefault(loop, set()).add(q)
+        return q
+
+    def unsubscribe(self, q):
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            queues = self._loops.get(loop)
+            if queues is not None:
+                queues.discard(q)
+
+    def subscriber_count(self):
+        with self._cond:
+            return sum(len(qs) for qs in self._loops.values())
+
+
+hub = BroadcastHub()
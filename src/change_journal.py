@@ -0,0 +1,240 @@
+"""
+Change journal of the matches table (change data capture).
+
+Every write path that changes matches appends to match_changes in the same transaction:
+import_frame (CSV import, synthetic data) journals the rows it inserted and
+live_fetcher.insert_matches_db journals its inserts and its NULL -> final score updates. Each entry
+carries the match's values after the change and a seq from an AUTOINCREMENT key, so seq only grows
+and committed entries are never rewritten: a consumer that remembers the last seq it processed can
+read only what changed since, instead of rescanning matches. (seq order is commit order as long as
+writes are serialized, as on SQLite; with concurrent PostgreSQL writers an entry can commit after a
+larger seq has been read.)
+
+Consumers are named. A consumer's cursor (the last seq it acknowledged) is stored in the meta table
+under cdc_cursor:<name>; reading a batch does not move it, so a consumer that dies between reading
+and acknowledging sees the batch again (at-least-once: apply changes idempotently by match_id).
+compact() deletes the entries every registered consumer has acknowledged, so a consumer that is
+gone for good must be dropped or it pins the journal. Without any registered consumer it keeps only
+the newest CDC_RETAIN_ENTRIES entries, so the journal stays bounded; live_updater compacts after
+every poll. A consumer registered later starts at the oldest retained entry; the journal starts
+empty on an existing DB, so new consumers bootstrap from the matches table and then follow the
+journal from its head.
+
+Usage:
+  consumer = ChangeConsumer("feature_state")
+  for batch in consumer.batches():        # acknowledges each batch once the next one is requested
+      apply(batch)
+  python -m src.change_journal status
+  python -m src.change_journal tail --after 1200 --limit 20
+  python -m src.change_journal compact
+"""
+import os
+import argparse
+from collections import namedtuple
+
+from sqlalchemy import select, delete, func, literal
+
+from src.db import ReaderSession, WriterSession, get_meta, set_meta
+from src.models import Match, MatchChange, Meta
+
+CDC_BATCH_SIZE = int(os.environ.get("CDC_BATCH_SIZE", "1000"))
+# entries kept when no consumer is registered
+CDC_RETAIN_ENTRIES = int(os.environ.get("CDC_RETAIN_ENTRIES", "100000"))
+CURSOR_PREFIX = "cdc_cursor:"
+COMPACTED_KEY = "cdc_compacted_through"
+# SQLite's default limit on bound parameters is 999 before 3.32
+ID_CHUNK = 500
+
+# match columns copied into every journal entry
+MATCH_COLUMNS = ["date", "home_team_id", "away_team_id", "home_score", "away_score", "league_id"]
+
+Change = namedtuple("Change", ["seq", "match_id", "op"] + MATCH_COLUMNS + ["changed_at"])
+
+
+def record_changes(session, op, match_ids):
+    """
+    Journal the current values of the given matches, just inserted (op="insert") or updated
+    (op="update") in this session's transaction, with INSERT ... SELECT from matches, so the entries
+    hold exactly what the transaction wrote. A contiguous run of ids (a bulk insert) is copied with
+    one range query. Returns the number of journaled matches.
+    """
+    table = Match.__table__
+    match_ids = sorted(int(i) for i in match_ids)
+    if not match_ids:
+        return 0
+    if match_ids[-1] - match_ids[0] + 1 == len(match_ids):
+        ranges = [table.c.id.between(match_ids[0], match_ids[-1])]
+    else:
+        ranges = [table.c.id.in_(match_ids[i:i + ID_CHUNK]) for i in range(0, len(match_ids), ID_CHUNK)]
+    columns = ["match_id", "op"] + MATCH_COLUMNS
+    for where in ranges:
+        source = (
+            select(table.c.id, literal(op), *[table.c[name] for name in MATCH_COLUMNS])
+            .where(where)
+            .order_by(table.c.id)
+        )
+        session.execute(MatchChange.__table__.insert().from_select(columns, source))
+    return len(match_ids)
+
+
+def changes_after(session, cursor, limit=CDC_BATCH_SIZE):
+    """
+    Up to limit journal entries with seq > cursor, in seq order.
+    """
+    t = MatchChange.__table__
+    rows = session.execute(
+        select(t.c.seq, t.c.match_id, t.c.op, *[t.c[name] for name in MATCH_COLUMNS], t.c.changed_at)
+        .where(t.c.seq > cursor)
+        .order_by(t.c.seq)
+        .limit(limit)
+    ).all()
+    return [Change(*row) for row in rows]
+
+
+def head(session):
+    """
+    Largest seq ever journaled (0 for an empty journal).
+    """
+    t = MatchChange.__table__
+    last = session.execute(select(func.max(t.c.seq))).scalar()
+    return max(int(last or 0), compacted_through(session))
+
+
+def compacted_through(session):
+    return int(get_meta(session, COMPACTED_KEY, 0))
+
+
+def consumer_cursors(session):
+    """
+    {consumer name: acknowledged seq} of every registered consumer.
+    """
+    rows = session.execute(select(Meta.key, Meta.value).where(Meta.key.startswith(CURSOR_PREFIX))).all()
+    return {key[len(CURSOR_PREFIX):]: int(value) for key, value in rows}
+
+
+class ChangeConsumer:
+    def __init__(self, name, batch_size=CDC_BATCH_SIZE):
+        if not name:
+            raise ValueError("consumer name must not be empty")
+        self.name = name
+        self.key = CURSOR_PREFIX + name
+        self.batch_size = batch_size
+        self.register()
+
+    def register(self):
+        """
+        Create the cursor at the oldest retained entry if the consumer is new.
+        """
+        with WriterSession() as session:
+            if get_meta(session, self.key) is None:
+                set_meta(session, self.key, compacted_through(session))
+                session.commit()
+
+    @property
+    def cursor(self):
+        with ReaderSession() as session:
+            return int(get_meta(session, self.key, 0))
+
+    def poll(self, limit=None):
+        """
+        The next batch after the acknowledged cursor (does not move the cursor).
+        """
+        with ReaderSession() as session:
+            return changes_after(session, int(get_meta(session, self.key, 0)), limit or self.batch_size)
+
+    def ack(self, seq):
+        """
+        Acknowledge every entry up to seq. Cursors never move backwards.
+        """
+        with WriterSession() as session:
+            if seq > head(session):
+                raise ValueError(f"cannot acknowledge seq {seq} beyond the journal head")
+            if seq > int(get_meta(session, self.key, 0)):
+                set_meta(session, self.key, int(seq))
+                session.commit()
+
+    def batches(self, limit=None):
+        """
+        Yield batches until the journal is drained; each batch is acknowledged when the next one
+        is requested, so a batch whose processing raised is delivered again.
+        """
+        while True:
+            batch = self.poll(limit)
+            if not batch:
+                return
+            yield batch
+            self.ack(batch[-1].seq)
+
+    def lag(self):
+        with ReaderSession() as session:
+            return head(session) - int(get_meta(session, self.key, 0))
+
+    def drop(self):
+        """
+        Forget this consumer, so it no longer holds back compaction.
+        """
+        with WriterSession() as session:
+            meta = session.get(Meta, self.key)
+            if meta is not None:
+                session.delete(meta)
+                session.commit()
+
+
+def compact(retain=CDC_RETAIN_ENTRIES):
+    """
+    Delete the entries every registered consumer has acknowledged. Without any consumer, delete all
+    but the newest `retain` entries (by seq). Returns the number of deleted entries.
+    """
+    with WriterSession() as session:
+        cursors = consumer_cursors(session)
+        through = min(cursors.values()) if cursors else head(session) - max(retain, 0)
+        if through <= compacted_through(session):
+            return 0
+        t = MatchChange.__table__
+        deleted = session.execute(delete(t).where(t.c.seq <= through)).rowcount
+        set_meta(session, COMPACTED_KEY, through)
+        session.commit()
+    if deleted:
+        print(f"[change_journal] compacted {deleted} entries through seq {through}")
+    return deleted
+
+
+def main():
+    from src.db import init_db
+
+    parser = argparse.ArgumentParser(description="Matches change journal")
+    parser.add_argument("command", choices=["status", "tail", "compact", "drop"])
+    parser.add_argument("consumer", nargs="?", help="consumer to drop")
+    parser.add_argument("--after", type=int, default=0, help="tail: print entries after this seq")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--retain", type=int, default=CDC_RETAIN_ENTRIES,
+                        help="compact: entries kept when no consumer is registered")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "status":
+        with ReaderSession() as session:
+            last = head(session)
+            retained = session.execute(select(func.count()).select_from(MatchChange.__table__)).scalar()
+            print(f"[change_journal] head seq={last} retained={retained} "
+                  f"compacted_through={compacted_through(session)}")
+            for name, cursor in sorted(consumer_cursors(session).items()):
+                print(f"[change_journal] consumer {name}: cursor={cursor} lag={last - cursor}")
+    elif args.command == "tail":
+        with ReaderSession() as session:
+            for change in changes_after(session, args.after, args.limit):
+                print(" ".join(f"{k}={v}" for k, v in change._asdict().items()))
+    elif args.command == "compact":
+        compact(args.retain)
+    else:
+        if not args.consumer:
+            parser.error("drop needs a consumer name")
+        with ReaderSession() as session:
+            known = args.consumer in consumer_cursors(session)
+        if known:
+            ChangeConsumer(args.consumer).drop()
+        print(f"[change_journal] {'dropped' if known else 'no such consumer'} {args.consumer}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,59 +1,194 @@
 """
 Loads the dataset from the DB and applies feature engineering.
 
+Matches are read with a Core-level select of just the needed columns and returned as typed,
+columnar chunks (datetime64 dates, integer scores with -1 for unknown, integer team/league ids plus
+categorical names built from the interning cache), so no ORM objects or per-row strings are created
+on the way to compute_recent_stats.
+iter_matches_from_db streams the table chunk by chunk to keep memory flat on large tables.
+
+When finished seasons have been moved to the cold archive (src/archive.py), the loader reads the
+Parquet partitions the filters need, season by season, ahead of the hot rows still in the DB (every
+archived match is dated before the archive cutoff, every hot one on or after it), so callers see
+the same rows with or without the archive.
+
 If you still have a CSV you can import it using src/import_csv_to_db.py
 """
+import os
 import pandas as pd
-from src.features import compute_recent_stats
-from src.db import init_db, SessionLocal
+from sqlalchemy import select, type_coerce, String
+from src.features import compute_recent_stats, FEATURE_COLUMNS
+from src.db import init_db, reader_engine
 from src.models import Match
+from src.interning import teams as team_names, leagues as league_names
+from src.metrics import span
+
+LOAD_CHUNK_SIZE = int(os.environ.get("LOAD_CHUNK_SIZE", "100000"))
+
+DB_COLUMNS = ["id", "date", "home_team_id", "away_team_id", "home_score", "away_score", "league_id"]
+MATCH_COLUMNS = DB_COLUMNS + ["home_team", "away_team", "league"]
+CATEGORICAL_COLUMNS = ["home_team", "away_team", "league"]
+
 
+def _matches_query(date_from=None, date_to=None, league_ids=None, after_id=None, limit=None, hot_from=None):
+    t = Match.__table__
+    # SQLite stores dates as ISO strings: skip the per-row date conversion and parse vectorially
+    date_col = type_coerce(t.c.date, String) if reader_engine.dialect.name == "sqlite" else t.c.date
+    q = select(
+        t.c.id, date_col.label("date"), t.c.home_team_id, t.c.away_team_id,
+        t.c.home_score, t.c.away_score, t.c.league_id,
+    )
+    if date_from is not None:
+        q = q.where(t.c.date >= pd.Timestamp(date_from).date())
+    if date_to is not None:
+        q = q.where(t.c.date <= pd.Timestamp(date_to).date())
+    if league_ids is not None:
+        q = q.where(t.c.league_id.in_(league_ids))
+    if hot_from is not None:
+        q = q.where(t.c.date >= hot_from)
+    if after_id is not None:
+        q = q.where(t.c.id > after_id)
+    if limit:
+        # most recent N rows, returned in ascending order
+        recent = q.order_by(t.c.date.desc(), t.c.id.desc()).limit(limit).subquery()
+        return select(recent).order_by(recent.c.date.asc(), recent.c.id.asc())
+    return q.order_by(t.c.date.asc(), t.c.id.asc())
 
-def load_matches_from_db(limit=None):
+
+def _typed_chunk(rows, names=True):
+    df = pd.DataFrame.from_records(rows, columns=DB_COLUMNS)
+    if df["date"].dtype == object and len(df) and isinstance(df["date"].iloc[0], str):
+        df["date"] = pd.to_datetime(df["date"], format="%Y-%m-%d")
+    else:
+        df["date"] = pd.to_datetime(df["date"])
+    df["id"] = df["id"].astype("int64")
+    df["home_score"] = df["home_score"].fillna(-1).astype("int64")
+    df["away_score"] = df["away_score"].fillna(-1).astype("int64")
+    df["home_team_id"] = df["home_team_id"].astype("int64")
+    df["away_team_id"] = df["away_team_id"].astype("int64")
+    df["league_id"] = df["league_id"].fillna(-1).astype("int64")
+    return _with_names(df) if names else df
+
+
+def _with_names(df):
+    # names are only resolved once per distinct id
+    df["home_team"] = team_names.categorical(df["home_team_id"])
+    df["away_team"] = team_names.categorical(df["away_team_id"])
+    df["league"] = league_names.categorical(df["league_id"], missing="Unknown")
+    return df
+
+
+def iter_matches_from_db(chunk_size=LOAD_CHUNK_SIZE, date_from=None, date_to=None, leagues=None,
+                         after_id=None, limit=None):
     """
-    Return a pandas DataFrame of matches ordered by date asc.
+    Stream matches ordered by date asc (ties by id) as an iterator of typed DataFrame chunks of at
+    most chunk_size rows.
 
-    limit: optional number of rows to return (most recent when limit provided)
+    date_from/date_to: optional inclusive date bounds
+    leagues: optional iterable of league names to keep
+    after_id: optional id high-water mark, only rows with a larger id are returned
+    limit: optional number of most recent rows to return
+    """
+    for chunk in _iter_frames(chunk_size, date_from, date_to, leagues, after_id, limit):
+        yield _with_names(chunk)
+
+
+def _iter_db(q, chunk_size):
+    with reader_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(q)
+        for rows in result.partitions(chunk_size):
+            yield _typed_chunk(rows, names=False)
+
+
+def _iter_frames(chunk_size, date_from, date_to, leagues, after_id, limit):
     """
+    Typed chunks without the name columns: cold archive partitions first, then the DB.
+    """
+    from src.archive import current_archive
+
     init_db()
-    with SessionLocal() as session:
-        q = session.query(Match).order_by(Match.date.asc())
-        if limit:
-            q = q.limit(limit)
-        rows = q.all()
-        # build DataFrame
-        data = []
-        for m in rows:
-            data.append({
-                "date": m.date.isoformat() if m.date is not None else None,
-                "home_team": m.home_team,
-                "away_team": m.away_team,
-                "home_score": m.home_score if m.home_score is not None else -1,
-                "away_score": m.away_score if m.away_score is not None else -1,
-                "league": m.league or "Unknown",
-            })
-        df = pd.DataFrame(data)
+    league_ids = None
+    if leagues is not None:
+        league_ids = [int(i) for i in league_names.lookup(list(leagues)) if i >= 0]
+    archive = current_archive()
+    if archive is None or (date_from is not None and pd.Timestamp(date_from).date() >= archive.cutoff):
+        hot_from = archive.cutoff if archive is not None else None
+        yield from _iter_db(_matches_query(date_from, date_to, league_ids, after_id, limit, hot_from), chunk_size)
+        return
+
+    cold = dict(date_from=date_from, date_to=date_to, league_ids=league_ids, after_id=after_id)
+    hot_query = _matches_query(date_from, date_to, league_ids, after_id, limit, hot_from=archive.cutoff)
+    if limit:
+        # the most recent rows: as many as the DB has, the rest from the newest cold seasons
+        hot = list(_iter_db(hot_query, chunk_size))
+        missing = limit - sum(len(c) for c in hot)
+        if missing > 0:
+            yield from archive.tail_frames(missing, chunk_size, **cold)
+        yield from hot
+        return
+    yield from archive.iter_frames(chunk_size, **cold)
+    if date_to is None or pd.Timestamp(date_to).date() >= archive.cutoff:
+        yield from _iter_db(hot_query, chunk_size)
+
+
+def load_matches_from_db(limit=None, **filters):
+    """
+    Return a pandas DataFrame of matches ordered by date asc (ties by id).
+
+    limit: optional number of rows to return (most recent when limit provided)
+    filters: date_from / date_to / leagues / after_id, see iter_matches_from_db
+    """
+    with span("load_matches_from_db") as s:
+        df = _load_matches(limit, filters)
+        s.rows = len(df)
     return df
 
 
-def load_and_featurize_from_db(last_n=5):
+def _load_matches(limit, filters):
+    filters = {"date_from": None, "date_to": None, "leagues": None, "after_id": None, **filters}
+    chunks = list(_iter_frames(LOAD_CHUNK_SIZE, limit=limit, **filters))
+    if not chunks:
+        return pd.DataFrame(columns=MATCH_COLUMNS)
+    df = chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+    # names for the whole frame at once: the categories only depend on the rows, not on the chunking
+    return _with_names(df)
+
+
+def load_and_featurize_from_db(last_n=5, feature_set=None, workers=1, cache=None):
+    """
+    feature_set: optional name of a feature set from src/feature_registry.py (e.g. "multi_window",
+    "extended"); all its columns are computed in the same single pass. None keeps FEATURE_COLUMNS.
+    workers: > 1 featurizes independent groups of teams in parallel processes (same output)
+    cache: serve from / update the on-disk feature cache (src/feature_cache.py); None follows the
+    FEATURE_CACHE env var
+    """
+    from src.feature_cache import FEATURE_CACHE
+
+    if FEATURE_CACHE if cache is None else cache:
+        from src.feature_cache import cached_featurize_from_db
+
+        init_db()
+        return cached_featurize_from_db(last_n=last_n, feature_set=feature_set or "default", workers=workers)
+
+    columns = FEATURE_COLUMNS
+    if feature_set is not None:
+        from src.feature_registry import resolve_feature_set
+
+        columns = resolve_feature_set(feature_set).columns()
     df = load_matches_from_db()
     if df.empty:
         # return empty placeholders
-        X = pd.DataFrame(columns=[
-            "home_avg_scored", "home_avg_conceded", "home_form",
-            "away_avg_scored", "away_avg_conceded", "away_form",
-        ])
+        X = pd.DataFrame(columns=columns)
         return X, pd.Series(dtype=int), pd.DataFrame(), {}
-    df_features, team_stats = compute_recent_stats(df, last_n=last_n)
+    if feature_set is None and workers <= 1:
+        df_features, team_stats = compute_recent_stats(df, last_n=last_n)
+    else:
+        from src.feature_registry import compute_features
 
-    # features used for modeling
-    feature_columns = [
-        "home_avg_scored", "home_avg_conceded", "home_form",
-        "away_avg_scored", "away_avg_conceded", "away_form",
-    ]
+        df_features, team_stats, columns = compute_features(
+            df, feature_set=feature_set or "default", last_n=last_n, workers=workers)
 
-    X = df_features[feature_columns].copy()
+    X = df_features[columns].copy()
     y = df_features["target"].copy()
     df_meta = df_features[["date", "home_team", "away_team", "league"]].copy()
 
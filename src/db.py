@@ -1,26 +1,194 @@
 """
-DB helpers: engine and session factory. Default DB: sqlite:///data/matches.db
+DB helpers: writer and reader engines and session factories. Default DB: sqlite:///data/matches.db
+
+Writes (imports, live inserts, meta updates, migrations) go through writer_engine / WriterSession;
+code that only reads (the loader, the feature cache, name lookups, change consumers) uses
+reader_engine / ReaderSession, whose connections refuse writes.
+
+SQLite: both engines point at the same file. Every connection switches the database to WAL, so
+readers keep reading the last committed snapshot while a poll's write transaction is open instead
+of waiting on the database lock, and is tuned on connect: synchronous=NORMAL (safe with WAL, fsyncs
+at checkpoints only), a SQLITE_CACHE_MB page cache, SQLITE_MMAP_MB of memory-mapped I/O and a
+SQLITE_BUSY_TIMEOUT_MS busy timeout for the remaining writer/writer contention. Reader connections
+are query_only and pooled up to DB_READER_POOL_SIZE (DB_READER_MAX_OVERFLOW extra), so concurrent
+SSE, prediction and analytics readers cannot open unbounded connections. In-memory databases are
+per connection, so there the reader engine is the writer engine.
+
+PostgreSQL: same interface; each engine gets its own pool (DB_WRITER_POOL_SIZE /
+DB_READER_POOL_SIZE plus overflow, pre-ping) and reader transactions are READ ONLY.
+MATCHES_READ_DATABASE_URL can point the readers at a replica.
+
+engine and SessionLocal remain as aliases of the writer engine and session factory.
 """
 import os
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 DATABASE_URL = os.environ.get("MATCHES_DATABASE_URL", "sqlite:///data/matches.db")
+READ_DATABASE_URL = os.environ.get("MATCHES_READ_DATABASE_URL", DATABASE_URL)
+
+SQLITE_CACHE_MB = int(os.environ.get("SQLITE_CACHE_MB", "64"))
+SQLITE_MMAP_MB = int(os.environ.get("SQLITE_MMAP_MB", "256"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+DB_WRITER_POOL_SIZE = int(os.environ.get("DB_WRITER_POOL_SIZE", "5"))
+DB_WRITER_MAX_OVERFLOW = int(os.environ.get("DB_WRITER_MAX_OVERFLOW", "5"))
+DB_READER_POOL_SIZE = int(os.environ.get("DB_READER_POOL_SIZE", "8"))
+DB_READER_MAX_OVERFLOW = int(os.environ.get("DB_READER_MAX_OVERFLOW", "4"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
+
+def _is_sqlite_memory(url):
+    return url.startswith("sqlite") and (url.rstrip("/").endswith(":memory:") or url.rstrip("/") == "sqlite:")
+
+
+def _sqlite_pragmas(read_only):
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_MB * 1024 * 1024}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=1")
+
+    def on_connect(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return on_connect
+
+
+def make_engine(url, read_only=False):
+    """
+    Engine for url tuned for the writer or the reader role (see the module docstring).
+    """
+    if url.startswith("sqlite"):
+        # one connection may be used by several threads (SSE, prediction, scheduler jobs)
+        kwargs = {"connect_args": {"check_same_thread": False}}
+        if _is_sqlite_memory(url):
+            return create_engine(url, future=True, **kwargs)
+        if read_only:
+            kwargs.update(pool_size=DB_READER_POOL_SIZE, max_overflow=DB_READER_MAX_OVERFLOW,
+                          pool_timeout=DB_POOL_TIMEOUT)
+        else:
+            kwargs.update(pool_size=DB_WRITER_POOL_SIZE, max_overflow=DB_WRITER_MAX_OVERFLOW,
+                          pool_timeout=DB_POOL_TIMEOUT)
+        eng = create_engine(url, future=True, **kwargs)
+        event.listen(eng, "connect", _sqlite_pragmas(read_only))
+        return eng
+
+    pool_size, overflow = ((DB_READER_POOL_SIZE, DB_READER_MAX_OVERFLOW) if read_only
+                           else (DB_WRITER_POOL_SIZE, DB_WRITER_MAX_OVERFLOW))
+    eng = create_engine(url, future=True, pool_size=pool_size, max_overflow=overflow,
+                        pool_timeout=DB_POOL_TIMEOUT, pool_pre_ping=True)
+    if read_only and eng.dialect.name == "postgresql":
+        eng = eng.execution_options(postgresql_readonly=True)
+    return eng
+
+
+writer_engine = make_engine(DATABASE_URL)
+if _is_sqlite_memory(DATABASE_URL) and READ_DATABASE_URL == DATABASE_URL:
+    reader_engine = writer_engine
+else:
+    reader_engine = make_engine(READ_DATABASE_URL, read_only=True)
+
+WriterSession = sessionmaker(autocommit=False, autoflush=False, bind=writer_engine, future=True)
+ReaderSession = sessionmaker(autocommit=False, autoflush=False, bind=reader_engine, future=True)
+
+# historical names, used by the write paths
+engine = writer_engine
+SessionLocal = WriterSession
+
+
+_initialized = False
+_init_lock = threading.Lock()
+
 
-# For sqlite, allow multithreaded access
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
+def init_db(force=False):
+    """
+    Run the migrations and create missing tables, once per process: every loader / insert call
+    invokes it, and create_all inspects every table each time. force=True runs it again (e.g.
+    after the database file was replaced).
+    """
+    global _initialized
+    if _initialized and not force:
+        return
+    with _init_lock:
+        if _initialized and not force:
+            return
+        from src.models import Base
+        from src.migrations import run_migrations
+
+        # import triggers or other DB initializers here if needed
+        run_migrations(engine)
+        Base.metadata.create_all(bind=engine)
+        _initialized = True
+
+
+def frame_to_rows(df):
+    """
+    DataFrame -> list of dicts for executemany, with missing values (NaN / pd.NA) as None.
+    """
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def insert_ignore(table):
+    """
+    Dialect-specific INSERT that silently skips rows violating a unique constraint
+    (SQLite INSERT OR IGNORE / PostgreSQL ON CONFLICT DO NOTHING).
+    """
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"insert_ignore is not supported for dialect {engine.dialect.name!r}")
+    return insert(table).on_conflict_do_nothing()
+
+
+def insert_ignore_rows(session, table, rows):
+    """
+    Insert a list of dicts with one conflict-ignoring INSERT executed for the whole batch
+    (a single prepared statement; psycopg2 batches it into multi-row VALUES).
+    Returns the number of rows actually inserted.
+    """
+    if not rows:
+        return 0
+    result = session.execute(insert_ignore(table), rows)
+    return max(result.rowcount, 0)
+
+
+def insert_ignore_returning(session, table, rows, columns):
+    """
+    Like insert_ignore_rows, but returns the given columns of the rows actually inserted
+    (INSERT ... ON CONFLICT DO NOTHING RETURNING, batched by SQLAlchemy's insertmanyvalues).
+    """
+    if not rows:
+        return []
+    return session.execute(insert_ignore(table).returning(*columns), rows).all()
+
+
+def get_meta(session, key, default=None):
+    """
+    Value stored under key in the meta table, or default.
+    """
+    from src.models import Meta
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, future=True)
+    row = session.get(Meta, key)
+    return default if row is None or row.value is None else row.value
 
 
-def init_db():
+def set_meta(session, key, value):
     """
-    Create tables (if they do not exist).
+    Upsert key -> str(value) in the meta table (committed by the caller).
     """
-    from src.models import Base
+    from src.models import Meta
 
-    # import triggers or other DB initializers here if needed
-    Base.metadata.create_all(bind=engine)
+    session.merge(Meta(key=key, value=None if value is None else str(value)))
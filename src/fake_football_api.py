@@ -0,0 +1,197 @@
+"""
+Local stand-in for the football-data.org /v4/matches endpoint, for exercising the fetcher and
+live_updater without network access or an API token.
+
+Fixtures are generated deterministically per day from a seed: past days are finished, future days
+are scheduled (null scores) and today's matches finish as the clock passes their kick-off. Responses
+have the football-data shape ({"filters", "resultSet", "matches": [...]}) and carry ETag /
+Last-Modified validators; conditional requests get a 304 when the day did not change. Errors can be
+injected to test retries (fail_every: every n-th request gets a 429 with Retry-After).
+
+Usage:
+  python -m src.fake_football_api --port 8099
+  FOOTBALL_DATA_URL=http://127.0.0.1:8099/v4/matches python -m src.live_updater
+
+  api = FakeFootballAPI(teams=20); api.start()   # in-process, on a free port
+  client = FetchClient(api.url)
+"""
+import json
+import random
+import hashlib
+import argparse
+import threading
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from src.fetch_client import day_shards
+
+
+class FakeFootballAPI:
+    def __init__(self, teams=20, matches_per_day=4, seed=0, competition="Premier", fail_every=0,
+                 host="127.0.0.1", port=0, now=None):
+        self.teams = [f"Team {i}" for i in range(1, teams + 1)]
+        self.matches_per_day = matches_per_day
+        self.seed = seed
+        self.competition = competition
+        self.fail_every = fail_every
+        self.host = host
+        self.port = port
+        self._now = now
+        self.requests = 0
+        self.not_modified = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v4/matches"
+
+    def now(self):
+        return self._now() if callable(self._now) else (self._now or datetime.now(timezone.utc))
+
+    def day_matches(self, day):
+        """
+        Match dicts for an ISO day, with scores revealed for matches that kicked off 2h before now.
+        Returns (matches, last modified datetime).
+        """
+        d = date.fromisoformat(day)
+        rng = random.Random(self.seed * 1_000_003 + d.toordinal())
+        now = self.now()
+        matches, modified = [], datetime.combine(d, datetime.min.time(), timezone.utc)
+        for i in range(self.matches_per_day):
+            home, away = rng.sample(range(len(self.teams)), 2)
+            kickoff = datetime.combine(d, datetime.min.time(), timezone.utc) + timedelta(hours=12 + 2 * i)
+            hs, aa = max(0, int(rng.gauss(1.3, 1.2))), max(0, int(rng.gauss(1.0, 1.1)))
+            finished_at = kickoff + timedelta(hours=2)
+            finished = finished_at <= now
+            if finished:
+                modified = max(modified, finished_at)
+            matches.append({
+                "id": d.toordinal() * 100 + i,
+                "utcDate": kickoff.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "status": "FINISHED" if finished else "SCHEDULED",
+                "competition": {"id": 2021, "name": self.competition},
+                "homeTeam": {"id": home + 1, "name": self.teams[home], "shortName": self.teams[home]},
+                "awayTeam": {"id": away + 1, "name": self.teams[away], "shortName": self.teams[away]},
+                "score": {"fullTime": {"home": hs if finished else None, "away": aa if finished else None}},
+            })
+        return matches, modified
+
+    def response(self, date_from, date_to):
+        """
+        (body bytes, etag, last modified datetime) for a dateFrom / dateTo query.
+        """
+        matches, modified = [], datetime(1970, 1, 1, tzinfo=timezone.utc)
+        for day in day_shards(date_from, date_to):
+            day_list, day_modified = self.day_matches(day)
+            matches.extend(day_list)
+            modified = max(modified, day_modified)
+        body = json.dumps({
+            "filters": {"dateFrom": date_from, "dateTo": date_to},
+            "resultSet": {"count": len(matches)},
+            "matches": matches,
+        }).encode()
+        return body, '"' + hashlib.sha1(body).hexdigest() + '"', modified
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, body=b"", headers=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with api._lock:
+                    api.requests += 1
+                    fail = api.fail_every and api.requests % api.fail_every == 0
+                    if fail:
+                        api.failed += 1
+                if parsed.path.rstrip("/") != "/v4/matches":
+                    return self._send(404, b'{"message": "not found"}')
+                if fail:
+                    return self._send(429, b'{"message": "rate limited"}', {"Retry-After": "0"})
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                today = api.now().date().isoformat()
+                try:
+                    body, etag, modified = api.response(query.get("dateFrom", today), query.get("dateTo", today))
+                except ValueError:
+                    return self._send(400, b'{"message": "bad date"}')
+                headers = {
+                    "Content-Type": "application/json",
+                    "ETag": etag,
+                    "Last-Modified": format_datetime(modified, usegmt=True),
+                }
+                if self._not_modified(etag, modified):
+                    with api._lock:
+                        api.not_modified += 1
+                    return self._send(304, headers={"ETag": etag})
+                self._send(200, body, headers)
+
+            def _not_modified(self, etag, modified):
+                if "If-None-Match" in self.headers:
+                    return self.headers["If-None-Match"] == etag
+                since = self.headers.get("If-Modified-Since")
+                if since:
+                    try:
+                        return modified.replace(microsecond=0) <= parsedate_to_datetime(since)
+                    except (TypeError, ValueError):
+                        return False
+                return False
+
+        return Handler
+
+    def start(self):
+        """
+        Serve in a background thread (port 0 picks a free port). Returns self.
+        """
+        self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-football-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the football-data matches API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--teams", type=int, default=20)
+    parser.add_argument("--matches-per-day", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fail-every", type=int, default=0, help="answer every n-th request with 429")
+    args = parser.parse_args()
+    api = FakeFootballAPI(teams=args.teams, matches_per_day=args.matches_per_day, seed=args.seed,
+                          fail_every=args.fail_every, host=args.host, port=args.port)
+    api._server = ThreadingHTTPServer((api.host, api.port), api._handler())
+    print(f"[fake_football_api] serving {api.url}")
+    try:
+        api._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
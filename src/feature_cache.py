@@ -0,0 +1,549 @@
+"""
+On-disk cache of the featurized match history, keyed by the DB high-water mark.
+
+load_and_featurize_from_db re-reads and re-featurizes the whole matches table on every call (every
+retrain, every backtest). The cache keeps the result as one flat binary file per column (feature
+columns before fallbacks, target, match ids, dates, team / league ids, scores) in a version
+directory, plus team_stats in the memory-mappable format of src/team_stats_store.py. Readers map the
+columns with np.memmap, so a hit costs one small DB query and the fallback fill.
+
+Entries are keyed by feature set, last_n and the database URL. Each entry's manifest records its
+high-water mark: the largest match id it covers and a CRC32 of the cached unfinished fixtures'
+(id, home score, away score), the only rows live_fetcher.insert_matches_db ever updates. On load:
+
+- same max id and checksum: hit, nothing is recomputed
+- new rows and/or resolved scores: every cached row dated before the earliest affected date is
+  still valid (a match's features only depend on earlier matches), so only the tail from that date
+  is re-read from the DB and re-featurized, with each involved team's last home / away matches from
+  the cache as context. When the tail only adds rows after the cached ones (the usual poll), the
+  column files of the current version are extended in place; otherwise the valid prefix is copied
+  into a new version
+- feature sets with online features (elo) need the full history and are rebuilt on any change
+
+Fallback means depend on the whole history, so columns are stored with NaN and filled on load.
+Rows deleted from the DB or scores rewritten after being known are not detected: rebuild with
+`python -m src.feature_cache build --rebuild`.
+
+Each entry has a lock file. A hit is checked and read under a shared lock, so readers run
+concurrently; updates take the exclusive lock and downgrade it to shared while the result is read,
+so no writer or eviction touches the version being mapped. After a load that wrote, versions no
+longer current and then whole entries least recently updated are removed until the cache fits in
+FEATURE_CACHE_MAX_BYTES, each under its entry's exclusive lock (busy entries are skipped).
+
+The cache is opt-in: load_and_featurize_from_db uses it with cache=True or FEATURE_CACHE=1.
+
+Usage:
+  X, y, meta, team_stats = load_and_featurize_from_db(feature_set="extended", cache=True)
+  X, y, meta, team_stats = FeatureCache().load("default", last_n=5)
+  python -m src.feature_cache status
+  python -m src.feature_cache build --feature-set multi_window --rebuild
+"""
+import os
+import json
+import time
+import zlib
+import fcntl
+import shutil
+import hashlib
+import argparse
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func
+
+from src.db import reader_engine, DATABASE_URL
+from src.models import Match
+from src.artifact_io import atomic_write_bytes
+from src.features import _prepare
+from src.feature_registry import resolve_feature_set, raw_features, OnlineFeature
+from src.team_stats_store import write_team_stats, load_team_stats
+from src.interning import teams as team_names, leagues as league_names
+
+FEATURE_CACHE = os.environ.get("FEATURE_CACHE", "0") == "1"
+FEATURE_CACHE_DIR = os.environ.get("FEATURE_CACHE_DIR", "artifacts/feature_cache")
+FEATURE_CACHE_MAX_BYTES = int(os.environ.get("FEATURE_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+FORMAT_VERSION = 1
+
+# per-row columns stored next to the feature columns
+ROW_DTYPES = {
+    "id": "<i8",
+    "date": "<M8[D]",
+    "home_team_id": "<i8",
+    "away_team_id": "<i8",
+    "league_id": "<i8",
+    "home_score": "<i8",
+    "away_score": "<i8",
+    "target": "<i8",
+}
+FEATURE_DTYPE = "<f8"
+PENDING_QUERY_CHUNK = 900
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode()).hexdigest()[:8]
+
+
+def pending_checksum(ids, home_scores, away_scores):
+    """
+    CRC32 of the (id, home score, away score) triples of unfinished fixtures, -1 for NULL.
+    """
+    triples = np.column_stack([np.asarray(ids), np.asarray(home_scores), np.asarray(away_scores)])
+    return zlib.crc32(np.ascontiguousarray(triples, dtype="<i8").tobytes())
+
+
+def _context_rows(home, away, teams, window):
+    """
+    Ascending row positions of each listed team's last `window` home and last `window` away matches.
+    Together they hold every match a window of at most `window` (overall or per venue) can reach.
+    """
+    n = len(home)
+    pos = np.concatenate([np.arange(n), np.arange(n)])
+    team = np.concatenate([home, away])
+    venue = np.repeat(np.array([0, 1]), n)
+    keep = np.isin(team, teams)
+    pos, key = pos[keep], team[keep] * 2 + venue[keep]
+    order = np.lexsort((pos, key))
+    key = key[order]
+    from_end = np.searchsorted(key, key, side="right") - np.arange(len(key))
+    return np.unique(pos[order][from_end <= window])
+
+
+def _target(hs, aa):
+    return np.where(hs > aa, 0, np.where(hs == aa, 1, 2)).astype(np.int64)
+
+
+class FeatureCache:
+    def __init__(self, directory=FEATURE_CACHE_DIR, max_bytes=FEATURE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.last_status = None
+
+    # ---- layout ----------------------------------------------------------------------
+
+    def key_dir(self, feature_set, last_n):
+        fs = resolve_feature_set(feature_set)
+        return os.path.join(self.directory, f"{fs.name}-n{last_n}-{_digest(DATABASE_URL)}")
+
+    def _read_manifest(self, key_dir):
+        try:
+            with open(os.path.join(key_dir, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if manifest.get("format") != FORMAT_VERSION:
+            return None
+        return manifest
+
+    def _write_manifest(self, key_dir, manifest):
+        atomic_write_bytes(os.path.join(key_dir, "manifest.json"), json.dumps(manifest, indent=2).encode())
+
+    def _arrays(self, key_dir, manifest):
+        """
+        Read-only memmaps of every stored column of the manifest's version.
+        """
+        version_dir = os.path.join(key_dir, manifest["version"])
+        rows = manifest["rows"]
+        arrays = {}
+        for name, dtype in manifest["dtypes"].items():
+            if rows:
+                arrays[name] = np.memmap(os.path.join(version_dir, f"{name}.bin"), dtype=dtype, mode="r",
+                                         shape=(rows,))
+            else:
+                arrays[name] = np.zeros(0, dtype=dtype)
+        return arrays
+
+    # ---- DB high-water mark --------------------------------------------------------------
+
+    def _is_hit(self, manifest, state):
+        max_id, current, _ = state
+        pending = np.asarray(manifest["pending"], dtype=np.int64).reshape(-1, 2)
+        if max_id != manifest["max_id"] or len(current) < len(pending):
+            return False
+        scores = np.array([current[int(i)] for i in pending[:, 0]], dtype=np.int64).reshape(-1, 2)
+        return pending_checksum(pending[:, 0], scores[:, 0], scores[:, 1]) == manifest["checksum"]
+
+    def _db_state(self, manifest):
+        """
+        (DB max id, {id: (home score, away score)} of the cached pending rows still in the DB,
+        earliest date among rows newer than the cache).
+        """
+        t = Match.__table__
+        pending = np.asarray(manifest["pending"], dtype=np.int64).reshape(-1, 2)
+        with reader_engine.connect() as conn:
+            max_id = conn.execute(select(func.max(t.c.id))).scalar()
+            new_from = conn.execute(select(func.min(t.c.date)).where(t.c.id > manifest["max_id"])).scalar()
+            current = {}
+            for start in range(0, len(pending), PENDING_QUERY_CHUNK):
+                ids = [int(i) for i in pending[start:start + PENDING_QUERY_CHUNK, 0]]
+                for mid, hs, aa in conn.execute(
+                    select(t.c.id, t.c.home_score, t.c.away_score).where(t.c.id.in_(ids))
+                ):
+                    current[mid] = (-1 if hs is None else hs, -1 if aa is None else aa)
+        return max_id, current, new_from
+
+    # ---- public API ------------------------------------------------------------------
+
+    def load(self, feature_set="default", last_n=5, workers=1, rebuild=False):
+        """
+        (X, y, meta, team_stats) as load_and_featurize_from_db returns them, brought up to date with
+        the DB. last_status is "hit", "extended", "tail" or "rebuilt".
+        """
+        fs = resolve_feature_set(feature_set)
+        key_dir = self.key_dir(fs, last_n)
+        started = time.perf_counter()
+        with _open_lock(key_dir, fcntl.LOCK_SH) as lock:
+            manifest = None if rebuild else self._read_manifest(key_dir)
+            if manifest is not None and self._is_hit(manifest, self._db_state(manifest)):
+                self.last_status = "hit"
+            else:
+                # not atomic: another process may have updated the entry in between, so look again
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                manifest = None if rebuild else self._read_manifest(key_dir)
+                if manifest is not None:
+                    manifest = self._refresh(key_dir, manifest, fs, last_n)
+                if manifest is None:
+                    manifest = self._build(key_dir, fs, last_n, workers)
+                    self.last_status = "rebuilt"
+                # keep the version from being replaced or evicted until it has been read
+                fcntl.flock(lock, fcntl.LOCK_SH)
+            result = self._frames(key_dir, manifest, fs)
+        if self.last_status != "hit":
+            self._evict(keep=key_dir)
+        print(f"[feature_cache] {self.last_status}: {manifest['rows']} rows ({fs.name}, last_n={last_n}) "
+              f"in {time.perf_counter() - started:.2f}s")
+        return result
+
+    def status(self):
+        """
+        One dict per cache entry: key, version, rows, max id, bytes on disk.
+        """
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for key in sorted(os.listdir(self.directory)):
+            key_dir = os.path.join(self.directory, key)
+            manifest = self._read_manifest(key_dir)
+            if manifest is None:
+                continue
+            entries.append({
+                "key": key,
+                "version": manifest["version"],
+                "rows": manifest["rows"],
+                "max_id": manifest["max_id"],
+                "bytes": _dir_bytes(key_dir),
+            })
+        return entries
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    # ---- building and updating ---------------------------------------------------------
+
+    def _build(self, key_dir, fs, last_n, workers):
+        from src.data_loader import load_matches_from_db
+
+        df = _prepare(load_matches_from_db())
+        if workers > 1 and len(df):
+            from src.parallel_features import map_team_components, feature_set_part
+
+            columns, team_stats = map_team_components(df, feature_set_part, (fs.name, last_n), workers)
+        else:
+            columns, team_stats = raw_features(df, fs, last_n)
+        arrays = self._row_arrays(df, columns, fs)
+        previous = self._read_manifest(key_dir)
+        return self._write_version(key_dir, previous, fs, last_n, arrays, team_stats)
+
+    def _refresh(self, key_dir, manifest, fs, last_n):
+        """
+        Bring a cached entry up to date; None when it has to be rebuilt from scratch.
+        """
+        state = self._db_state(manifest)
+        max_id, current, new_from = state
+        pending = np.asarray(manifest["pending"], dtype=np.int64).reshape(-1, 2)
+        if max_id is None or max_id < manifest["max_id"] or len(current) < len(pending):
+            return None
+        if self._is_hit(manifest, state):
+            self.last_status = "hit"
+            return manifest
+        scores = np.array([current[int(i)] for i in pending[:, 0]], dtype=np.int64).reshape(-1, 2)
+        arrays = self._arrays(key_dir, manifest)
+        changed = pending[:, 1][(scores[:, 0] != arrays["home_score"][pending[:, 1]])
+                                | (scores[:, 1] != arrays["away_score"][pending[:, 1]])]
+        if any(isinstance(f, OnlineFeature) for _, f in fs.column_features()):
+            return None
+
+        affected = [np.datetime64(pd.Timestamp(new_from).date(), "D")] if new_from is not None else []
+        if len(changed):
+            affected.append(arrays["date"][changed].min())
+        since = min(affected)
+        start = int(np.searchsorted(arrays["date"], since, side="left"))
+        if start == 0:
+            return None
+        tail_arrays, team_stats = self._featurize_tail(arrays, start, since, fs, last_n)
+        cached_stats = load_team_stats(os.path.join(key_dir, manifest["version"], "team_stats.ftstats"))
+        cached_stats.update(team_stats)
+
+        if start == manifest["rows"]:
+            self.last_status = "extended"
+            return self._append(key_dir, manifest, tail_arrays, cached_stats)
+        self.last_status = "tail"
+        merged = {name: np.concatenate([np.asarray(arrays[name][:start]), tail_arrays[name]])
+                  for name in manifest["dtypes"]}
+        return self._write_version(key_dir, manifest, fs, last_n, merged, cached_stats)
+
+    def _featurize_tail(self, arrays, start, since, fs, last_n):
+        """
+        Features of every DB row dated >= since, computed over those rows plus the cached context
+        rows of the teams they involve. Returns (row arrays, team_stats of those teams).
+        """
+        from src.data_loader import load_matches_from_db
+
+        tail = load_matches_from_db(date_from=pd.Timestamp(since))
+        window = max([last_n] + [w for w in fs.windows if w is not None])
+        tail_teams = np.union1d(tail["home_team_id"].to_numpy(), tail["away_team_id"].to_numpy())
+        context_pos = _context_rows(np.asarray(arrays["home_team_id"][:start]),
+                                    np.asarray(arrays["away_team_id"][:start]), tail_teams, window)
+        context = pd.DataFrame({name: np.asarray(arrays[name])[context_pos] for name in ROW_DTYPES
+                                if name != "target"})
+        context["date"] = context["date"].astype("datetime64[ns]")
+        context["home_team"] = team_names.categorical(context["home_team_id"])
+        context["away_team"] = team_names.categorical(context["away_team_id"])
+        frame = pd.concat([context, tail[context.columns]], ignore_index=True)
+
+        columns, team_stats = raw_features(frame, fs, last_n)
+        n = len(context)
+        tail_columns = {name: np.asarray(values)[n:] for name, values in columns.items()}
+        names = set(team_names.names_for(tail_teams))
+        team_stats = {team: stats for team, stats in team_stats.items() if team in names}
+        return self._row_arrays(tail, tail_columns, fs), team_stats
+
+    def _row_arrays(self, df, columns, fs):
+        hs = df["home_score"].to_numpy(dtype=np.int64)
+        aa = df["away_score"].to_numpy(dtype=np.int64)
+        arrays = {
+            "id": df["id"].to_numpy(dtype=np.int64),
+            "date": df["date"].to_numpy().astype("datetime64[D]"),
+            "home_team_id": df["home_team_id"].to_numpy(dtype=np.int64),
+            "away_team_id": df["away_team_id"].to_numpy(dtype=np.int64),
+            "league_id": df["league_id"].to_numpy(dtype=np.int64),
+            "home_score": hs,
+            "away_score": aa,
+            "target": _target(hs, aa),
+        }
+        for col in fs.columns():
+            arrays[col] = np.asarray(columns[col], dtype=np.float64)
+        return arrays
+
+    def _manifest(self, previous, version, fs, last_n, arrays, rows):
+        hs, aa = arrays["home_score"], arrays["away_score"]
+        pending_pos = np.flatnonzero((hs < 0) | (aa < 0))
+        return {
+            "format": FORMAT_VERSION,
+            "feature_set": fs.name,
+            "last_n": last_n,
+            "version": version,
+            "rows": rows,
+            "columns": fs.columns(),
+            "dtypes": {**ROW_DTYPES, **{col: FEATURE_DTYPE for col in fs.columns()}},
+            "max_id": int(arrays["id"].max(initial=0)),
+            "checksum": pending_checksum(arrays["id"][pending_pos], hs[pending_pos], aa[pending_pos]),
+            "pending": [[int(arrays["id"][p]), int(p)] for p in pending_pos],
+            "score_sum": int(hs.sum() + aa.sum()),
+            "created": (previous or {}).get("created", time.time()),
+            "updated": time.time(),
+        }
+
+    def _write_version(self, key_dir, previous, fs, last_n, arrays, team_stats):
+        number = int(previous["version"][1:]) + 1 if previous else 1
+        version = f"v{number:06d}"
+        version_dir = os.path.join(key_dir, version)
+        shutil.rmtree(version_dir, ignore_errors=True)
+        os.makedirs(version_dir)
+        manifest = self._manifest(previous, version, fs, last_n, arrays, len(arrays["id"]))
+        for name, dtype in manifest["dtypes"].items():
+            with open(os.path.join(version_dir, f"{name}.bin"), "wb") as f:
+                f.write(np.ascontiguousarray(arrays[name], dtype=dtype).tobytes())
+                os.fsync(f.fileno())
+        write_team_stats(os.path.join(version_dir, "team_stats.ftstats"), team_stats, meta={"last_n": last_n})
+        self._write_manifest(key_dir, manifest)
+        return manifest
+
+    def _append(self, key_dir, manifest, tail_arrays, team_stats):
+        """
+        Extend the current version's column files in place. Readers of the previous manifest only
+        map its row count, so appending never changes what they see.
+        """
+        version_dir = os.path.join(key_dir, manifest["version"])
+        rows = manifest["rows"]
+        for name, dtype in manifest["dtypes"].items():
+            with open(os.path.join(version_dir, f"{name}.bin"), "r+b") as f:
+                # drop bytes of an append that crashed before its manifest was written
+                f.truncate(rows * np.dtype(dtype).itemsize)
+                f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(tail_arrays[name], dtype=dtype).tobytes())
+                os.fsync(f.fileno())
+        write_team_stats(os.path.join(version_dir, "team_stats.ftstats"), team_stats,
+                         meta={"last_n": manifest["last_n"]})
+        arrays = {name: np.concatenate([np.asarray(values), tail_arrays[name]])
+                  for name, values in self._arrays(key_dir, manifest).items()}
+        fs = resolve_feature_set(manifest["feature_set"])
+        updated = self._manifest(manifest, manifest["version"], fs, manifest["last_n"], arrays,
+                                 rows + len(tail_arrays["id"]))
+        self._write_manifest(key_dir, updated)
+        return updated
+
+    # ---- reading -----------------------------------------------------------------------
+
+    def _frames(self, key_dir, manifest, fs):
+        columns = manifest["columns"]
+        if manifest["rows"] == 0:
+            return pd.DataFrame(columns=columns), pd.Series(dtype=int), pd.DataFrame(), {}
+        arrays = self._arrays(key_dir, manifest)
+        n = manifest["rows"]
+        # global_means over the stored scores
+        fallback_scored = fallback_conceded = manifest["score_sum"] / (2 * n)
+        fallbacks = {"scored": fallback_scored, "conceded": fallback_conceded}
+        X = pd.DataFrame({
+            col: np.where(np.isnan(arrays[col]), fallbacks.get(feature.fallback, feature.fallback), arrays[col])
+            for col, feature in fs.column_features()
+        }, columns=columns)
+        y = pd.Series(np.array(arrays["target"]), name="target")
+        meta = pd.DataFrame({
+            "date": np.asarray(arrays["date"]).astype("datetime64[ns]"),
+            "home_team": team_names.categorical(arrays["home_team_id"]),
+            "away_team": team_names.categorical(arrays["away_team_id"]),
+            "league": league_names.categorical(arrays["league_id"], missing="Unknown"),
+        })
+        team_stats = load_team_stats(os.path.join(key_dir, manifest["version"], "team_stats.ftstats"))
+        return X, y, meta, team_stats
+
+    # ---- eviction ----------------------------------------------------------------------
+
+    def _evict(self, keep=None):
+        """
+        Remove versions that are not current, then whole entries least recently updated first
+        (never `keep`), until the cache fits in max_bytes. Every deletion happens under the
+        entry's exclusive lock; entries another process holds are skipped.
+        """
+        if not os.path.isdir(self.directory):
+            return
+        total = _dir_bytes(self.directory)
+        if total <= self.max_bytes:
+            return
+        entries = []
+        for key in os.listdir(self.directory):
+            key_dir = os.path.join(self.directory, key)
+            manifest = self._read_manifest(key_dir)
+            if manifest is not None:
+                entries.append((manifest["updated"], key_dir))
+        entries.sort()
+
+        for _, key_dir in entries:
+            if total <= self.max_bytes:
+                return
+            with _open_lock(key_dir, fcntl.LOCK_EX | fcntl.LOCK_NB, create=False) as lock:
+                manifest = self._read_manifest(key_dir) if lock is not None else None
+                if manifest is None:
+                    continue
+                for name in sorted(os.listdir(key_dir)):
+                    path = os.path.join(key_dir, name)
+                    if name.startswith("v") and os.path.isdir(path) and name != manifest["version"]:
+                        total -= _remove(path)
+
+        for _, key_dir in entries:
+            if total <= self.max_bytes:
+                return
+            if key_dir == keep:
+                continue
+            with _open_lock(key_dir, fcntl.LOCK_EX | fcntl.LOCK_NB, create=False) as lock:
+                if lock is not None:
+                    total -= _remove(key_dir)
+
+
+@contextmanager
+def _open_lock(key_dir, flags, create=True):
+    """
+    Hold flock(flags) on key_dir/.lock for the block; yields the lock file, or None when the entry
+    does not exist (create=False) or LOCK_NB was asked and another process holds it. An entry
+    evicted while we waited is recreated (or skipped), so the lock held is always the live one's.
+    """
+    path = os.path.join(key_dir, ".lock")
+    while True:
+        if create:
+            os.makedirs(key_dir, exist_ok=True)
+        try:
+            lock = open(path, "a")
+        except FileNotFoundError:
+            yield None
+            return
+        try:
+            fcntl.flock(lock, flags)
+        except BlockingIOError:
+            lock.close()
+            yield None
+            return
+        try:
+            live = os.fstat(lock.fileno()).st_ino == os.stat(path).st_ino
+        except FileNotFoundError:
+            live = False
+        if live:
+            break
+        lock.close()
+        if not create:
+            yield None
+            return
+    try:
+        yield lock
+    finally:
+        lock.close()
+
+
+def _remove(path):
+    size = _dir_bytes(path)
+    shutil.rmtree(path, ignore_errors=True)
+    print("[feature_cache] evicted", path)
+    return size
+
+
+def _dir_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def cached_featurize_from_db(last_n=5, feature_set="default", workers=1):
+    return FeatureCache().load(feature_set, last_n=last_n, workers=workers)
+
+
+def main():
+    from src.db import init_db
+
+    parser = argparse.ArgumentParser(description="On-disk feature cache")
+    parser.add_argument("command", choices=["status", "build", "clear"])
+    parser.add_argument("--feature-set", default="default")
+    parser.add_argument("--last-n", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--rebuild", action="store_true", help="ignore the cached entry")
+    args = parser.parse_args()
+
+    cache = FeatureCache()
+    if args.command == "status":
+        for entry in cache.status():
+            print(f"[feature_cache] {entry['key']}: {entry['version']} rows={entry['rows']} "
+                  f"max_id={entry['max_id']} {entry['bytes'] / 1024 ** 2:.1f} MiB")
+    elif args.command == "build":
+        init_db()
+        cache.load(args.feature_set, last_n=args.last_n, workers=args.workers, rebuild=args.rebuild)
+    else:
+        cache.clear()
+        print("[feature_cache] cleared", cache.directory)
+
+
+if __name__ == "__main__":
+    main()
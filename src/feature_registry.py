@@ -0,0 +1,336 @@
+"""
+Pluggable feature registry: named features computed together in one pass over the sorted matches.
+
+Two kinds of features can be registered:
+  - WindowFeature: a per-(match, side) value reduced (mean or sum) over a team's last w matches.
+    All window features share one long table (one row per match side) and, per grouping ("team", or
+    "team_venue" for home-only / away-only splits), one stable sort and one set of per-team segment
+    offsets; each feature gets one prefix sum, from which every requested window size is a
+    difference. Adding a window or a feature adds an O(n) vectorized step, not another pass.
+  - OnlineFeature: an accumulator with per-team state that is read before a match and updated after
+    it (e.g. ratings), for features that cannot be written as window sums. All online features are
+    advanced together in a single loop over the matches.
+
+A FeatureSet names the features and window sizes to compute; None in windows stands for the caller's
+last_n and gives unsuffixed columns, so the "default" set reproduces compute_recent_stats'
+FEATURE_COLUMNS exactly. Other windows get a _<w> suffix (home_avg_scored_10).
+
+Usage:
+  df_features, team_stats, columns = compute_features(df, feature_set="extended", last_n=5)
+  X, y, meta, team_stats = load_and_featurize_from_db(feature_set="multi_window")
+
+  register_feature(WindowFeature("clean_sheet_rate", lambda t: t["conceded"] == 0, reduce="mean"))
+  register_feature_set(FeatureSet("mine", ["avg_scored", "clean_sheet_rate"], windows=(None, 10)))
+"""
+import copy
+
+import numpy as np
+
+from src.features import _prepare, team_codes, team_stats_from_windows, global_means, match_outcome, WindowPrefix
+
+DEFAULT_FEATURE_SET = "default"
+
+
+class WindowFeature:
+    """
+    value: function(long table dict) -> per-entry values (long table: team, venue (0 home, 1 away),
+           scored, conceded, outcome arrays, one entry per match side)
+    reduce: "mean" or "sum" over the window
+    fallback: value used without history: "scored" / "conceded" (global means) or a number
+    group: "team" or "team_venue" (windows over the team's matches at the same venue)
+    """
+
+    def __init__(self, name, value, reduce="mean", fallback=0.0, group="team"):
+        if reduce not in ("mean", "sum"):
+            raise ValueError(f"unknown reduce {reduce!r}")
+        if group not in GROUPS:
+            raise ValueError(f"unknown group {group!r}, expected one of {sorted(GROUPS)}")
+        self.name = name
+        self.value = value
+        self.reduce = reduce
+        self.fallback = fallback
+        self.group = group
+
+
+class OnlineFeature:
+    """
+    Base class for accumulator features. Subclasses implement init / read / update; read returns the
+    (home, away) values before the match, update folds in its result. Online features are not
+    windowed: they get one unsuffixed column per side.
+
+    The registered instance only holds the configuration: every pass works on its own copy from
+    start(), so concurrent or nested passes do not share accumulator state.
+    """
+    name = None
+    fallback = 0.0
+
+    def start(self, n_teams):
+        """
+        A fresh accumulator for one pass over n_teams teams.
+        """
+        accumulator = copy.copy(self)
+        accumulator.init(n_teams)
+        return accumulator
+
+    def init(self, n_teams):
+        raise NotImplementedError
+
+    def read(self, home, away):
+        raise NotImplementedError
+
+    def update(self, home, away, home_score, away_score):
+        raise NotImplementedError
+
+
+class Elo(OnlineFeature):
+    """
+    Elo rating before the match. Unfinished matches (negative scores) do not move ratings.
+    """
+    name = "elo"
+
+    def __init__(self, k=20.0, initial=1500.0, home_advantage=0.0):
+        self.k = k
+        self.initial = initial
+        self.fallback = initial
+        self.home_advantage = home_advantage
+
+    def init(self, n_teams):
+        self.ratings = [self.initial] * n_teams
+
+    def read(self, home, away):
+        return self.ratings[home], self.ratings[away]
+
+    def update(self, home, away, home_score, away_score):
+        if home_score < 0 or away_score < 0:
+            return
+        rh, ra = self.ratings[home], self.ratings[away]
+        expected = 1.0 / (1.0 + 10 ** ((ra - rh - self.home_advantage) / 400.0))
+        actual = 1.0 if home_score > away_score else 0.5 if home_score == away_score else 0.0
+        delta = self.k * (actual - expected)
+        self.ratings[home] = rh + delta
+        self.ratings[away] = ra - delta
+
+
+class FeatureSet:
+    def __init__(self, name, features, windows=(None,)):
+        self.name = name
+        self.features = list(features)
+        self.windows = tuple(windows)
+
+    def columns(self):
+        """
+        Model columns in order: home then away, per feature, per window.
+        """
+        return [col for col, _ in self.column_features()]
+
+    def column_features(self):
+        """
+        (column, feature) pairs in column order.
+        """
+        pairs = []
+        for side in ("home", "away"):
+            for name in self.features:
+                feature = FEATURES[name]
+                suffixes = [""] if isinstance(feature, OnlineFeature) else [_suffix(w) for w in self.windows]
+                pairs += [(f"{side}_{name}{suffix}", feature) for suffix in suffixes]
+        return pairs
+
+
+def _suffix(window):
+    return "" if window is None else f"_{window}"
+
+
+GROUPS = {
+    "team": lambda t: t["team"],
+    "team_venue": lambda t: t["team"] * 2 + t["venue"],
+}
+
+FEATURES = {}
+FEATURE_SETS = {}
+
+
+def register_feature(feature):
+    FEATURES[feature.name] = feature
+    return feature
+
+
+def register_feature_set(feature_set):
+    unknown = [f for f in feature_set.features if f not in FEATURES]
+    if unknown:
+        raise ValueError(f"feature set {feature_set.name!r} uses unknown features {unknown}")
+    FEATURE_SETS[feature_set.name] = feature_set
+    return feature_set
+
+
+def resolve_feature_set(feature_set):
+    if isinstance(feature_set, FeatureSet):
+        return feature_set
+    if feature_set not in FEATURE_SETS:
+        raise ValueError(f"unknown feature set {feature_set!r}, expected one of {sorted(FEATURE_SETS)}")
+    return FEATURE_SETS[feature_set]
+
+
+register_feature(WindowFeature("avg_scored", lambda t: t["scored"], fallback="scored"))
+register_feature(WindowFeature("avg_conceded", lambda t: t["conceded"], fallback="conceded"))
+register_feature(WindowFeature("form", lambda t: t["outcome"], reduce="sum"))
+register_feature(WindowFeature("win_rate", lambda t: t["outcome"] > 0))
+register_feature(WindowFeature("venue_avg_scored", lambda t: t["scored"], fallback="scored", group="team_venue"))
+register_feature(WindowFeature("venue_avg_conceded", lambda t: t["conceded"], fallback="conceded", group="team_venue"))
+register_feature(WindowFeature("venue_form", lambda t: t["outcome"], reduce="sum", group="team_venue"))
+register_feature(Elo())
+
+BASE_FEATURES = ["avg_scored", "avg_conceded", "form"]
+register_feature_set(FeatureSet("default", BASE_FEATURES))
+register_feature_set(FeatureSet("multi_window", BASE_FEATURES, windows=(None, 3, 10)))
+register_feature_set(FeatureSet(
+    "extended",
+    BASE_FEATURES + ["win_rate", "venue_avg_scored", "venue_avg_conceded", "venue_form", "elo"],
+    windows=(None, 3, 10),
+))
+
+
+def long_table(home, away, home_score, away_score):
+    """
+    One entry per (match, side): home entries at even, away entries at odd positions, so a stable
+    sort by any team-derived key keeps each group's entries in match order.
+    """
+    n = len(home)
+
+    def interleave(h, a, dtype):
+        out = np.empty(2 * n, dtype=dtype)
+        out[0::2] = h
+        out[1::2] = a
+        return out
+
+    t = {
+        "team": interleave(home, away, np.int64),
+        "venue": interleave(0, 1, np.int64),
+        "scored": interleave(home_score, away_score, float),
+        "conceded": interleave(away_score, home_score, float),
+    }
+    t["outcome"] = match_outcome(t["scored"], t["conceded"])
+    return t
+
+
+def _window_columns(t, features, windows, group):
+    """
+    Pre-match window values for features sharing one grouping: {(name, window): long array} plus
+    the group's final (name, window) sums/counts needed for team_stats.
+    """
+    codes = GROUPS[group](t)
+    m = len(codes)
+    n_groups = int(codes.max(initial=-1)) + 1
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    all_codes = np.arange(n_groups)
+    group_start = np.searchsorted(sorted_codes, all_codes, side="left")
+    group_end = np.searchsorted(sorted_codes, all_codes, side="right")
+    pos = np.arange(m)
+    previous = pos - group_start[sorted_codes]
+
+    out = {}
+    last = {("matches", w): np.minimum(group_end - group_start, w) for w in windows}
+    for feature in features:
+        prefix = WindowPrefix(np.asarray(feature.value(t), dtype=float)[order])
+        for w in windows:
+            window = np.minimum(previous, w)
+            sums = prefix.sums(pos, window)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                values = sums if feature.reduce == "sum" else sums / window
+            values = np.where(window > 0, values, np.nan)
+            unsorted = np.empty(m)
+            unsorted[order] = values
+            out[(feature.name, w)] = unsorted
+
+            group_window = np.minimum(group_end - group_start, w)
+            group_sums = prefix.sums(group_end, group_window)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                group_last = group_sums if feature.reduce == "sum" else group_sums / group_window
+            last[(feature.name, w)] = np.where(group_window > 0, group_last, np.nan)
+    return out, last
+
+
+def compute_features(df, feature_set=DEFAULT_FEATURE_SET, last_n=5, workers=1):
+    """
+    Compute every feature of a feature set in one pass over the matches sorted by date.
+    Returns (df_features, team_stats, columns): df_features has the feature columns and target,
+    team_stats is compute_recent_stats' team_stats (base stats over last_n), columns the model columns.
+    workers > 1 featurizes independent groups of teams in parallel (src/parallel_features.py); the
+    feature set must then be registered by name at import time so worker processes know it.
+    """
+    fs = resolve_feature_set(feature_set)
+    df = _prepare(df)
+    hs = df["home_score"].to_numpy(dtype=float)
+    aa = df["away_score"].to_numpy(dtype=float)
+    if workers > 1:
+        from src.parallel_features import map_team_components, feature_set_part
+
+        columns, team_stats = map_team_components(df, feature_set_part, (fs.name, last_n), workers)
+    else:
+        columns, team_stats = raw_features(df, fs, last_n)
+
+    fallback_scored, fallback_conceded = global_means(hs, aa)
+    fallbacks = {"scored": fallback_scored, "conceded": fallback_conceded}
+    cols = []
+    for col, feature in fs.column_features():
+        fill = fallbacks.get(feature.fallback, feature.fallback)
+        df[col] = np.where(np.isnan(columns[col]), fill, columns[col])
+        cols.append(col)
+    df["target"] = np.where(hs > aa, 0, np.where(hs == aa, 1, 2)).astype(np.int64)
+    return df, team_stats, cols
+
+
+def raw_features(df, feature_set, last_n=5):
+    """
+    Feature columns of a date-sorted frame before fallbacks (NaN where a team has no history yet),
+    and team_stats. Every value depends only on the matches of the teams involved, which is what
+    lets src/parallel_features.py compute them per connected group of teams.
+    """
+    fs = resolve_feature_set(feature_set)
+    hs = df["home_score"].to_numpy(dtype=float)
+    aa = df["away_score"].to_numpy(dtype=float)
+    home, away, names = team_codes(df)
+    t = long_table(home, away, hs, aa)
+    windows = [last_n if w is None else w for w in fs.windows]
+
+    selected = [FEATURES[name] for name in fs.features]
+    window_feats = [f for f in selected if isinstance(f, WindowFeature)]
+    online_feats = [f for f in selected if isinstance(f, OnlineFeature)]
+
+    # team_stats always come from the base features over last_n, computed with the "team" group
+    by_group = {"team": [FEATURES[name] for name in BASE_FEATURES]}
+    for f in window_feats:
+        if f not in by_group.setdefault(f.group, []):
+            by_group[f.group].append(f)
+
+    columns = {}
+    team_last = None
+    for group, feats in by_group.items():
+        group_windows = sorted(set(windows) | ({last_n} if group == "team" else set()))
+        values, last = _window_columns(t, feats, group_windows, group)
+        if group == "team":
+            team_last = {name: last[(name, last_n)] for name in BASE_FEATURES + ["matches"]}
+        for f in feats:
+            if f not in window_feats:
+                continue
+            for w_spec, w in zip(fs.windows, windows):
+                long_values = values[(f.name, w)]
+                columns[f"home_{f.name}{_suffix(w_spec)}"] = long_values[0::2]
+                columns[f"away_{f.name}{_suffix(w_spec)}"] = long_values[1::2]
+
+    if online_feats:
+        n = len(df)
+        n_teams = len(names)
+        reads = {f.name: (np.empty(n), np.empty(n)) for f in online_feats}
+        accumulators = [f.start(n_teams) for f in online_feats]
+        home_list, away_list = home.tolist(), away.tolist()
+        hs_list, aa_list = hs.tolist(), aa.tolist()
+        for i in range(n):
+            h, a = home_list[i], away_list[i]
+            for f in accumulators:
+                reads[f.name][0][i], reads[f.name][1][i] = f.read(h, a)
+                f.update(h, a, hs_list[i], aa_list[i])
+        for f in accumulators:
+            columns[f"home_{f.name}"], columns[f"away_{f.name}"] = reads[f.name]
+
+    return columns, team_stats_from_windows(team_last, names)
@@ -0,0 +1,349 @@
+"""
+Incremental featurization state that survives between live_updater polls.
+
+Instead of replaying compute_recent_stats over the whole matches table on every poll, we keep:
+ - per-team ring buffers of the last N goals scored, goals conceded and outcomes
+ - the running global sums used for the fallback means
+ - a high-water mark (last match id and date) of the rows already folded in
+ - the ids of folded-in matches whose scores were still unknown, with the scores folded in for them
+
+advance() only reads rows above the high-water mark plus the pending matches whose scores changed;
+the global sums move by the difference of each side, so a match inserted with one known score is
+not counted twice. Matches that arrive out of order (older than a team's latest buffered match) and late scores
+rebuild just the affected teams' windows with one windowed query, so poll cost depends on the size of
+the new data and not on the total history.
+
+Unknown scores follow the loader convention (-1), so team_stats() returns exactly what
+compute_recent_stats would return for the same table.
+
+With a cold archive (src/archive.py) the DB only holds matches dated on or after the archive cutoff;
+the archived history enters through the archive's end-of-archive snapshot (global sums and each
+team's last archived matches), which is older than every DB row.
+
+Buffers are contiguous arrays indexed by team id (see src/interning.py); names are only resolved
+when team_stats() builds the artifact.
+"""
+import os
+import datetime
+import joblib
+import numpy as np
+from sqlalchemy import select, func, union_all, true
+
+from src.db import init_db, ReaderSession
+from src.models import Match
+from src.interning import teams as team_names
+from src.archive import current_archive
+
+FEATURE_STATE_PATH = os.environ.get("FEATURE_STATE_PATH", "artifacts/feature_state.joblib")
+
+# value stored for unknown scores (same as src.data_loader.load_matches_from_db)
+MISSING_SCORE = -1
+
+
+def _score(value):
+    return MISSING_SCORE if value is None else int(value)
+
+
+def _outcome(scored, conceded):
+    if scored > conceded:
+        return 1
+    if scored < conceded:
+        return -1
+    return 0
+
+
+class FeatureState:
+    def __init__(self, last_n=5):
+        self.last_n = last_n
+        # all per-team arrays are indexed by team id
+        self.scored = np.zeros((0, last_n), dtype=np.int64)
+        self.conceded = np.zeros((0, last_n), dtype=np.int64)
+        self.outcomes = np.zeros((0, last_n), dtype=np.int64)
+        self.head = np.zeros(0, dtype=np.int64)  # next slot to overwrite
+        self.count = np.zeros(0, dtype=np.int64)  # filled slots (<= last_n)
+        # (date ordinal, match id) of the latest match in each team's buffer
+        self.last_date = np.zeros(0, dtype=np.int64)
+        self.last_match_id = np.zeros(0, dtype=np.int64)
+
+        self.sum_scores = 0  # sum of home + away scores over all matches
+        self.n_matches = 0
+        self.last_id = 0  # high-water mark
+        self.last_date_seen = None
+        # match id -> (home id, away id, home score, away score) as folded in, for matches missing a score
+        self.pending = {}
+
+    # ---- per-team buffers -------------------------------------------------
+
+    def _row(self, team_id):
+        if team_id >= len(self.head):
+            grow = max(64, len(self.head), team_id + 1 - len(self.head))
+            pad2 = lambda a: np.concatenate([a, np.zeros((grow, self.last_n), dtype=a.dtype)])
+            pad1 = lambda a: np.concatenate([a, np.zeros(grow, dtype=a.dtype)])
+            self.scored, self.conceded, self.outcomes = pad2(self.scored), pad2(self.conceded), pad2(self.outcomes)
+            self.head, self.count = pad1(self.head), pad1(self.count)
+            self.last_date, self.last_match_id = pad1(self.last_date), pad1(self.last_match_id)
+        return team_id
+
+    def _push(self, row, scored, conceded, date_ord, match_id):
+        slot = self.head[row]
+        self.scored[row, slot] = scored
+        self.conceded[row, slot] = conceded
+        self.outcomes[row, slot] = _outcome(scored, conceded)
+        self.head[row] = (slot + 1) % self.last_n
+        self.count[row] = min(self.count[row] + 1, self.last_n)
+        self.last_date[row] = date_ord
+        self.last_match_id[row] = match_id
+
+    def _is_after_last(self, row, date_ord, match_id):
+        if self.count[row] == 0:
+            return True
+        return (date_ord, match_id) > (self.last_date[row], self.last_match_id[row])
+
+    def _reset(self, row):
+        self.scored[row] = 0
+        self.conceded[row] = 0
+        self.outcomes[row] = 0
+        self.head[row] = 0
+        self.count[row] = 0
+        self.last_date[row] = 0
+        self.last_match_id[row] = 0
+
+    # ---- DB access -----------------------------------------------------------
+
+    def _rebuild_teams(self, session, teams=None):
+        """
+        Reload the last_n matches of each team with a single windowed query and refill their buffers.
+        teams: iterable of team ids; None rebuilds every team in the table.
+        """
+        archive = current_archive(session)
+        hot = Match.date >= archive.cutoff if archive is not None else true()
+        home = select(
+            Match.id, Match.date, Match.home_team_id.label("team"),
+            Match.home_score.label("scored"), Match.away_score.label("conceded"),
+        )
+        away = select(
+            Match.id, Match.date, Match.away_team_id.label("team"),
+            Match.away_score.label("scored"), Match.home_score.label("conceded"),
+        )
+        home, away = home.where(hot), away.where(hot)
+        if teams is not None:
+            teams = [int(t) for t in teams]
+            if not teams:
+                return
+            home = home.where(Match.home_team_id.in_(teams))
+            away = away.where(Match.away_team_id.in_(teams))
+            for team in teams:
+                self._reset(self._row(team))
+        if archive is not None:
+            # archived matches precede every DB row; the DB rows pushed below push them out
+            for team, date_ord, match_id, scored, conceded in archive.team_entries(self.last_n, teams):
+                self._push(self._row(team), scored, conceded, date_ord, match_id)
+        sides = union_all(home, away).subquery()
+        ranked = select(
+            sides,
+            func.row_number().over(
+                partition_by=sides.c.team,
+                order_by=(sides.c.date.desc(), sides.c.id.desc()),
+            ).label("rn"),
+        ).subquery()
+        q = (
+            select(ranked.c.id, ranked.c.date, ranked.c.team, ranked.c.scored, ranked.c.conceded)
+            .where(ranked.c.rn <= self.last_n)
+            .order_by(ranked.c.team, ranked.c.date, ranked.c.id)
+        )
+        for match_id, date, team, scored, conceded in session.execute(q):
+            self._push(self._row(team), _score(scored), _score(conceded), date.toordinal(), match_id)
+
+    def bootstrap(self, session):
+        """
+        Build the state for the full table without replaying history: one aggregate query for the
+        global sums and high-water mark, one windowed query for the team buffers.
+        """
+        archive = current_archive(session)
+        hot = Match.date >= archive.cutoff if archive is not None else true()
+        n, sum_scores, last_id, last_date = session.execute(
+            select(
+                func.count(Match.id),
+                func.coalesce(func.sum(
+                    func.coalesce(Match.home_score, MISSING_SCORE) + func.coalesce(Match.away_score, MISSING_SCORE)
+                ), 0),
+                func.coalesce(func.max(Match.id), 0),
+                func.max(Match.date),
+            ).where(hot)
+        ).one()
+        self.n_matches = int(n)
+        self.sum_scores = int(sum_scores)
+        self.last_id = int(last_id)
+        self.last_date_seen = last_date
+        if archive is not None:
+            self.n_matches += archive.rows
+            self.sum_scores += archive.sum_scores
+            self.last_id = max(self.last_id, archive.max_id)
+        self.pending = {
+            mid: (h, a, _score(hs), _score(aa))
+            for mid, h, a, hs, aa in session.execute(
+                select(Match.id, Match.home_team_id, Match.away_team_id, Match.home_score, Match.away_score).where(
+                    (Match.home_score.is_(None)) | (Match.away_score.is_(None))
+                ).where(hot)
+            )
+        }
+        self._rebuild_teams(session)
+
+    def advance(self, session):
+        """
+        Fold in rows inserted since the high-water mark and pending matches whose scores changed.
+        Returns the number of matches that changed the state.
+        """
+        dirty = set()
+
+        # pending matches with new scores: move the global sums by the change of each side, rebuild
+        # both teams; they stay pending until both scores are known
+        resolved = []
+        if self.pending:
+            ids = list(self.pending)
+            for start in range(0, len(ids), 500):
+                for mid, hs, aa in session.execute(
+                    select(Match.id, Match.home_score, Match.away_score).where(Match.id.in_(ids[start:start + 500]))
+                ):
+                    h, a, old_hs, old_aa = self.pending[mid]
+                    hs, aa = _score(hs), _score(aa)
+                    if (hs, aa) != (old_hs, old_aa):
+                        resolved.append((mid, h, a, hs, aa))
+        for mid, h, a, hs, aa in resolved:
+            _, _, old_hs, old_aa = self.pending.pop(mid)
+            self.sum_scores += (hs - old_hs) + (aa - old_aa)
+            if hs == MISSING_SCORE or aa == MISSING_SCORE:
+                self.pending[mid] = (h, a, hs, aa)
+            dirty.update((h, a))
+
+        new_rows = session.execute(
+            select(Match.id, Match.date, Match.home_team_id, Match.away_team_id, Match.home_score, Match.away_score)
+            .where(Match.id > self.last_id)
+            .order_by(Match.date, Match.id)
+        ).all()
+        for mid, date, h, a, hs, aa in new_rows:
+            hs, aa = _score(hs), _score(aa)
+            self.n_matches += 1
+            self.sum_scores += hs + aa
+            if hs == MISSING_SCORE or aa == MISSING_SCORE:
+                self.pending[mid] = (h, a, hs, aa)
+            date_ord = date.toordinal()
+            for team, scored, conceded in ((h, hs, aa), (a, aa, hs)):
+                row = self._row(team)
+                if team in dirty:
+                    continue
+                if self._is_after_last(row, date_ord, mid):
+                    self._push(row, scored, conceded, date_ord, mid)
+                else:
+                    # late-arriving older match: its window must be rebuilt in order
+                    dirty.add(team)
+            self.last_id = max(self.last_id, mid)
+            if self.last_date_seen is None or date > self.last_date_seen:
+                self.last_date_seen = date
+
+        self._rebuild_teams(session, dirty)
+        return len(resolved) + len(new_rows)
+
+    # ---- outputs ---------------------------------------------------------------
+
+    @property
+    def n_finished(self):
+        """
+        Matches with both scores known (archived matches are all finished).
+        """
+        return self.n_matches - len(self.pending)
+
+    def global_means(self):
+        if self.n_matches == 0:
+            return 1.0, 1.0
+        mean = float(self.sum_scores / (2 * self.n_matches))
+        return mean, mean
+
+    def team_stats(self):
+        """
+        dict mapping team name -> latest stats dict, identical to compute_recent_stats' team_stats.
+        """
+        ids = np.flatnonzero(self.count)
+        names = team_names.names_for(ids)
+        # unfilled slots are zero, so row sums over the whole buffer are the window sums
+        k = self.count[ids]
+        scored = self.scored[ids].sum(axis=1)
+        conceded = self.conceded[ids].sum(axis=1)
+        form = self.outcomes[ids].sum(axis=1)
+        team_stats = {}
+        for i, name in enumerate(names):
+            team_stats[name] = {
+                "avg_scored": float(scored[i] / k[i]),
+                "avg_conceded": float(conceded[i] / k[i]),
+                "form": float(form[i]),
+            }
+        return team_stats
+
+    def team_stats_table(self):
+        """
+        (names, records) for the binary team_stats artifact (src/team_stats_store.py): one
+        RECORD_DTYPE record per team, sorted by name, built without intermediate dicts.
+        """
+        from src.team_stats_store import RECORD_DTYPE
+
+        ids = np.flatnonzero(self.count)
+        names = team_names.names_for(ids)
+        order = np.argsort(names.astype(str), kind="stable")
+        ids, names = ids[order], names[order]
+        k = self.count[ids]
+        records = np.zeros(len(ids), dtype=RECORD_DTYPE)
+        records["avg_scored"] = self.scored[ids].sum(axis=1) / k
+        records["avg_conceded"] = self.conceded[ids].sum(axis=1) / k
+        records["form"] = self.outcomes[ids].sum(axis=1)
+        records["last_n"] = k
+        records["as_of"] = (self.last_date[ids] - _EPOCH_ORDINAL).astype("M8[D]")
+        return list(names), records
+
+
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+
+def load_state(path=FEATURE_STATE_PATH, last_n=5):
+    """
+    Load a saved state, or None if missing or built for a different window size.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        state = joblib.load(path)
+    except Exception as e:
+        print("[feature_state] could not load state, rebuilding:", e)
+        return None
+    if not isinstance(state, FeatureState) or state.last_n != last_n:
+        return None
+    if any(len(entry) != 4 for entry in state.pending.values()):
+        # saved before pending entries kept their scores: the sums cannot be adjusted exactly
+        print("[feature_state] state predates the pending score format, rebuilding")
+        return None
+    return state
+
+
+def save_state(state, path=FEATURE_STATE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    joblib.dump(state, tmp)
+    os.replace(tmp, path)
+
+
+def update_feature_state(path=FEATURE_STATE_PATH, last_n=5):
+    """
+    Load (or bootstrap) the state at path, advance it by the new rows in the DB and save it back.
+    Returns (state, changed) where changed is the number of matches folded in by this call.
+    """
+    init_db()
+    state = load_state(path, last_n=last_n)
+    with ReaderSession() as session:
+        if state is None:
+            state = FeatureState(last_n=last_n)
+            state.bootstrap(session)
+            changed = state.n_matches
+        else:
+            changed = state.advance(session)
+    if changed:
+        save_state(state, path)
+    return state, changed
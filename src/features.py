@@ -2,13 +2,31 @@
 Feature engineering: compute recent team statistics (last N matches).
 Implements an online-style pass over the matches sorted by date; for each match
 we compute features based on previous matches only.
+
+Two engines produce the same output:
+  - "vectorized" (default): reshapes matches into a per-team long table and computes
+    the shifted windows with grouped prefix sums, on integer team codes (the DB team ids when
+    the loader's home_team_id / away_team_id columns are present).
+  - "loop": the original row-by-row pass, kept as a reference implementation.
+  - "parallel": the vectorized engine run per connected group of teams in worker processes
+    (src/parallel_features.py), identical output.
 """
 from collections import defaultdict, deque
 import pandas as pd
 import numpy as np
 
+from src.metrics import span
+
+DEFAULT_ENGINE = "vectorized"
+
+# features used for modeling
+FEATURE_COLUMNS = [
+    "home_avg_scored", "home_avg_conceded", "home_form",
+    "away_avg_scored", "away_avg_conceded", "away_form",
+]
 
-def compute_recent_stats(df, last_n=5):
+
+def compute_recent_stats(df, last_n=5, engine=DEFAULT_ENGINE):
     """
     Input:
       df: DataFrame with columns ['date','home_team','away_team','home_score','away_score','league']
@@ -18,10 +36,28 @@ def compute_recent_stats(df, last_n=5):
         - avg_scored / avg_conceded: mean over last_n matches (NaN replaced by global mean)
         - form: sum of outcomes where win=1, draw=0, loss=-1 over last_n matches
       team_stats: dict mapping team -> latest stats dict (used by API for predictions)
+
+    engine: "vectorized", "parallel" (multi-process, same output) or "loop" (reference implementation,
+    used for equivalence checks)
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown features engine {engine!r}, expected one of {sorted(ENGINES)}")
+    with span("compute_recent_stats") as s:
+        s.rows = len(df)
+        return ENGINES[engine](_prepare(df), last_n)
+
+
+def _prepare(df):
+    """
+    Copy, parse dates and sort by date. The sort is stable so matches on the same day keep
+    the order they were loaded in (date, id from the DB loader).
     """
     df = df.copy()
     df['date'] = pd.to_datetime(df['date'])
-    df = df.sort_values('date').reset_index(drop=True)
+    return df.sort_values('date', kind='mergesort').reset_index(drop=True)
+
+
+def _compute_recent_stats_loop(df, last_n):
 
     # structures to keep last_n values per team
     goals_scored = defaultdict(lambda: deque(maxlen=last_n))
@@ -120,3 +156,193 @@ def compute_recent_stats(df, last_n=5):
         }
 
     return df, team_stats
+
+
+def _compute_recent_stats_vectorized(df, last_n):
+    hs = df['home_score'].to_numpy(dtype=float)
+    aa = df['away_score'].to_numpy(dtype=float)
+    home_codes, away_codes, names = team_codes(df)
+    raw, last = window_features(home_codes, away_codes, hs, aa, last_n, len(names))
+    for col, values in raw.items():
+        df[col] = values
+
+    fallback_scored, fallback_conceded = global_means(hs, aa)
+    fallback_form = 0.0
+    fill_fallbacks(df, fallback_scored, fallback_conceded, fallback_form)
+
+    # target: 0 home win, 1 draw, 2 away win
+    df['target'] = np.where(hs > aa, 0, np.where(hs == aa, 1, 2)).astype(np.int64)
+
+    return df, team_stats_from_windows(last, names)
+
+
+def _compute_recent_stats_parallel(df, last_n):
+    from src.parallel_features import map_team_components, recent_stats_part, FEATURE_WORKERS
+
+    hs = df['home_score'].to_numpy(dtype=float)
+    aa = df['away_score'].to_numpy(dtype=float)
+    raw, team_stats = map_team_components(df, recent_stats_part, (last_n,), FEATURE_WORKERS)
+    for col in FEATURE_COLUMNS:
+        df[col] = raw[col]
+
+    fallback_scored, fallback_conceded = global_means(hs, aa)
+    fill_fallbacks(df, fallback_scored, fallback_conceded, 0.0)
+
+    # target: 0 home win, 1 draw, 2 away win
+    df['target'] = np.where(hs > aa, 0, np.where(hs == aa, 1, 2)).astype(np.int64)
+    return df, team_stats
+
+
+def team_codes(df):
+    """
+    Integer team codes for the home and away columns plus the code -> name array.
+
+    When the DB loader's home_team_id / away_team_id columns are present they are used as codes
+    directly (state arrays are then indexed by team id, with None for ids not in df); otherwise
+    the names are factorized.
+    """
+    if 'home_team_id' in df and 'away_team_id' in df:
+        home = df['home_team_id'].to_numpy(dtype=np.int64)
+        away = df['away_team_id'].to_numpy(dtype=np.int64)
+        n_teams = int(max(home.max(initial=-1), away.max(initial=-1))) + 1
+        names = np.full(n_teams, None, dtype=object)
+        for ids, col in ((home, 'home_team'), (away, 'away_team')):
+            # one name lookup per distinct id
+            unique_ids, first = np.unique(ids, return_index=True)
+            names[unique_ids] = df[col].to_numpy()[first]
+        return home, away, names
+    codes, uniques = pd.factorize(np.concatenate([df['home_team'].to_numpy(), df['away_team'].to_numpy()]))
+    n = len(df)
+    return codes[:n], codes[n:], np.asarray(uniques, dtype=object)
+
+
+def team_stats_from_windows(last, names):
+    """
+    Build the team_stats dict (keyed by name, the API boundary) from per-code window arrays.
+    """
+    team_stats = {}
+    for code in np.flatnonzero(last["matches"] > 0):
+        team_stats[names[code]] = {
+            "avg_scored": float(last["avg_scored"][code]),
+            "avg_conceded": float(last["avg_conceded"][code]),
+            "form": float(last["form"][code]),
+        }
+    return team_stats
+
+
+def window_features(home, away, home_score, away_score, last_n, n_teams):
+    """
+    Vectorized core of compute_recent_stats.
+
+    home/away: integer team codes in [0, n_teams), one entry per match in date order
+    home_score/away_score: float arrays aligned with home/away
+    Returns:
+      raw: dict column -> float array of pre-match features (NaN when the team has no history yet)
+      last: dict stat -> array of length n_teams with each team's stats over its last_n matches
+            (NaN for codes without matches), plus "matches": the size of each team's final window
+    """
+    n = len(home)
+    # long table: one row per (match, side); home rows at even, away rows at odd positions,
+    # so a stable sort by team keeps every team's rows in match order
+    codes = np.empty(2 * n, dtype=np.int64)
+    codes[0::2] = home
+    codes[1::2] = away
+    scored = np.empty(2 * n, dtype=float)
+    scored[0::2] = home_score
+    scored[1::2] = away_score
+    conceded = np.empty(2 * n, dtype=float)
+    conceded[0::2] = away_score
+    conceded[1::2] = home_score
+    outcome = match_outcome(scored, conceded)
+
+    order = np.argsort(codes, kind='stable')
+    sorted_codes = codes[order]
+    all_codes = np.arange(n_teams)
+    team_start = np.searchsorted(sorted_codes, all_codes, side='left')
+    team_end = np.searchsorted(sorted_codes, all_codes, side='right')
+
+    pos = np.arange(2 * n)
+    # number of previous matches of the same team, capped at the window size
+    window = np.minimum(pos - team_start[sorted_codes], last_n)
+    # size of each team's final window (state after its last match)
+    team_window = np.minimum(team_end - team_start, last_n)
+
+    raw_long = {}
+    last = {"matches": team_window}
+    for name, values in (("avg_scored", scored), ("avg_conceded", conceded), ("form", outcome)):
+        prefix = WindowPrefix(values[order])
+        sums = prefix.sums(pos, window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            feat = sums if name == "form" else sums / window
+        feat = np.where(window > 0, feat, np.nan)
+        out = np.empty(2 * n)
+        out[order] = feat
+        raw_long[name] = out
+
+        team_sums = prefix.sums(team_end, team_window)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            team_last = team_sums if name == "form" else team_sums / team_window
+        last[name] = np.where(team_window > 0, team_last, np.nan)
+
+    raw = {}
+    for name, values in raw_long.items():
+        raw[f"home_{name}"] = values[0::2]
+        raw[f"away_{name}"] = values[1::2]
+    raw = {col: raw[col] for col in FEATURE_COLUMNS}
+    return raw, last
+
+
+def match_outcome(scored, conceded):
+    """
+    1 win, 0 draw, -1 loss; a missing score counts as a draw, as in the loop engine.
+    """
+    return np.nan_to_num(np.sign(scored - conceded), nan=0.0)
+
+
+class WindowPrefix:
+    """
+    Prefix sums over entries sorted by team, for sums over windows that never cross a team boundary.
+
+    A NaN entry makes every window containing it NaN (np.mean over a window with a NaN, as in the
+    loop engine) without leaking into later windows: NaNs are summed as 0 and counted separately.
+    """
+
+    def __init__(self, sorted_values):
+        m = len(sorted_values)
+        missing = np.isnan(sorted_values)
+        self.prefix = np.zeros(m + 1)
+        np.cumsum(np.where(missing, 0.0, sorted_values), out=self.prefix[1:])
+        self.missing = np.zeros(m + 1, dtype=np.int64)
+        np.cumsum(missing, out=self.missing[1:])
+
+    def sums(self, end, window):
+        """
+        Sum of the `window` entries before position `end` (elementwise).
+        """
+        sums = self.prefix[end] - self.prefix[end - window]
+        return np.where(self.missing[end] - self.missing[end - window] > 0, np.nan, sums)
+
+
+def global_means(home_score, away_score):
+    """
+    Global fallback means used to fill missing history (scored and conceded means coincide,
+    both are computed over every score in the history).
+    """
+    if len(home_score) == 0:
+        return 1.0, 1.0
+    mean = float((np.sum(home_score) + np.sum(away_score)) / (2 * len(home_score)))
+    return mean, mean
+
+
+def fill_fallbacks(df, fallback_scored, fallback_conceded, fallback_form=0.0):
+    for side in ("home", "away"):
+        df[f"{side}_avg_scored"] = df[f"{side}_avg_scored"].fillna(fallback_scored)
+        df[f"{side}_avg_conceded"] = df[f"{side}_avg_conceded"].fillna(fallback_conceded)
+        df[f"{side}_form"] = df[f"{side}_form"].fillna(fallback_form)
+
+
+ENGINES = {
+    "loop": _compute_recent_stats_loop,
+    "vectorized": _compute_recent_stats_vectorized,
+    "parallel": _compute_recent_stats_parallel,
+}
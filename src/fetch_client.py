@@ -0,0 +1,291 @@
+"""
+HTTP client for the football-data matches endpoint used by src/live_fetcher.py.
+
+- one pooled requests.Session (keep-alive connections reused across polls and threads)
+- a date range is split into per-day shards fetched concurrently by a small thread pool
+- a shared token-bucket rate limit across all threads (FETCH_RATE_PER_MINUTE)
+- conditional requests: the ETag / Last-Modified of every shard is kept with its body in a local
+  response cache, so a day that did not change costs a 304 and no download or JSON parse; a 304
+  the cache cannot answer (entry gone, or sent by a proxy) is retried unconditionally. The cache
+  keeps at most FETCH_CACHE_MAX_ENTRIES entries in memory (least recently used are dropped) and
+  deletes files not written for FETCH_CACHE_MAX_AGE_DAYS
+- retries with exponential backoff on 429 / 5xx / connection errors, honouring Retry-After
+
+Usage:
+  client = FetchClient("http://127.0.0.1:8099/v4/matches")   # e.g. src/fake_football_api.py
+  matches = client.fetch_range("2024-05-01", "2024-05-03")   # list of raw match dicts
+  print(client.last_stats)   # {"shards": 3, "downloaded": 1, "not_modified": 2, "retries": 0}
+"""
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.artifact_io import atomic_write_bytes
+
+FETCH_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", "data/fetch_cache")
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", "4"))
+# football-data.org free tier allows 10 requests / minute
+FETCH_RATE_PER_MINUTE = float(os.environ.get("FETCH_RATE_PER_MINUTE", "10"))
+FETCH_RATE_BURST = int(os.environ.get("FETCH_RATE_BURST", "10"))
+FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", "4"))
+FETCH_BACKOFF_SECONDS = float(os.environ.get("FETCH_BACKOFF_SECONDS", "1"))
+FETCH_MAX_BACKOFF_SECONDS = float(os.environ.get("FETCH_MAX_BACKOFF_SECONDS", "60"))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+FETCH_CACHE_MAX_ENTRIES = int(os.environ.get("FETCH_CACHE_MAX_ENTRIES", "512"))
+FETCH_CACHE_MAX_AGE_DAYS = float(os.environ.get("FETCH_CACHE_MAX_AGE_DAYS", "30"))
+# how often put() looks for expired cache files
+PRUNE_INTERVAL_SECONDS = 3600
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def day_shards(date_from, date_to):
+    """
+    ISO dates of every day in [date_from, date_to] (inclusive).
+    """
+    start, end = date.fromisoformat(str(date_from)), date.fromisoformat(str(date_to))
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket: acquire() blocks until a request may be sent.
+    rate_per_minute <= 0 disables limiting.
+    """
+
+    def __init__(self, rate_per_minute=FETCH_RATE_PER_MINUTE, burst=FETCH_RATE_BURST):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ResponseCache:
+    """
+    Validators and bodies of previous responses, one JSON file per request key under directory
+    (in memory only when directory is None). At most max_entries entries are kept in memory, least
+    recently used first out; files older than max_age_days are deleted (0 keeps them forever).
+    """
+
+    def __init__(self, directory=FETCH_CACHE_DIR, max_entries=FETCH_CACHE_MAX_ENTRIES,
+                 max_age_days=FETCH_CACHE_MAX_AGE_DAYS):
+        self.directory = directory
+        self.max_entries = max(1, max_entries)
+        self.max_age = max_age_days * 86400
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    @staticmethod
+    def key(url, params):
+        raw = url + "?" + "&".join(f"{k}={params[k]}" for k in sorted(params))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def _keep(self, key, entry):
+        # caller holds self._lock
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        if self.directory is None or not os.path.exists(self._path(key)):
+            return None
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._keep(key, entry)
+        return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            self._keep(key, entry)
+        if self.directory is not None:
+            atomic_write_bytes(self._path(key), json.dumps(entry).encode())
+            if time.monotonic() - self._pruned_at > PRUNE_INTERVAL_SECONDS:
+                self.prune()
+
+    def prune(self):
+        """
+        Delete cache files not written for max_age_days. Returns the number of deleted files.
+        """
+        self._pruned_at = time.monotonic()
+        if self.directory is None or self.max_age <= 0 or not os.path.isdir(self.directory):
+            return 0
+        expired = time.time() - self.max_age
+        deleted = 0
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.endswith(".json") and entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+                    deleted += 1
+            except OSError:
+                continue
+        with self._lock:
+            for key in [k for k in self._entries if not os.path.exists(self._path(k))]:
+                del self._entries[key]
+        return deleted
+
+
+class FetchClient:
+    def __init__(self, url, token=None, cache=None, rate_limiter=None, max_workers=FETCH_MAX_WORKERS,
+                 max_retries=FETCH_MAX_RETRIES, backoff=FETCH_BACKOFF_SECONDS, timeout=FETCH_TIMEOUT):
+        self.url = url
+        self.cache = cache if cache is not None else ResponseCache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_workers = max(1, max_workers)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if token:
+            self.session.headers["X-Auth-Token"] = token
+        self.last_stats = {}
+        self._stats_lock = threading.Lock()
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, stats, name):
+        with self._stats_lock:
+            stats[name] += 1
+
+    def _retry_delay(self, resp, attempt):
+        if resp is not None:
+            # football-data sends X-RequestCounter-Reset (seconds) on 429
+            for header in ("Retry-After", "X-RequestCounter-Reset"):
+                value = resp.headers.get(header)
+                if value and value.strip().isdigit():
+                    return min(float(value), FETCH_MAX_BACKOFF_SECONDS)
+        delay = self.backoff * (2 ** attempt)
+        return min(delay + random.uniform(0, delay / 2), FETCH_MAX_BACKOFF_SECONDS)
+
+    def _get(self, params, headers, stats):
+        """
+        GET with rate limiting and retries; returns the last response.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            resp = None
+            try:
+                resp = self.session.get(self.url, params=params, headers=headers, timeout=self.timeout)
+                retry = resp.status_code in RETRY_STATUSES
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                retry = True
+            if not retry or attempt >= self.max_retries:
+                break
+            delay = self._retry_delay(resp, attempt)
+            print(f"[fetch_client] {resp.status_code if resp is not None else 'connection error'} "
+                  f"for {params}, retrying in {delay:.1f}s")
+            self._count(stats, "retries")
+            time.sleep(delay)
+            attempt += 1
+        return resp
+
+    def get_json(self, params, stats=None):
+        """
+        Conditional GET of self.url with params; returns the decoded JSON body (from the cache on 304).
+        """
+        stats = stats if stats is not None else {"downloaded": 0, "not_modified": 0, "retries": 0}
+        key = self.cache.key(self.url, params)
+        cached = self.cache.get(key)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        resp = self._get(params, headers, stats)
+        if resp.status_code == 304:
+            if cached and "body" in cached:
+                self._count(stats, "not_modified")
+                return cached["body"]
+            # nothing to answer the 304 with: ask for the full body
+            print(f"[fetch_client] 304 without a cached body for {params}, refetching")
+            resp = self._get(params, {"Cache-Control": "no-cache"}, stats)
+            if resp.status_code == 304:
+                raise requests.HTTPError(f"304 Not Modified for an unconditional request {params}", response=resp)
+        resp.raise_for_status()
+        body = resp.json()
+        self._count(stats, "downloaded")
+        if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+            self.cache.put(key, {
+                "etag": resp.headers.get("ETag"),
+                "last_modified": resp.headers.get("Last-Modified"),
+                "params": params,
+                "body": body,
+            })
+        return body
+
+    def fetch_day(self, day, stats=None):
+        return self.get_json({"dateFrom": day, "dateTo": day}, stats).get("matches", [])
+
+    def fetch_range(self, date_from, date_to):
+        """
+        Raw match dicts for [date_from, date_to], fetched as concurrent per-day shards.
+        """
+        return self.fetch_days(day_shards(date_from, date_to))
+
+    def fetch_days(self, days):
+        """
+        Raw match dicts for a list of ISO days, one concurrent shard per day.
+        Matches returned by several shards (same API id) are kept once.
+        """
+        stats = {"downloaded": 0, "not_modified": 0, "retries": 0}
+        if len(days) <= 1 or self.max_workers == 1:
+            shards = [self.fetch_day(d, stats) for d in days]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(days))) as pool:
+                shards = list(pool.map(lambda d: self.fetch_day(d, stats), days))
+        matches, seen = [], set()
+        for shard in shards:
+            for m in shard:
+                mid = m.get("id")
+                if mid is not None:
+                    if mid in seen:
+                        continue
+                    seen.add(mid)
+                matches.append(m)
+        self.last_stats = {"shards": len(days), **stats}
+        return matches
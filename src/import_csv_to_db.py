@@ -5,14 +5,26 @@ This script:
  - creates tables if they don't exist
  - reads CSV (if present)
  - inserts rows skipping duplicates (based on date, home_team, away_team)
+
+The default bulk mode streams the CSV in chunks, parses dates and scores vectorially and inserts
+each chunk with multi-row INSERT statements that ignore conflicts on uix_date_home_away, so memory
+stays bounded by the chunk size. The row-by-row mode (bulk=False) is kept for reference.
+
+The DB stack (SQLAlchemy, models, interning) is imported by the functions that write, after the CSV
+is found, so a run without a CSV exits without loading it.
+
+Usage:
+  python -m src.import_csv_to_db [path] [--chunk-size N] [--row-by-row]
 """
 import os
+import argparse
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from src.db import init_db, SessionLocal
-from src.models import Match
+from src.metrics import span, inc
 
 CSV_PATH = "data/matches.csv"
+CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "50000"))
 
 
 def parse_row_to_match(row):
@@ -33,39 +45,165 @@ def parse_row_to_match(row):
     }
 
 
-def import_csv(path=CSV_PATH):
+def parse_chunk(chunk):
+    """
+    Vectorized counterpart of parse_row_to_match for a chunk read with dtype=str.
+    Returns (frame, n_invalid): frame holds the valid rows with typed columns; rows with an
+    unparsable date, a missing team or a non-numeric or non-integral score are counted as invalid.
+    """
+    chunk = chunk.fillna("")
+    raw_dates = chunk["date"].str.strip()
+    dates = pd.to_datetime(raw_dates, format="%Y-%m-%d", errors="coerce")
+    # fall back to per-value parsing only for values not in ISO format
+    odd = dates.isna() & (raw_dates != "")
+    if odd.any():
+        dates[odd] = pd.to_datetime(raw_dates[odd].map(_parse_date_or_none), errors="coerce")
+
+    scores = {}
+    bad_score = np.zeros(len(chunk), dtype=bool)
+    for col in ("home_score", "away_score"):
+        raw = chunk[col].str.strip() if col in chunk else pd.Series("", index=chunk.index)
+        values = pd.to_numeric(raw.where(raw != ""), errors="coerce")
+        # "1.5" or "inf" would make the Int64 cast below raise for the whole chunk
+        bad = (values.isna() & (raw != "")) | (values.notna() & (values % 1 != 0))
+        bad_score |= bad.to_numpy()
+        scores[col] = values.where(~bad)
+
+    home = chunk["home_team"].astype(str)
+    away = chunk["away_team"].astype(str)
+    valid = (dates.notna() & (home != "") & (away != "")).to_numpy() & ~bad_score
+
+    league = chunk["league"] if "league" in chunk else pd.Series("", index=chunk.index)
+    frame = pd.DataFrame({
+        "date": dates.dt.date,
+        "home_team": home,
+        "away_team": away,
+        "home_score": scores["home_score"].astype("Int64"),
+        "away_score": scores["away_score"].astype("Int64"),
+        "league": league.where(league != ""),
+    })[valid]
+    return frame, int((~valid).sum())
+
+
+def _parse_date_or_none(value):
+    try:
+        return pd.to_datetime(value)
+    except Exception:
+        return None
+
+
+def import_frame(session, frame, drop_archived_rows=True):
+    """
+    Insert a parsed matches frame (date, home_team, away_team, home_score, away_score, league names)
+    with conflict-ignoring INSERTs in the caller's session and journal the inserted rows in the same
+    transaction. Rows dated before the archive cutoff are skipped; pass drop_archived_rows=False
+    when the caller already dropped them. Returns the number of inserted rows.
+    """
+    from src.db import insert_ignore_returning, frame_to_rows
+    from src.models import Match
+    from src.interning import encode_matches
+    from src.change_journal import record_changes
+    from src.archive import drop_archived
+
+    if drop_archived_rows:
+        frame = drop_archived(session, frame)
+    records = frame_to_rows(encode_matches(session, frame))
+    inserted = insert_ignore_returning(session, Match.__table__, records, [Match.__table__.c.id])
+    return record_changes(session, "insert", [row.id for row in inserted])
+
+
+def import_csv_bulk(path=CSV_PATH, chunk_size=CHUNK_SIZE):
+    """
+    Stream the CSV in chunks of chunk_size rows and insert each chunk with conflict-ignoring
+    multi-row INSERTs. Returns a dict with inserted / skipped (duplicates) / archived (dated before
+    the archive cutoff) / invalid counts.
+    """
+    counts = {"inserted": 0, "skipped": 0, "archived": 0, "invalid": 0}
+    if not os.path.exists(path):
+        print("No CSV found at", path)
+        return counts
+
+    from src.db import init_db, WriterSession
+    from src.archive import drop_archived
+
     init_db()
+
+    with span("import_csv") as s, WriterSession() as session:
+        for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size):
+            frame, invalid = parse_chunk(chunk)
+            current = drop_archived(session, frame)
+            inserted = import_frame(session, current, drop_archived_rows=False)
+            session.commit()
+            counts["inserted"] += inserted
+            counts["skipped"] += len(current) - inserted
+            counts["archived"] += len(frame) - len(current)
+            counts["invalid"] += invalid
+            s.rows += len(chunk)
+    for key, value in counts.items():
+        inc(f"import_rows_{key}", value)
+    print(
+        f"Imported {counts['inserted']} rows into DB "
+        f"({counts['skipped']} duplicates skipped, {counts['archived']} archived rows skipped, "
+        f"{counts['invalid']} invalid rows)"
+    )
+    return counts
+
+
+def import_csv(path=CSV_PATH, bulk=True, chunk_size=CHUNK_SIZE):
+    """
+    Import the CSV at path and return the number of inserted rows.
+    bulk=False uses the original row-by-row path (one lookup query per row).
+    """
+    if bulk:
+        return import_csv_bulk(path, chunk_size=chunk_size)["inserted"]
+
     if not os.path.exists(path):
         print("No CSV found at", path)
         return 0
 
+    from src.db import init_db, WriterSession
+    from src.models import Match
+    from src.interning import teams, leagues
+    from src.change_journal import record_changes
+    from src.archive import archive_cutoff
+
+    init_db()
+
     df = pd.read_csv(path, dtype=str)
     df = df.fillna("")
 
     inserted = 0
-    with SessionLocal() as session:
+    with WriterSession() as session:
+        cutoff = archive_cutoff(session)
         for _, r in df.iterrows():
             m = parse_row_to_match(r)
             if m["date"] is None:
                 # skip rows without valid date
                 continue
+            if cutoff is not None and m["date"] < cutoff:
+                # already archived
+                continue
+            home_id, away_id = teams.ids_for(session, [m["home_team"], m["away_team"]])
             # check exists
             exists = session.query(Match).filter(
                 Match.date == m["date"],
-                Match.home_team == m["home_team"],
-                Match.away_team == m["away_team"],
+                Match.home_team_id == int(home_id),
+                Match.away_team_id == int(away_id),
             ).first()
             if exists:
                 continue
+            league_id = leagues.ids_for(session, [m["league"]])[0]
             obj = Match(
                 date=m["date"],
-                home_team=m["home_team"],
-                away_team=m["away_team"],
+                home_team_id=int(home_id),
+                away_team_id=int(away_id),
                 home_score=m["home_score"],
                 away_score=m["away_score"],
-                league=m["league"],
+                league_id=int(league_id) if league_id >= 0 else None,
             )
             session.add(obj)
+            session.flush()
+            record_changes(session, "insert", [obj.id])
             inserted += 1
         session.commit()
     print(f"Imported {inserted} rows into DB")
@@ -73,4 +211,9 @@ def import_csv(path=CSV_PATH):
 
 
 if __name__ == "__main__":
-    import_csv()
+    parser = argparse.ArgumentParser(description="Import a matches CSV into the DB")
+    parser.add_argument("path", nargs="?", default=CSV_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--row-by-row", action="store_true", help="use the legacy per-row import")
+    args = parser.parse_args()
+    import_csv(args.path, bulk=not args.row_by_row, chunk_size=args.chunk_size)
@@ -0,0 +1,181 @@
+"""
+In-process interning cache for dictionary-encoded names (teams, leagues).
+
+The DB stores integer ids; the loader, compute_recent_stats, the feature state and the fetcher work
+on those ids. Names are resolved back only at the API boundary (team_stats artifacts, df_meta).
+
+Names interned by a write session are only visible to that session until it commits: their ids are
+kept pending per session and enter the shared cache on commit; a rollback discards them and
+invalidates the cache, so rolled-back ids (which SQLite hands out again) are never cached.
+
+Usage:
+  from src.interning import teams
+  ids = teams.ids_for(session, ["Arsenal", "Chelsea"])   # interns unknown names
+  names = teams.names_for(ids)
+"""
+import threading
+import weakref
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, event
+from sqlalchemy.orm import Session
+
+from src.db import ReaderSession, insert_ignore_rows
+from src.models import Team, League
+
+
+_CACHES = []
+
+
+class NameCache:
+    def __init__(self, table):
+        self.table = table
+        self._ids = {}  # name -> id
+        self._names = np.empty(1, dtype=object)  # id -> name (None for unknown ids)
+        self._pending = weakref.WeakKeyDictionary()  # session -> {name: id} interned, not yet committed
+        self._lock = threading.Lock()
+        _CACHES.append(self)
+
+    def _remember(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        max_id = max(row_id for row_id, _ in rows)
+        if max_id >= len(self._names):
+            grown = np.empty(max(max_id + 1, 2 * len(self._names)), dtype=object)
+            grown[:len(self._names)] = self._names
+            self._names = grown
+        for row_id, name in rows:
+            self._ids[name] = row_id
+            self._names[row_id] = name
+
+    def _select(self, session, names):
+        q = select(self.table.c.id, self.table.c.name)
+        rows = []
+        for start in range(0, len(names), 500):
+            rows += session.execute(q.where(self.table.c.name.in_(names[start:start + 500]))).all()
+        return rows
+
+    def _load(self, session, names=None):
+        if names is None:
+            self._remember(session.execute(select(self.table.c.id, self.table.c.name)))
+            return
+        self._remember(self._select(session, names))
+
+    def _commit(self, session):
+        with self._lock:
+            pending = self._pending.pop(session, None)
+            if pending:
+                self._remember((row_id, name) for name, row_id in pending.items())
+
+    def _rollback(self, session):
+        with self._lock:
+            pending = self._pending.pop(session, None)
+        if pending:
+            self.invalidate()
+
+    def refresh(self, session=None):
+        """
+        Reload the whole dictionary (e.g. after another process added names).
+        """
+        with self._lock:
+            if session is None:
+                with ReaderSession() as own:
+                    self._load(own)
+            else:
+                self._load(session)
+
+    def invalidate(self):
+        """
+        Forget everything, e.g. after the transaction that interned new names was rolled back.
+        """
+        with self._lock:
+            self._ids = {}
+            self._names = np.empty(1, dtype=object)
+
+    def ids_for(self, session, names, create=True):
+        """
+        Map an array-like of names to an int64 array of ids. Unknown names are inserted in the
+        caller's session when create=True, otherwise they map to -1. Missing names (None/NaN) map to -1.
+        """
+        codes, uniques = pd.factorize(pd.Series(names, dtype=object))
+        uniques = [str(u) for u in uniques]
+        with self._lock:
+            pending = self._pending.get(session, {})
+            missing = [u for u in uniques if u not in self._ids and u not in pending]
+            if missing:
+                self._load(session, missing)
+                missing = [u for u in missing if u not in self._ids]
+            if missing and create:
+                insert_ignore_rows(session, self.table, [{"name": u} for u in missing])
+                # visible to this session only until it commits
+                pending = self._pending.setdefault(session, {})
+                pending.update((name, row_id) for row_id, name in self._select(session, missing))
+            unique_ids = np.array([self._ids.get(u, pending.get(u, -1)) for u in uniques] + [-1], dtype=np.int64)
+        # factorize marks missing values with -1, which picks the trailing -1 sentinel
+        return unique_ids[codes]
+
+    def lookup(self, names, session=None):
+        """
+        Ids of already known names (no inserts), -1 for unknown ones.
+        """
+        if session is None:
+            with ReaderSession() as own:
+                return self.ids_for(own, names, create=False)
+        return self.ids_for(session, names, create=False)
+
+    def names_for(self, ids):
+        """
+        Map an array-like of ids to an object array of names (None for -1), refreshing from the DB
+        if an id is not cached yet.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids.size and (ids.max() >= len(self._names) or pd.isna(self._names[ids[ids >= 0]]).any()):
+            self.refresh()
+        names = np.empty(len(ids), dtype=object)
+        known = ids >= 0
+        names[known] = self._names[ids[known]]
+        return names
+
+    def categorical(self, ids, missing="Unknown"):
+        """
+        Build a pandas Categorical of names from an id array without materializing one string per
+        row: categories are the distinct ids' names, codes index into them. -1 maps to missing.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        distinct = np.unique(ids)
+        names = self.names_for(distinct)
+        names[distinct < 0] = missing
+        name_codes, categories = pd.factorize(names)
+        codes = name_codes[np.searchsorted(distinct, ids)]
+        return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype=object))
+
+
+teams = NameCache(Team.__table__)
+leagues = NameCache(League.__table__)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_interned(session):
+    for cache in _CACHES:
+        cache._commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_interned(session):
+    for cache in _CACHES:
+        cache._rollback(session)
+
+
+def encode_matches(session, df):
+    """
+    Replace the home_team / away_team / league name columns of a matches DataFrame by
+    home_team_id / away_team_id / league_id, interning unknown names in the caller's session.
+    """
+    out = df.drop(columns=[c for c in ("home_team", "away_team", "league") if c in df])
+    out["home_team_id"] = teams.ids_for(session, df["home_team"])
+    out["away_team_id"] = teams.ids_for(session, df["away_team"])
+    if "league" in df:
+        league_ids = leagues.ids_for(session, df["league"])
+        out["league_id"] = pd.Series(league_ids, index=df.index).where(league_ids >= 0).astype("Int64")
+    return out
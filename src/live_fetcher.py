@@ -1,36 +1,76 @@
 """
 Polling fetcher adapted to insert into the DB (SQLAlchemy) instead of appending CSV.
 
-It keeps the fetch_matches() function (unchanged) and replaces append_matches with insert_matches_db().
+fetch_matches() goes through a shared FetchClient (src/fetch_client.py): pooled connections,
+concurrent per-day shards under a rate limit, conditional requests with a local response cache and
+backoff on 429 / 5xx. Point FOOTBALL_DATA_URL at src/fake_football_api.py to run against a local
+stand-in. insert_matches_db() is a batched upsert that returns separate inserted/updated counts and
+journals both in the same transaction (src/change_journal.py).
+
+pandas, requests and the DB stack are imported by the functions that use them, so importing this
+module (live_updater does it at startup) is cheap and a fetch that returns nothing never loads
+SQLAlchemy.
 """
 import os
-import requests
-import pandas as pd
+import threading
 from datetime import datetime, timedelta
 
-from src.db import init_db, SessionLocal
-from src.models import Match
+from src.metrics import span, inc
 
-API_URL = "https://api.football-data.org/v4/matches"
+API_URL = os.environ.get("FOOTBALL_DATA_URL", "https://api.football-data.org/v4/matches")
 TOKEN = os.environ.get("FOOTBALL_DATA_TOKEN")  # set this in your environment
 
+_client = None
+_client_lock = threading.Lock()
 
-def fetch_matches(date_from: str, date_to: str):
+
+def get_client():
+    """
+    Process-wide FetchClient (pooled session, response cache, rate limit), created on first use.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            from src.fetch_client import FetchClient
+
+            _client = FetchClient(API_URL, token=TOKEN)
+        return _client
+
+
+def fetch_matches(date_from: str, date_to: str, client=None):
     """
     date_from/date_to: ISO date strings YYYY-MM-DD
     Returns: DataFrame with columns date, home_team, away_team, home_score, away_score, league
+    The range is fetched as concurrent conditional per-day requests, see src/fetch_client.py.
     """
-    headers = {}
-    if TOKEN:
-        headers["X-Auth-Token"] = TOKEN
+    from src.fetch_client import day_shards
 
-    params = {"dateFrom": date_from, "dateTo": date_to}
-    resp = requests.get(API_URL, headers=headers, params=params, timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+    return fetch_matches_for_days(day_shards(date_from, date_to), client=client)
+
+
+def fetch_matches_for_days(days, client=None):
+    """
+    Like fetch_matches, for an explicit list of ISO days (need not be contiguous).
+    """
+    client = client or get_client()
+    matches = client.fetch_days(days)
+    stats = client.last_stats
+    print(
+        f"[live_fetcher] {stats['shards']} day shards: {stats['downloaded']} downloaded, "
+        f"{stats['not_modified']} not modified, {stats['retries']} retries"
+    )
+    return matches_to_frame(matches)
+
+
+def matches_to_frame(matches):
+    """
+    football-data match dicts -> DataFrame with columns date, home_team, away_team, home_score,
+    away_score, league
+    """
+    import pandas as pd
 
     rows = []
-    for m in data.get("matches", []):
+    for m in matches:
         utc = m.get("utcDate")
         hteam = m.get("homeTeam", {}).get("name") or m.get("homeTeam", {}).get("shortName") or str(m.get("homeTeam", {}).get("id", ""))
         ateam = m.get("awayTeam", {}).get("name") or m.get("awayTeam", {}).get("shortName") or str(m.get("awayTeam", {}).get("id", ""))
@@ -58,60 +98,109 @@ def fetch_matches(date_from: str, date_to: str):
             "league": comp
         })
 
-    df = pd.DataFrame(rows)
+    df = pd.DataFrame(rows, columns=["date", "home_team", "away_team", "home_score", "away_score", "league"])
     return df
 
 
+def _normalize_fetched(df_new):
+    """
+    Parse a fetched DataFrame into typed columns, dropping rows without a valid date and keeping the
+    last occurrence of each (date, home_team, away_team) key.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "date": pd.to_datetime(df_new["date"], errors="coerce").dt.date,
+        "home_team": df_new["home_team"].astype(str),
+        "away_team": df_new["away_team"].astype(str),
+        "home_score": pd.to_numeric(df_new.get("home_score"), errors="coerce").astype("Int64"),
+        "away_score": pd.to_numeric(df_new.get("away_score"), errors="coerce").astype("Int64"),
+        "league": df_new["league"] if "league" in df_new else None,
+    })
+    df = df[df["date"].notna()]
+    return df.drop_duplicates(["date", "home_team", "away_team"], keep="last")
+
+
 def insert_matches_db(df_new):
     """
-    Insert matches into the DB, avoiding duplicates using the unique constraint check.
-    Returns the number of inserted rows.
+    Upsert fetched matches into the DB in a few set-based statements:
+     - one query loads the existing keys for the fetched date range
+     - new rows are inserted with multi-row conflict-ignoring INSERTs
+     - rows whose scores went from NULL to known are updated with one executemany UPDATE
+    Returns a dict with the number of "inserted" and "updated" rows.
     """
+    with span("insert_matches_db") as s:
+        s.rows = len(df_new)
+        counts = _insert_matches_db(df_new)
+    inc("matches_inserted", counts["inserted"], source="live")
+    inc("matches_updated", counts["updated"], source="live")
+    return counts
+
+
+def _insert_matches_db(df_new):
+    counts = {"inserted": 0, "updated": 0}
     if df_new.empty:
-        return 0
+        return counts
+
+    import pandas as pd
+    from sqlalchemy import select, update, bindparam, or_
+    from src.db import init_db, WriterSession, insert_ignore_returning, frame_to_rows
+    from src.models import Match
+    from src.interning import encode_matches
+    from src.change_journal import record_changes
+    from src.archive import drop_archived
+
+    df = _normalize_fetched(df_new)
+    if df.empty:
+        return counts
 
     init_db()
-    inserted = 0
-    with SessionLocal() as session:
-        for _, row in df_new.iterrows():
-            try:
-                date = pd.to_datetime(row["date"]).date()
-            except Exception:
-                continue
-            home = str(row["home_team"])
-            away = str(row["away_team"])
-            hs = None if pd.isna(row.get("home_score")) else row.get("home_score")
-            aa = None if pd.isna(row.get("away_score")) else row.get("away_score")
-            league = row.get("league", None)
-
-            exists = session.query(Match).filter(
-                Match.date == date,
-                Match.home_team == home,
-                Match.away_team == away,
-            ).first()
-            if exists:
-                # optionally update scores if previously unknown and now available
-                updated = False
-                if (exists.home_score is None or exists.away_score is None) and (hs is not None and aa is not None):
-                    exists.home_score = hs
-                    exists.away_score = aa
-                    updated = True
-                if updated:
-                    session.add(exists)
-                continue
-
-            m = Match(
-                date=date,
-                home_team=home,
-                away_team=away,
-                home_score=hs,
-                away_score=aa,
-                league=league,
+    table = Match.__table__
+    with WriterSession() as session:
+        # archived seasons are final: fixtures dated before the archive cutoff are ignored
+        df = drop_archived(session, df)
+        if df.empty:
+            return counts
+        df = encode_matches(session, df)
+        existing = pd.DataFrame(
+            session.execute(
+                select(
+                    table.c.id, table.c.date, table.c.home_team_id, table.c.away_team_id,
+                    table.c.home_score.label("old_home_score"), table.c.away_score.label("old_away_score"),
+                ).where(table.c.date.between(df["date"].min(), df["date"].max()))
+            ).all(),
+            columns=["id", "date", "home_team_id", "away_team_id", "old_home_score", "old_away_score"],
+        )
+        merged = df.merge(existing, on=["date", "home_team_id", "away_team_id"], how="left", indicator=True)
+
+        new_rows = merged[merged["_merge"] == "left_only"][list(df.columns)]
+        inserted = insert_ignore_returning(session, table, frame_to_rows(new_rows), [table.c.id])
+        counts["inserted"] = record_changes(session, "insert", [row.id for row in inserted])
+
+        # update scores if previously unknown and now available
+        found = merged[merged["_merge"] == "both"]
+        needs_update = found[
+            (found["old_home_score"].isna() | found["old_away_score"].isna())
+            & found["home_score"].notna() & found["away_score"].notna()
+        ]
+        if not needs_update.empty:
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("match_id"))
+                .where(or_(table.c.home_score.is_(None), table.c.away_score.is_(None)))
+                .values(home_score=bindparam("new_home_score"), away_score=bindparam("new_away_score"))
             )
-            session.add(m)
-            inserted += 1
+            params = [
+                {"match_id": int(mid), "new_home_score": int(hs), "new_away_score": int(aa)}
+                for mid, hs, aa in zip(needs_update["id"], needs_update["home_score"], needs_update["away_score"])
+            ]
+            result = session.execute(stmt, params)
+            counts["updated"] = max(result.rowcount, 0)
+            # the WHERE guard skips rows resolved concurrently; their values are journaled again,
+            # which idempotent consumers ignore
+            record_changes(session, "update", needs_update["id"])
         session.commit()
-    return inserted
+    return counts
 
 
 if __name__ == "__main__":
@@ -121,5 +210,5 @@ if __name__ == "__main__":
     print("Fetching matches from", from_date.isoformat(), "to", to_date.isoformat())
     df = fetch_matches(from_date.isoformat(), to_date.isoformat())
     print("Fetched", len(df), "matches")
-    inserted = insert_matches_db(df)
-    print("Inserted", inserted, "new rows into DB")
+    counts = insert_matches_db(df)
+    print("Inserted", counts["inserted"], "new rows and updated", counts["updated"], "scores in DB")
@@ -2,84 +2,225 @@
 Scheduler that periodically fetches recent matches, inserts them into the DB,
 updates artifacts/team_stats.joblib, and optionally retrains the model.
 
-This version uses the DB as canonical storage.
+This version uses the DB as canonical storage. team_stats are maintained incrementally from a
+persisted feature state (see src/feature_state.py) saved next to the team_stats artifact, so a poll
+only reads the rows inserted since the previous one. The full history is featurized only to retrain.
+
+team_stats are published in two formats, both swapped in atomically: the memory-mappable array
+artifact (team_stats.ftstats, see src/team_stats_store.py) read by prediction workers, and the
+legacy joblib dict at TEAM_STATS_PATH.
+
+Retraining runs out of process (see src/retrainer.py): a poll only triggers it, so fetch / insert /
+feature updates keep running on schedule while a model trains. A retrain starts once
+RETRAIN_THRESHOLD matches finished since the last one; the high-water mark is persisted in the meta
+table.
+
+LIVE_POLL_MODE=adaptive replaces the fixed interval with plans from src/poll_planner.py: only the
+days that still have unfinished or upcoming fixtures are polled, every few minutes while matches are
+in progress and with exponential backoff when nothing is pending. The next planned poll and its
+reason are logged and written to artifacts/poll_plan.json.
+
+Each poll is timed phase by phase (fetch, insert, featurize, publish, compact, retrain; see src/metrics.py):
+the breakdown is logged and exported to METRICS_DIR for the /metrics endpoint of app/streaming.py.
+POLL_PROFILE=1 dumps a sampled profile of every poll slower than POLL_PROFILE_THRESHOLD_SECONDS.
+
+Importing this module only loads the standard library and the metrics helpers: pandas, requests,
+SQLAlchemy, APScheduler and the model module (scikit-learn) are imported by the code paths that use
+them, so scripts that import poll_and_update start quickly.
 """
 import os
 import time
-import joblib
-from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
+import threading
+from datetime import datetime, timedelta, timezone
 
-from src.live_fetcher import fetch_matches, insert_matches_db
-from src.data_loader import load_and_featurize_from_db
-from src.model import train_and_save, TEAM_STATS_PATH, MODEL_PATH
+from src.metrics import span, inc, export_snapshot
+from src.sampling_profiler import profile_if_slow
 
 LIVE_POLL_MINUTES = int(os.environ.get("LIVE_POLL_MINUTES", "10"))
 RETRAIN_THRESHOLD = int(os.environ.get("RETRAIN_THRESHOLD", "20"))
 MAX_LOOKBACK_DAYS = int(os.environ.get("MAX_LOOKBACK_DAYS", "2"))
-
-_last_row_count = None
-
-
-def poll_and_update():
-    global _last_row_count
+LIVE_POLL_MODE = os.environ.get("LIVE_POLL_MODE", "fixed")  # fixed | adaptive
+
+_retrainer = None
+_retrainer_lock = threading.Lock()
+
+
+def get_retrainer():
+    """
+    Process-wide Retrainer, created on first use.
+    """
+    global _retrainer
+    with _retrainer_lock:
+        if _retrainer is None:
+            from src.retrainer import Retrainer
+
+            _retrainer = Retrainer(threshold=RETRAIN_THRESHOLD)
+        return _retrainer
+
+
+def artifact_paths():
+    """
+    (team_stats joblib, team_stats array, feature state) paths, next to src.model's TEAM_STATS_PATH.
+    """
+    from src.model import TEAM_STATS_PATH
+
+    directory = os.path.dirname(TEAM_STATS_PATH)
+    return (TEAM_STATS_PATH, os.path.join(directory, "team_stats.ftstats"),
+            os.path.join(directory, "feature_state.joblib"))
+
+
+def publish_team_stats(state):
+    from src.artifact_io import atomic_joblib_dump
+    from src.team_stats_store import write_team_stats_array
+
+    team_stats_path, team_stats_array_path, _ = artifact_paths()
+    names, records = state.team_stats_table()
+    fallback_scored, fallback_conceded = state.global_means()
+    meta = {
+        "last_n": state.last_n,
+        "fallback_scored": fallback_scored,
+        "fallback_conceded": fallback_conceded,
+        "fallback_form": 0.0,
+        "last_match_id": int(state.last_id),
+    }
+    write_team_stats_array(team_stats_array_path, names, records, meta=meta)
+    atomic_joblib_dump(state.team_stats(), team_stats_path)
+
+
+def poll_and_update(days=None):
+    """
+    days: optional list of ISO days to fetch; defaults to the last MAX_LOOKBACK_DAYS days.
+    Every phase is timed (src/metrics.py); with POLL_PROFILE=1 slow polls dump a sampled profile.
+    """
+    with profile_if_slow("poll"), span("poll") as poll:
+        _poll_and_update(days)
+    print(f"[live_updater] poll took {poll.seconds:.2f}s ({poll.summary() or 'no phases'})")
+    export_snapshot()
+
+
+def _poll_and_update(days):
+    from src.live_fetcher import fetch_matches, fetch_matches_for_days, insert_matches_db
+    from src.feature_state import update_feature_state
+
+    _, team_stats_array_path, feature_state_path = artifact_paths()
     to_date = datetime.utcnow().date()
     from_date = to_date - timedelta(days=MAX_LOOKBACK_DAYS)
 
     try:
-        df = fetch_matches(from_date.isoformat(), to_date.isoformat())
+        with span("poll.fetch") as s:
+            if days is None:
+                df = fetch_matches(from_date.isoformat(), to_date.isoformat())
+            else:
+                df = fetch_matches_for_days(days)
+            s.rows = len(df)
     except Exception as e:
         print("[live_updater] fetch failed:", e)
         return
 
     try:
-        added = insert_matches_db(df)
-        print(f"[live_updater] fetched {len(df)} matches, inserted {added} new rows into DB")
+        with span("poll.insert") as s:
+            counts = insert_matches_db(df)
+            s.rows = len(df)
+        print(
+            f"[live_updater] fetched {len(df)} matches, inserted {counts['inserted']} new rows, "
+            f"updated {counts['updated']} scores in DB"
+        )
     except Exception as e:
         print("[live_updater] db insert failed:", e)
         return
 
-    # load and featurize from DB: updates team_stats
+    # advance the incremental feature state by the rows changed since the last poll, including rows
+    # written by other writers (import_csv, generate_synthetic): updates team_stats
     try:
-        X, y, meta, team_stats = load_and_featurize_from_db(last_n=5)
-        # save updated team_stats to artifact
-        joblib.dump(team_stats, TEAM_STATS_PATH)
-        print("[live_updater] updated team_stats artifact")
+        with span("poll.featurize") as s:
+            state, changed = update_feature_state(feature_state_path, last_n=5)
+            s.rows = changed
+        if changed or not os.path.exists(team_stats_array_path):
+            with span("poll.publish"):
+                publish_team_stats(state)
+            print(f"[live_updater] folded {changed} changed matches into feature state, updated team_stats artifact")
+        else:
+            print("[live_updater] no changed matches, team_stats artifact unchanged")
     except Exception as e:
         print("[live_updater] featurize failed:", e)
         return
 
-    # decide whether to retrain
+    # bound the change journal: keeps only what registered consumers still need
+    try:
+        from src.change_journal import compact
+
+        with span("poll.compact") as s:
+            s.rows = compact()
+    except Exception as e:
+        print("[live_updater] change journal compaction failed:", e)
+
+    # decide whether to retrain (in a worker process; this returns immediately)
     try:
-        total_rows = len(X)
-        if _last_row_count is None:
-            _last_row_count = total_rows
-
-        new_rows = total_rows - _last_row_count
-        if new_rows >= RETRAIN_THRESHOLD:
-            print(f"[live_updater] {new_rows} new rows >= {RETRAIN_THRESHOLD}, retraining model...")
-            train_and_save(X, y, team_stats, test_size=0.2)
-            _last_row_count = total_rows
+        with span("poll.retrain"):
+            action, new_rows = get_retrainer().maybe_retrain(state.n_finished)
+        inc("retrain_decisions", action=action)
+        if action == "baseline":
+            print(f"[live_updater] recorded retrain baseline of {state.n_finished} finished matches")
+        elif action == "started":
+            print(f"[live_updater] {new_rows} newly finished matches >= {RETRAIN_THRESHOLD}, "
+                  "retraining model in background...")
+        elif action == "coalesced":
+            print(f"[live_updater] {new_rows} newly finished matches >= {RETRAIN_THRESHOLD}, "
+                  "retrain queued behind running job")
         else:
-            print(f"[live_updater] {new_rows} new rows < {RETRAIN_THRESHOLD}, skipping retrain")
+            print(f"[live_updater] {new_rows} newly finished matches < {RETRAIN_THRESHOLD}, skipping retrain")
     except Exception as e:
         print("[live_updater] retrain check failed:", e)
 
 
+def adaptive_poll(scheduler, planner, days=None):
+    """
+    Poll the planned days, then schedule the next poll from the fixtures still pending.
+    """
+    try:
+        poll_and_update(days)
+    finally:
+        schedule_next_poll(scheduler, planner)
+
+
+def schedule_next_poll(scheduler, planner):
+    try:
+        plan = planner.plan()
+    except Exception as e:
+        print("[live_updater] planning failed, falling back to fixed interval:", e)
+        run_date, days = datetime.utcnow() + timedelta(minutes=LIVE_POLL_MINUTES), None
+    else:
+        print(f"[live_updater] next poll at {plan.at:%Y-%m-%d %H:%M:%S} UTC for {len(plan.days)} days: {plan.reason}")
+        run_date, days = plan.at, plan.days
+    scheduler.add_job(
+        adaptive_poll, "date", run_date=run_date.replace(tzinfo=timezone.utc), args=[scheduler, planner, days],
+        id="adaptive_poll", replace_existing=True,
+    )
+
+
 def main():
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from src.poll_planner import PollPlanner
+
     # initial poll to set baseline and create artifacts/db
     poll_and_update()
 
     scheduler = BackgroundScheduler()
-    scheduler.add_job(poll_and_update, "interval", minutes=LIVE_POLL_MINUTES, next_run_time=datetime.utcnow())
-    scheduler.start()
-    print(f"[live_updater] started scheduler: polling every {LIVE_POLL_MINUTES} minutes")
+    if LIVE_POLL_MODE == "adaptive":
+        scheduler.start()
+        schedule_next_poll(scheduler, PollPlanner())
+        print("[live_updater] started adaptive scheduler")
+    else:
+        scheduler.add_job(poll_and_update, "interval", minutes=LIVE_POLL_MINUTES, next_run_time=datetime.utcnow())
+        scheduler.start()
+        print(f"[live_updater] started scheduler: polling every {LIVE_POLL_MINUTES} minutes")
 
     try:
         while True:
             time.sleep(5)
     except (KeyboardInterrupt, SystemExit):
         scheduler.shutdown()
+        get_retrainer().shutdown()
         print("[live_updater] stopped")
 
 
@@ -0,0 +1,238 @@
+"""
+Lightweight in-process instrumentation: timing spans, counters and a Prometheus text exporter.
+
+A span times one phase of the pipeline and records the rows it processed:
+
+  with span("poll.fetch") as s:
+      df = fetch_matches(...)
+      s.rows = len(df)
+
+Per span name the registry keeps the call / error counts, total and max seconds, the last call's
+seconds and rows/s, the total rows and the process peak RSS seen when the span ended. Spans nest per
+thread: a finished span reports its duration to the enclosing span (span.phases), which is how a poll
+logs where its time went. Counters are named totals with optional labels (inc("matches_inserted",
+n, source="live")).
+
+The live updater and the SSE server are separate processes, so a process can publish its metrics
+with export_snapshot() (a JSON file per process in METRICS_DIR, written atomically); render_prometheus()
+renders the local registry plus every other process's snapshot, each sample labelled with its process.
+app/streaming.py serves the result at GET /metrics.
+
+Usage:
+  from src.metrics import span, inc, export_snapshot, render_prometheus
+"""
+import os
+import sys
+import json
+import time
+import glob
+import threading
+
+METRICS_DIR = os.environ.get("METRICS_DIR", "artifacts/metrics")
+PREFIX = "pipeline"
+
+
+def current_rss():
+    """
+    Resident set size of this process in bytes (0 where /proc is not available).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+def peak_rss():
+    """
+    Peak resident set size of this process in bytes.
+    """
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return current_rss()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _process_name():
+    name = os.environ.get("METRICS_PROCESS")
+    if name:
+        return name
+    main = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+    return os.path.splitext(main)[0] or "python"
+
+
+class Span:
+    def __init__(self, registry, name):
+        self.registry = registry
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.phases = {}
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.registry._stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self.started
+        stack = self.registry._stack()
+        stack.pop()
+        if stack:
+            parent = stack[-1]
+            parent.phases[self.name] = parent.phases.get(self.name, 0.0) + self.seconds
+        self.registry._record(self, failed=exc_type is not None)
+        return False
+
+    def summary(self):
+        """
+        "fetch 0.41s, insert 0.12s" from the nested spans, in the order they ran.
+        """
+        return ", ".join(f"{name.rpartition('.')[2]} {seconds:.2f}s" for name, seconds in self.phases.items())
+
+
+class Registry:
+    def __init__(self, process=None):
+        self.process = process or _process_name()
+        self.spans = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def span(self, name):
+        return Span(self, name)
+
+    def _record(self, span, failed):
+        peak = peak_rss()
+        with self._lock:
+            s = self.spans.setdefault(span.name, {
+                "count": 0, "errors": 0, "seconds_sum": 0.0, "seconds_max": 0.0, "last_seconds": 0.0,
+                "rows_total": 0, "last_rows": 0, "last_rows_per_second": 0.0, "peak_rss_bytes": 0,
+            })
+            s["count"] += 1
+            s["errors"] += int(failed)
+            s["seconds_sum"] += span.seconds
+            s["seconds_max"] = max(s["seconds_max"], span.seconds)
+            s["last_seconds"] = span.seconds
+            s["rows_total"] += int(span.rows)
+            s["last_rows"] = int(span.rows)
+            s["last_rows_per_second"] = span.rows / span.seconds if span.seconds > 0 else 0.0
+            s["peak_rss_bytes"] = max(s["peak_rss_bytes"], peak)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "process": self.process,
+                "pid": os.getpid(),
+                "timestamp": time.time(),
+                "resident_memory_bytes": current_rss(),
+                "peak_resident_memory_bytes": peak_rss(),
+                "spans": {name: dict(s) for name, s in self.spans.items()},
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in self.counters.items()
+                ],
+            }
+
+
+registry = Registry()
+span = registry.span
+inc = registry.inc
+
+
+def export_snapshot(directory=METRICS_DIR, reg=registry):
+    """
+    Atomically write this process's metrics to directory/<process>.json for other processes.
+    """
+    from src.artifact_io import atomic_write_bytes
+
+    payload = json.dumps(reg.snapshot()).encode()
+    try:
+        atomic_write_bytes(os.path.join(directory, f"{reg.process}.json"), payload)
+    except OSError as e:
+        print("[metrics] could not export snapshot:", e)
+
+
+def load_snapshots(directory=METRICS_DIR, exclude=None):
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if snapshot.get("process") != exclude:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+SPAN_METRICS = [
+    # (metric suffix, snapshot field, type, help)
+    ("span_seconds_max", "seconds_max", "gauge", "Longest span in seconds."),
+    ("span_last_seconds", "last_seconds", "gauge", "Wall time of the last span in seconds."),
+    ("span_errors_total", "errors", "counter", "Spans that ended with an exception."),
+    ("span_rows_total", "rows_total", "counter", "Rows processed by the spans."),
+    ("span_last_rows_per_second", "last_rows_per_second", "gauge", "Rows per second of the last span."),
+    ("span_peak_rss_bytes", "peak_rss_bytes", "gauge", "Process peak RSS when the span ended."),
+]
+
+
+def render_prometheus(directory=METRICS_DIR, reg=registry):
+    """
+    Prometheus text exposition (format 0.0.4) of this process plus the exported snapshots.
+    """
+    snapshots = [reg.snapshot()] + load_snapshots(directory, exclude=reg.process)
+    metric = f"{PREFIX}_span_seconds"
+    lines = [f"# HELP {metric} Wall time of instrumented pipeline phases.", f"# TYPE {metric} summary"]
+    for snap in snapshots:
+        for name, s in sorted(snap["spans"].items()):
+            labels = _labels(process=snap["process"], span=name)
+            lines += [f"{metric}_count{labels} {s['count']}", f"{metric}_sum{labels} {s['seconds_sum']}"]
+    for suffix, field, kind, help_text in SPAN_METRICS:
+        metric = f"{PREFIX}_{suffix}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for snap in snapshots:
+            for name, s in sorted(snap["spans"].items()):
+                lines.append(f"{metric}{_labels(process=snap['process'], span=name)} {s[field]}")
+
+    counters = {}
+    for snap in snapshots:
+        for c in snap["counters"]:
+            counters.setdefault(c["name"], []).append((snap["process"], c["labels"], c["value"]))
+    for name, samples in sorted(counters.items()):
+        metric = f"{PREFIX}_{name}_total"
+        lines += [f"# TYPE {metric} counter"]
+        for process, labels, value in samples:
+            lines.append(f"{metric}{_labels(process=process, **labels)} {value}")
+
+    for metric, field, help_text in (
+        ("process_resident_memory_bytes", "resident_memory_bytes", "Resident memory size in bytes."),
+        ("process_peak_resident_memory_bytes", "peak_resident_memory_bytes", "Peak resident memory in bytes."),
+        (f"{PREFIX}_snapshot_timestamp_seconds", "timestamp", "When the process's metrics were taken."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        for snap in snapshots:
+            lines.append(f"{metric}{_labels(process=snap['process'])} {snap[field]}")
+    return "\n".join(lines) + "\n"
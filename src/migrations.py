@@ -0,0 +1,88 @@
+"""
+Schema migrations, applied by init_db() before create_all.
+
+migrate_to_dictionary_encoding: the first schema stored team and league names as free text on every
+match row (matches.home_team / away_team / league). They now live in the teams / leagues tables and
+matches reference them by integer id. Ids of existing matches are preserved.
+"""
+from sqlalchemy import inspect, text
+
+from src.models import Team, League, Match
+
+
+def _copy_names(conn, source):
+    conn.execute(text(
+        f"INSERT INTO teams (name) SELECT home_team FROM {source} UNION SELECT away_team FROM {source}"
+    ))
+    conn.execute(text(
+        f"INSERT INTO leagues (name) SELECT DISTINCT league FROM {source} WHERE league IS NOT NULL"
+    ))
+
+
+def _migrate_sqlite(conn, old_indexes):
+    # SQLite cannot alter constraints in place: rename, recreate and copy
+    for name in old_indexes:
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    conn.execute(text("ALTER TABLE matches RENAME TO matches_v1"))
+    for table in (Team.__table__, League.__table__, Match.__table__):
+        table.create(conn, checkfirst=True)
+    _copy_names(conn, "matches_v1")
+    conn.execute(text(
+        "INSERT INTO matches (id, date, home_team_id, away_team_id, home_score, away_score, league_id, created_at) "
+        "SELECT m.id, m.date, h.id, a.id, m.home_score, m.away_score, l.id, m.created_at "
+        "FROM matches_v1 m "
+        "JOIN teams h ON h.name = m.home_team "
+        "JOIN teams a ON a.name = m.away_team "
+        "LEFT JOIN leagues l ON l.name = m.league"
+    ))
+    conn.execute(text("DROP TABLE matches_v1"))
+
+
+def _migrate_in_place(conn):
+    # PostgreSQL: keep the table (and its id sequence), swap the name columns for id columns
+    for table in (Team.__table__, League.__table__):
+        table.create(conn, checkfirst=True)
+    conn.execute(text(
+        "ALTER TABLE matches ADD COLUMN home_team_id INTEGER REFERENCES teams (id), "
+        "ADD COLUMN away_team_id INTEGER REFERENCES teams (id), "
+        "ADD COLUMN league_id INTEGER REFERENCES leagues (id)"
+    ))
+    _copy_names(conn, "matches")
+    conn.execute(text("UPDATE matches SET home_team_id = t.id FROM teams t WHERE t.name = matches.home_team"))
+    conn.execute(text("UPDATE matches SET away_team_id = t.id FROM teams t WHERE t.name = matches.away_team"))
+    conn.execute(text("UPDATE matches SET league_id = l.id FROM leagues l WHERE l.name = matches.league"))
+    conn.execute(text("ALTER TABLE matches DROP CONSTRAINT IF EXISTS uix_date_home_away"))
+    conn.execute(text(
+        "ALTER TABLE matches DROP COLUMN home_team, DROP COLUMN away_team, DROP COLUMN league, "
+        "ALTER COLUMN home_team_id SET NOT NULL, ALTER COLUMN away_team_id SET NOT NULL, "
+        "ADD CONSTRAINT uix_date_home_away UNIQUE (date, home_team_id, away_team_id)"
+    ))
+    for index in Match.__table__.indexes:
+        if {c.name for c in index.columns} & {"home_team_id", "away_team_id", "league_id"}:
+            index.create(conn, checkfirst=True)
+
+
+def migrate_to_dictionary_encoding(engine):
+    """
+    Convert a matches table with name columns to the dictionary-encoded schema.
+    Returns True if a migration was applied.
+    """
+    insp = inspect(engine)
+    if "matches" not in insp.get_table_names():
+        return False
+    columns = {c["name"] for c in insp.get_columns("matches")}
+    if "home_team_id" in columns or "home_team" not in columns:
+        return False
+
+    print("[migrations] dictionary-encoding teams and leagues in the matches table")
+    old_indexes = [ix["name"] for ix in insp.get_indexes("matches")]
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            _migrate_sqlite(conn, old_indexes)
+        else:
+            _migrate_in_place(conn)
+    return True
+
+
+def run_migrations(engine):
+    migrate_to_dictionary_encoding(engine)
@@ -1,5 +1,10 @@
 """
 SQLAlchemy ORM models for matches and a small metadata table.
+
+Team and league names are dictionary-encoded: matches reference the teams / leagues tables by
+integer id, and names are resolved through src/interning.py only where they are needed.
+
+match_changes is the append-only change journal of the matches table (see src/change_journal.py).
 """
 from sqlalchemy import (
     Column,
@@ -7,27 +12,40 @@ from sqlalchemy import (
     String,
     Date,
     DateTime,
+    ForeignKey,
     UniqueConstraint,
     func,
 )
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
 
 
+class Team(Base):
+    __tablename__ = "teams"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
+class League(Base):
+    __tablename__ = "leagues"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False, unique=True)
+
+
 class Match(Base):
     __tablename__ = "matches"
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False, index=True)
-    home_team = Column(String, nullable=False, index=True)
-    away_team = Column(String, nullable=False, index=True)
+    home_team_id = Column(Integer, ForeignKey("teams.id"), nullable=False, index=True)
+    away_team_id = Column(Integer, ForeignKey("teams.id"), nullable=False, index=True)
     home_score = Column(Integer, nullable=True)
     away_score = Column(Integer, nullable=True)
-    league = Column(String, nullable=True, index=True)
+    league_id = Column(Integer, ForeignKey("leagues.id"), nullable=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     __table_args__ = (
-        UniqueConstraint("date", "home_team", "away_team", name="uix_date_home_away"),
+        UniqueConstraint("date", "home_team_id", "away_team_id", name="uix_date_home_away"),
     )
 
 
@@ -38,3 +56,23 @@ class Meta(Base):
     __tablename__ = "meta"
     key = Column(String, primary_key=True)
     value = Column(String, nullable=True)
+
+
+class MatchChange(Base):
+    """
+    append-only journal of match inserts and score resolutions, ordered by seq.
+    AUTOINCREMENT keeps seq monotonic even after compaction deletes the newest entries.
+    """
+    __tablename__ = "match_changes"
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    match_id = Column(Integer, nullable=False, index=True)
+    op = Column(String(8), nullable=False)
+    date = Column(Date, nullable=False)
+    home_team_id = Column(Integer, nullable=False)
+    away_team_id = Column(Integer, nullable=False)
+    home_score = Column(Integer, nullable=True)
+    away_score = Column(Integer, nullable=True)
+    league_id = Column(Integer, nullable=True)
+    changed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = {"sqlite_autoincrement": True}
@@ -0,0 +1,103 @@
+"""
+Parallel featurization partitioned by independent groups of teams.
+
+Every pre-match feature of a match depends only on earlier matches of the two teams playing it, so
+teams that are never connected by a chain of matches can be featurized independently. The
+connected components of the team-vs-team match graph (cross-league cup ties merge leagues into one
+component) are packed into one bin per worker, largest first, and each bin's matches are featurized
+in a separate process. Within a bin the matches keep their global date order, so every value is
+computed from exactly the same history as in the serial path.
+
+Workers return raw values (NaN without history) and their teams' team_stats; the caller scatters
+the values back to the original rows and applies the global fallback means computed over the full
+history, which is why the output is identical to the serial path.
+
+Usage:
+  compute_recent_stats(df, engine="parallel")                    # FEATURE_WORKERS processes
+  compute_features(df, feature_set="extended", workers=8)
+  load_and_featurize_from_db(workers=8)
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from src.features import team_codes, window_features, team_stats_from_windows
+
+FEATURE_WORKERS = int(os.environ.get("FEATURE_WORKERS", str(os.cpu_count() or 1)))
+
+# columns the workers need; the rest of the frame stays in the parent
+PART_COLUMNS = ["home_team", "away_team", "home_team_id", "away_team_id", "home_score", "away_score"]
+
+
+def match_components(df):
+    """
+    Connected component label of every match in the team-vs-team graph.
+    """
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    home, away, names = team_codes(df)
+    n_teams = len(names)
+    graph = coo_matrix((np.ones(len(home), dtype=np.int8), (home, away)), shape=(n_teams, n_teams))
+    _, labels = connected_components(graph, directed=False)
+    return labels[home]
+
+
+def partition_rows(components, workers):
+    """
+    Pack components into at most `workers` bins of similar match counts (largest first).
+    Returns one ascending array of row positions per non-empty bin.
+    """
+    sizes = np.bincount(components)
+    load = np.zeros(workers, dtype=np.int64)
+    bin_of = np.zeros(len(sizes), dtype=np.int64)
+    for comp in np.argsort(-sizes, kind="stable"):
+        if sizes[comp] == 0:
+            break
+        b = int(np.argmin(load))
+        bin_of[comp] = b
+        load[b] += sizes[comp]
+    match_bin = bin_of[components]
+    return [rows for rows in (np.flatnonzero(match_bin == b) for b in range(workers)) if len(rows)]
+
+
+def map_team_components(df, fn, args=(), workers=FEATURE_WORKERS):
+    """
+    Run fn(part, *args) -> (columns dict, team_stats) on each bin of a date-sorted frame and merge:
+    columns are scattered back to df's row order, team_stats follow the serial path's team order.
+    """
+    parts = partition_rows(match_components(df), max(1, workers)) if len(df) else []
+    slim = df[[c for c in PART_COLUMNS if c in df]]
+    if len(parts) <= 1:
+        return fn(slim, *args)
+
+    frames = [slim.iloc[rows] for rows in parts]
+    with ProcessPoolExecutor(max_workers=len(parts), mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(fn, frames, *[[a] * len(parts) for a in args]))
+
+    columns, merged_stats = {}, {}
+    for rows, (part_columns, part_stats) in zip(parts, results):
+        for name, values in part_columns.items():
+            if name not in columns:
+                columns[name] = np.empty(len(df), dtype=np.asarray(values).dtype)
+            columns[name][rows] = values
+        merged_stats.update(part_stats)
+    _, _, names = team_codes(df)
+    team_stats = {name: merged_stats[name] for name in names if name in merged_stats}
+    return columns, team_stats
+
+
+def recent_stats_part(df, last_n):
+    hs = df["home_score"].to_numpy(dtype=float)
+    aa = df["away_score"].to_numpy(dtype=float)
+    home, away, names = team_codes(df)
+    raw, last = window_features(home, away, hs, aa, last_n, len(names))
+    return raw, team_stats_from_windows(last, names)
+
+
+def feature_set_part(df, feature_set, last_n):
+    from src.feature_registry import raw_features
+
+    return raw_features(df, feature_set, last_n)
@@ -0,0 +1,125 @@
+"""
+Adaptive poll planning for live_updater, driven by fixtures whose scores are still NULL.
+
+After every poll the planner reads the unfinished fixtures (NULL home or away score) from the
+matches table and decides when to poll next and which days to ask the API for:
+
+- unfinished fixtures today (or in the last ADAPTIVE_STALE_DAYS days): poll those days every
+  ADAPTIVE_LIVE_MINUTES
+- fixtures on an upcoming day: wake up when that day starts (or after ADAPTIVE_NEAR_MINUTES when it
+  is tomorrow, to pick up schedule changes), polling the days up to and including it
+- nothing pending: poll today plus ADAPTIVE_LOOKAHEAD_DAYS ahead to discover new fixtures, backing
+  off exponentially from LIVE_POLL_MINUTES up to ADAPTIVE_IDLE_MAX_MINUTES
+
+The matches table stores dates, not kickoff times, so "imminent" means "on a day that has started".
+Older unfinished fixtures (postponed / abandoned) are ignored after ADAPTIVE_STALE_DAYS so they do
+not pin the poller to its fastest interval.
+
+Usage:
+  planner = PollPlanner()
+  plan = planner.plan()       # PollPlan(at, interval_seconds, days, reason, pending)
+  planner.next_plan           # last plan, for observability (also written to POLL_PLAN_PATH)
+"""
+import os
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, or_
+
+from src.db import ReaderSession
+from src.models import Match
+from src.artifact_io import atomic_write_bytes
+
+LIVE_POLL_MINUTES = int(os.environ.get("LIVE_POLL_MINUTES", "10"))
+ADAPTIVE_LIVE_MINUTES = float(os.environ.get("ADAPTIVE_LIVE_MINUTES", "2"))
+ADAPTIVE_NEAR_MINUTES = float(os.environ.get("ADAPTIVE_NEAR_MINUTES", "60"))
+ADAPTIVE_IDLE_MAX_MINUTES = float(os.environ.get("ADAPTIVE_IDLE_MAX_MINUTES", "360"))
+ADAPTIVE_LOOKAHEAD_DAYS = int(os.environ.get("ADAPTIVE_LOOKAHEAD_DAYS", "7"))
+ADAPTIVE_STALE_DAYS = int(os.environ.get("ADAPTIVE_STALE_DAYS", "2"))
+POLL_PLAN_PATH = os.environ.get("POLL_PLAN_PATH", "artifacts/poll_plan.json")
+
+PollPlan = namedtuple("PollPlan", ["at", "interval_seconds", "days", "reason", "pending"])
+
+
+def pending_fixture_counts(session, since):
+    """
+    {date: number of fixtures with a NULL score} for dates >= since.
+    """
+    table = Match.__table__
+    rows = session.execute(
+        select(table.c.date, func.count())
+        .where(or_(table.c.home_score.is_(None), table.c.away_score.is_(None)))
+        .where(table.c.date >= since)
+        .group_by(table.c.date)
+    ).all()
+    return {d if not isinstance(d, str) else datetime.fromisoformat(d).date(): n for d, n in rows}
+
+
+class PollPlanner:
+    def __init__(self, path=POLL_PLAN_PATH):
+        self.path = path
+        self.idle_streak = 0
+        self.next_plan = None
+
+    def plan(self, now=None, pending=None):
+        """
+        Plan the next poll at or after now (UTC). pending: optional {date: count} overriding the DB.
+        """
+        now = now or datetime.utcnow()
+        today = now.date()
+        if pending is None:
+            with ReaderSession() as session:
+                pending = pending_fixture_counts(session, today - timedelta(days=ADAPTIVE_STALE_DAYS))
+
+        live = sorted(d for d in pending if d <= today)
+        upcoming = sorted(d for d in pending if d > today)
+        if live:
+            self.idle_streak = 0
+            interval = ADAPTIVE_LIVE_MINUTES * 60
+            days = sorted(set(live) | {today})
+            reason = f"{sum(pending[d] for d in live)} unfinished fixtures on {_span(live)}"
+        elif upcoming:
+            self.idle_streak = 0
+            first = upcoming[0]
+            day_start = datetime.combine(first, datetime.min.time())
+            interval = (day_start - now).total_seconds()
+            if first == today + timedelta(days=1):
+                interval = min(interval, ADAPTIVE_NEAR_MINUTES * 60)
+            interval = min(interval, ADAPTIVE_IDLE_MAX_MINUTES * 60)
+            # keep discovering fixtures until then; the upcoming day itself is always included
+            ahead = min((first - today).days - 1, ADAPTIVE_LOOKAHEAD_DAYS)
+            days = [today + timedelta(days=i) for i in range(ahead + 1)] + [first]
+            reason = f"{pending[first]} fixtures on {first.isoformat()}"
+        else:
+            interval = min(LIVE_POLL_MINUTES * 60 * 2 ** self.idle_streak, ADAPTIVE_IDLE_MAX_MINUTES * 60)
+            self.idle_streak += 1
+            days = [today + timedelta(days=i) for i in range(ADAPTIVE_LOOKAHEAD_DAYS + 1)]
+            reason = f"no pending fixtures, looking {ADAPTIVE_LOOKAHEAD_DAYS} days ahead"
+
+        interval = max(interval, ADAPTIVE_LIVE_MINUTES * 60)
+        plan = PollPlan(
+            at=now + timedelta(seconds=interval),
+            interval_seconds=float(interval),
+            days=[d.isoformat() for d in days],
+            reason=reason,
+            pending=sum(pending.values()),
+        )
+        self.next_plan = plan
+        self._write(plan)
+        return plan
+
+    def _write(self, plan):
+        if not self.path:
+            return
+        payload = json.dumps({**plan._asdict(), "at": plan.at.isoformat() + "Z"}, indent=2).encode()
+        try:
+            atomic_write_bytes(self.path, payload)
+        except OSError as e:
+            print("[poll_planner] could not write", self.path, ":", e)
+
+
+def _span(days):
+    if len(days) == 1:
+        return days[0].isoformat()
+    return f"{days[0].isoformat()}..{days[-1].isoformat()}"
@@ -0,0 +1,153 @@
+"""
+Out-of-process model retraining for live_updater.
+
+Retraining runs in a single worker process (ProcessPoolExecutor, spawn context), so a long fit never
+blocks the scheduler's polls. At most one job runs at a time: a trigger arriving while a job is
+running only records a follow-up as pending, and any number of such triggers coalesce into one
+rerun started when the current job finishes.
+
+The worker featurizes the full history from the DB itself and trains into a staging directory next
+to the artifacts; the new model is then moved into place with os.replace, so readers see either the
+old or the new model, never a partial file. team_stats from the retrain are discarded: live_updater
+publishes them from the incremental feature state, which may be newer than the training snapshot.
+
+The retrain high-water mark is the number of finished matches (both scores known, the rows the model
+trains on; src/backtest.py's retrain mode counts the same) the published model was triggered at.
+Unfinished fixtures do not count until their scores arrive. The mark is kept in the meta table under
+RETRAIN_MARK_KEY, so a restart neither retrains needlessly nor forgets matches finished since the
+last retrain.
+
+Usage:
+  retrainer = Retrainer(threshold=20)
+  retrainer.maybe_retrain(state.n_finished)   # after every poll; returns immediately
+"""
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from src.db import ReaderSession, WriterSession, get_meta, set_meta
+
+RETRAIN_MARK_KEY = "retrain_row_count"
+
+
+def read_retrain_mark():
+    with ReaderSession() as session:
+        value = get_meta(session, RETRAIN_MARK_KEY)
+    return None if value is None else int(value)
+
+
+def write_retrain_mark(mark):
+    with WriterSession() as session:
+        set_meta(session, RETRAIN_MARK_KEY, int(mark))
+        session.commit()
+
+
+def train_and_publish(last_n=5, test_size=0.2):
+    """
+    Worker entry point: featurize from the DB, train into a staging directory and atomically move
+    the model into place. Returns the number of training rows.
+    """
+    import src.model as model
+    from src.data_loader import load_and_featurize_from_db
+
+    model_path = model.MODEL_PATH
+    team_stats_path = model.TEAM_STATS_PATH
+    staging = tempfile.mkdtemp(prefix=".retrain.", dir=os.path.dirname(model_path) or ".")
+    try:
+        # train_and_save writes to the module-level paths: point them at the staging directory
+        # (this process only ever trains, so nothing else sees the patched paths)
+        model.MODEL_PATH = os.path.join(staging, os.path.basename(model_path))
+        model.TEAM_STATS_PATH = os.path.join(staging, os.path.basename(team_stats_path))
+        X, y, meta, team_stats = load_and_featurize_from_db(last_n=last_n)
+        model.train_and_save(X, y, team_stats, test_size=test_size)
+        if not os.path.exists(model.MODEL_PATH):
+            raise RuntimeError(f"train_and_save did not write {model.MODEL_PATH}")
+        with open(model.MODEL_PATH, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(model.MODEL_PATH, model_path)
+        return len(y)
+    finally:
+        model.MODEL_PATH, model.TEAM_STATS_PATH = model_path, team_stats_path
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+class Retrainer:
+    """
+    Single-flight retrain trigger. maybe_retrain() compares the number of finished matches with the
+    persisted high-water mark (or the mark of the job in flight) and starts or coalesces a retrain.
+    """
+
+    def __init__(self, threshold, job=train_and_publish):
+        self.threshold = threshold
+        self.job = job
+        self.mark = None  # persisted high-water mark, read lazily from the meta table
+        self._lock = threading.RLock()
+        self._executor = None
+        self._future = None
+        self._running_mark = None
+        self._pending_mark = None
+
+    @property
+    def running(self):
+        return self._future is not None
+
+    def maybe_retrain(self, finished):
+        """
+        finished: number of finished matches now in the data.
+        Returns (action, new_rows) with action one of "baseline", "skipped", "started", "coalesced",
+        new_rows the finished matches since the last retrain (or the one in flight).
+        """
+        with self._lock:
+            if self.mark is None:
+                self.mark = read_retrain_mark()
+                if self.mark is None:
+                    # first run: the current data is the baseline, nothing to retrain yet
+                    self.mark = finished
+                    write_retrain_mark(finished)
+                    return "baseline", 0
+            seen = self.mark if self._running_mark is None else max(self.mark, self._running_mark)
+            new_rows = finished - seen
+            if new_rows < self.threshold:
+                return "skipped", new_rows
+            if self.running:
+                self._pending_mark = finished
+                return "coalesced", new_rows
+            self._submit(finished)
+            return "started", new_rows
+
+    def _submit(self, mark):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+        self._running_mark = mark
+        self._future = self._executor.submit(self.job)
+        self._future.add_done_callback(self._done)
+
+    def _done(self, future):
+        with self._lock:
+            mark, self._running_mark, self._future = self._running_mark, None, None
+            try:
+                rows = future.result()
+                write_retrain_mark(mark)
+                self.mark = mark
+                print(f"[retrainer] retrained on {rows} rows, published model (mark {mark})")
+            except BrokenProcessPool as e:
+                print("[retrainer] worker process died:", e)
+                self._executor = None
+            except Exception as e:
+                # the mark is left unchanged, so the next poll triggers a retry
+                print("[retrainer] retrain failed:", e)
+            if self._pending_mark is not None:
+                pending, self._pending_mark = self._pending_mark, None
+                print(f"[retrainer] starting coalesced retrain (mark {pending})")
+                self._submit(pending)
+
+    def shutdown(self, wait=False):
+        with self._lock:
+            self._pending_mark = None
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,96 @@
+"""
+Opt-in sampling profiler for slow polls.
+
+While a profiled block runs, a daemon thread samples the calling thread's Python stack every
+POLL_PROFILE_INTERVAL_MS via sys._current_frames() (no tracing hooks, so the profiled code runs at
+full speed). If the block took longer than its threshold, the aggregated stacks are written in the
+collapsed "folded" format (one `frame;frame;frame count` line per distinct stack), which
+flamegraph.pl, speedscope and inferno read directly. Faster blocks are discarded.
+
+Enabled with POLL_PROFILE=1; live_updater wraps every poll and dumps polls slower than
+POLL_PROFILE_THRESHOLD_SECONDS to POLL_PROFILE_DIR.
+
+Usage:
+  with profile_if_slow("poll", threshold=30):
+      poll_and_update()
+"""
+import os
+import sys
+import time
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+POLL_PROFILE = os.environ.get("POLL_PROFILE", "0") == "1"
+POLL_PROFILE_THRESHOLD_SECONDS = float(os.environ.get("POLL_PROFILE_THRESHOLD_SECONDS", "30"))
+POLL_PROFILE_INTERVAL_MS = float(os.environ.get("POLL_PROFILE_INTERVAL_MS", "5"))
+POLL_PROFILE_DIR = os.environ.get("POLL_PROFILE_DIR", "artifacts/profiles")
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id=None, interval=POLL_PROFILE_INTERVAL_MS / 1000.0):
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def dump(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            f.write(self.folded())
+        return path
+
+
+@contextmanager
+def profile_if_slow(name, threshold=POLL_PROFILE_THRESHOLD_SECONDS, enabled=None, directory=POLL_PROFILE_DIR):
+    """
+    Sample the current thread while the block runs; dump a folded profile if it took > threshold s.
+    """
+    if not (POLL_PROFILE if enabled is None else enabled):
+        yield None
+        return
+    profiler = SamplingProfiler().start()
+    started = time.perf_counter()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        elapsed = time.perf_counter() - started
+        if elapsed > threshold:
+            path = os.path.join(directory, f"{name}-{datetime.utcnow():%Y%m%dT%H%M%S}-{elapsed:.1f}s.folded")
+            try:
+                profiler.dump(path)
+                print(f"[sampling_profiler] {name} took {elapsed:.2f}s > {threshold:.2f}s, "
+                      f"{profiler.samples} samples written to {path}")
+            except OSError as e:
+                print("[sampling_profiler] could not write profile:", e)
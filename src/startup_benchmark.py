@@ -0,0 +1,103 @@
+"""
+Startup benchmark: import time and resident memory of each entry point in a fresh interpreter.
+
+The live fetcher, the CSV importer and the live updater run as short cron-style processes, so the
+time they spend importing before doing any work is paid on every run. Each entry point is imported
+--repeat times, each time in its own `python -c` process started from the repo root; the reported
+import time is the median of the runs, the RSS the maximum after the import (measured in the child
+from /proc/self/statm, so the interpreter's own baseline is included). Every entry point has a
+seconds and a MiB budget, overridable per entry point with STARTUP_BUDGET_<NAME>_SECONDS /
+STARTUP_BUDGET_<NAME>_MIB (NAME upper-cased with dots as underscores, e.g. SRC_LIVE_FETCHER);
+any entry point over budget makes the run exit with status 1.
+
+Usage:
+  python -m src.startup_benchmark
+  python -m src.startup_benchmark --modules src.live_fetcher --repeat 10 --out artifacts/startup.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+from src.benchmark import REPO_ROOT
+
+# entry point -> (import seconds, RSS MiB after import)
+BUDGETS = {
+    "src.live_updater": (0.05, 25),
+    "src.live_fetcher": (0.05, 25),
+    "app.streaming": (0.15, 35),
+    "src.import_csv_to_db": (0.6, 90),
+}
+
+CHILD = """
+import os, sys, json, time, importlib
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - started
+rss = int(open("/proc/self/statm").read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+print(json.dumps({"seconds": seconds, "rss_bytes": rss}))
+"""
+
+
+def budget(module):
+    seconds, mib = BUDGETS.get(module, (1.0, 150))
+    name = module.upper().replace(".", "_")
+    return (float(os.environ.get(f"STARTUP_BUDGET_{name}_SECONDS", seconds)),
+            float(os.environ.get(f"STARTUP_BUDGET_{name}_MIB", mib)))
+
+
+def measure_import(module, repeat=5):
+    """
+    Import module in repeat fresh interpreters; returns the per-run seconds and RSS bytes.
+    """
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-c", CHILD, module], cwd=REPO_ROOT, capture_output=True,
+                              text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"importing {module} failed:\n{proc.stderr.strip()}")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def run(modules, repeat=5):
+    results = {}
+    for module in modules:
+        runs = measure_import(module, repeat)
+        seconds_budget, mib_budget = budget(module)
+        seconds = statistics.median(r["seconds"] for r in runs)
+        mib = max(r["rss_bytes"] for r in runs) / (1 << 20)
+        over = [what for what, value, limit in (("seconds", seconds, seconds_budget), ("rss", mib, mib_budget))
+                if value > limit]
+        results[module] = {
+            "seconds": round(seconds, 4), "seconds_budget": seconds_budget,
+            "rss_mib": round(mib, 1), "rss_mib_budget": mib_budget,
+            "over_budget": over,
+        }
+        flag = "  OVER BUDGET: " + ", ".join(over) if over else ""
+        print(f"[startup_benchmark] {module:<22} import {seconds:.3f}s (budget {seconds_budget:.3f}s)  "
+              f"rss {mib:.1f} MiB (budget {mib_budget:.0f} MiB){flag}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time and RSS of the entry points")
+    parser.add_argument("--modules", default=",".join(BUDGETS), help="comma separated module names")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--out", default=None, help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = run([m for m in args.modules.split(",") if m], args.repeat)
+    if args.out:
+        from src.artifact_io import atomic_write_bytes
+
+        atomic_write_bytes(args.out, json.dumps(results, indent=2).encode())
+        print("[startup_benchmark] results written to", args.out)
+    if any(r["over_budget"] for r in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
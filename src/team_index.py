@@ -0,0 +1,411 @@
+"""
+Point-in-time per-team index: a team's rolling stats as of any past date without recomputing
+compute_recent_stats over the full history.
+
+Every match contributes one entry per side (team id, date, match id, goals scored, goals conceded,
+outcome). Entries are kept sorted by (team, date, match id), so each team's matches form one
+contiguous, date-sorted segment of a single composite key array (team << 32 | day), and prefix sums
+over the sorted entries are stored next to them. The stats of the last_n matches of a team before a
+date are then one binary search plus prefix-sum differences, O(log n) per query, and lookup()
+answers thousands of (team, date) pairs in one vectorized call. last_n is a query parameter, the
+index does not depend on it.
+
+Unfinished matches are indexed with MISSING_SCORE (-1) goals, exactly as compute_recent_stats sees
+them from the loader; their ids are kept as pending and the entries are patched in place when the
+score arrives (prefix sums are recomputed from the first patched entry on). update() adds new matches
+to a small sorted delta run with its own prefix sums instead of the main arrays; lookup() combines
+both runs (a binary search over the window finds how many of a team's last_n entries come from
+each), and the delta is merged into the main run once it holds TEAM_INDEX_DELTA_MAX entries, so an
+update costs O(delta) instead of O(index). update_from_db() reads only rows past the high-water mark
+and the pending matches.
+
+Usage:
+  index = TeamIndex.build_from_db()
+  index.save()                                  # artifacts/team_index.npz
+  index = TeamIndex.load(); index.update_from_db()
+  stats = index.lookup(team_ids, dates, last_n=5)              # dict of arrays (NaN without history)
+  index.as_of("Team 3", "2024-05-01", last_n=5)                  # {"avg_scored": ..., ...} or None
+  python -m src.team_index build|update|query TEAM DATE [--last-n 5]
+"""
+import os
+import io
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from src.db import ReaderSession
+from src.models import Match
+from src.artifact_io import atomic_write_bytes
+from src.feature_state import MISSING_SCORE
+from src.interning import teams as team_names
+
+TEAM_INDEX_PATH = os.environ.get("TEAM_INDEX_PATH", "artifacts/team_index.npz")
+# entries kept in the delta run before it is merged into the main run
+TEAM_INDEX_DELTA_MAX = int(os.environ.get("TEAM_INDEX_DELTA_MAX", "65536"))
+
+# composite key: team id in the high 32 bits, days since 1970-01-01 (offset to be non-negative) below
+_DAY_OFFSET = 1 << 31
+STATS = ("avg_scored", "avg_conceded", "form")
+_ARRAYS = ("keys", "match_ids", "scored", "conceded")
+
+
+def _days(dates):
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+def _keys(team_ids, days):
+    return (np.asarray(team_ids, dtype=np.int64) << 32) | (np.asarray(days, dtype=np.int64) + _DAY_OFFSET)
+
+
+def _long_entries(df):
+    """
+    One entry per (match, side) from a loader-shaped frame (id, date, home/away_team_id, scores).
+    Returns (keys, match_ids, scored, conceded) sorted by (key, match id).
+    """
+    n = len(df)
+    days = _days(df["date"])
+    ids = df["id"].to_numpy(dtype=np.int64)
+    hs = df["home_score"].fillna(MISSING_SCORE).to_numpy(dtype=np.int64)
+    aa = df["away_score"].fillna(MISSING_SCORE).to_numpy(dtype=np.int64)
+    keys = np.concatenate([_keys(df["home_team_id"], days), _keys(df["away_team_id"], days)])
+    match_ids = np.concatenate([ids, ids])
+    scored = np.concatenate([hs, aa])
+    conceded = np.concatenate([aa, hs])
+    order = np.lexsort((match_ids, keys)) if n else np.zeros(0, dtype=np.int64)
+    return keys[order], match_ids[order], scored[order], conceded[order]
+
+
+def _empty():
+    return [np.zeros(0, dtype=np.int64) for _ in _ARRAYS]
+
+
+class _Run:
+    """
+    Entries sorted by (key, match id) with prefix sums of the stats next to them.
+    """
+
+    def __init__(self, keys, match_ids, scored, conceded, cum=None):
+        self.keys = keys
+        self.match_ids = match_ids
+        self.scored = scored
+        self.conceded = conceded
+        self.outcome = np.sign(scored - conceded)
+        self.cum = cum
+        if cum is None:
+            self.cum = {name: np.zeros(len(keys) + 1) for name in STATS}
+            self._prefix(0)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _values(self, name):
+        return {"avg_scored": self.scored, "avg_conceded": self.conceded, "form": self.outcome}[name]
+
+    def _prefix(self, start):
+        # prefix sums from entry start onward; integer goals keep the float64 sums exact
+        for name in STATS:
+            cum = self.cum[name]
+            np.cumsum(self._values(name)[start:], out=cum[start + 1:])
+            cum[start + 1:] += cum[start]
+
+    def insert(self, keys, match_ids, scored, conceded):
+        """
+        Run with sorted entries merged in; they must have larger match ids than every entry here.
+        """
+        at = np.searchsorted(self.keys, keys, side="right")
+        return _Run(np.insert(self.keys, at, keys), np.insert(self.match_ids, at, match_ids),
+                    np.insert(self.scored, at, scored), np.insert(self.conceded, at, conceded))
+
+    def find(self, keys, match_ids):
+        """
+        Positions of the entries with the given (key, match id), -1 where there is none.
+        """
+        start = np.searchsorted(self.keys, keys, side="left")
+        end = np.searchsorted(self.keys, keys, side="right")
+        found = np.full(len(keys), -1, dtype=np.int64)
+        for offset in range(int((end - start).max(initial=0))):
+            at = start + offset
+            hit = (at < end) & (self.match_ids[np.minimum(at, len(self.keys) - 1)] == match_ids)
+            found[hit] = at[hit]
+        return found
+
+    def patch(self, positions, scored, conceded):
+        """
+        Set the goals of the entries at positions and update the prefix sums from the first one on.
+        """
+        self.scored[positions] = scored
+        self.conceded[positions] = conceded
+        self.outcome[positions] = np.sign(scored - conceded)
+        self._prefix(int(positions.min()))
+
+    def positions(self, team_ids, q, inclusive, before_ids):
+        """
+        (start of each team's entries, end of the entries before q) for query keys q.
+        """
+        team_start = np.searchsorted(self.keys, team_ids << 32, side="left")
+        pos = np.searchsorted(self.keys, q, side="right" if inclusive else "left")
+        if before_ids is not None and not inclusive and len(self.keys):
+            # same-day entries of the team are contiguous (usually at most one): count smaller ids
+            day_end = np.searchsorted(self.keys, q, side="right")
+            start = pos.copy()
+            for offset in range(int((day_end - start).max(initial=0))):
+                at = start + offset
+                inside = at < day_end
+                pos += inside & (self.match_ids[np.minimum(at, len(self.keys) - 1)] < before_ids)
+        return team_start, pos
+
+    def window_sums(self, name, end, count):
+        return self.cum[name][end] - self.cum[name][end - count]
+
+
+def _before(key_a, id_a, key_b, id_b):
+    return (key_a < key_b) | ((key_a == key_b) & (id_a < id_b))
+
+
+def _main_share(main, delta, main_end, delta_end, main_count, delta_count, n):
+    """
+    How many of the last n entries (in (key, match id) order) of the union of a team's main entries
+    before main_end and delta entries before delta_end come from the main run: the smallest k such
+    that the largest main entry left out sorts before the smallest delta entry taken. Vectorized
+    binary search, O(log n) passes.
+    """
+    lo = np.maximum(0, n - delta_count)
+    hi = np.minimum(n, main_count)
+    while True:
+        active = lo < hi
+        if not active.any():
+            return lo
+        mid = (lo + hi) // 2
+        m = np.where(active, main_end - mid - 1, 0)
+        d = np.where(active, delta_end - (n - mid), 0)
+        fits = _before(main.keys[m], main.match_ids[m], delta.keys[d], delta.match_ids[d])
+        hi = np.where(active & fits, mid, hi)
+        lo = np.where(active & ~fits, mid + 1, lo)
+
+
+class TeamIndex:
+    def __init__(self):
+        self.main = _Run(*_empty())
+        self.delta = _Run(*_empty())  # entries added since the last merge, ids above every main id
+        self.pending = np.zeros(0, dtype=np.int64)  # sorted ids of matches indexed without a score
+        self.last_id = 0  # high-water mark
+
+    def __len__(self):
+        return len(self.main) + len(self.delta)
+
+    # ---- building / updating ------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, df):
+        index = cls()
+        index.update(df)
+        return index
+
+    @classmethod
+    def build_from_db(cls):
+        from src.data_loader import load_matches_from_db
+
+        return cls.from_frame(load_matches_from_db())
+
+    def update(self, df_new, resolved=None):
+        """
+        Merge matches into the index.
+        df_new: loader-shaped frame of matches not indexed yet (id, date, home_team_id, away_team_id,
+                home_score, away_score; -1 / NaN for unknown scores)
+        resolved: optional frame (id, date, home_team_id, away_team_id, home_score, away_score) of
+                  pending matches that got a score
+        New entries go into the small delta run; it is merged into the main run once it holds
+        TEAM_INDEX_DELTA_MAX entries, so an update costs O(delta), not O(index size).
+        Returns the number of entries added or changed.
+        """
+        changed = 0
+        if resolved is not None and len(resolved):
+            changed += self._resolve(resolved)
+        if df_new is not None and len(df_new):
+            entries = _long_entries(df_new)
+            if not len(self.main) or len(self.delta) + len(entries[0]) > TEAM_INDEX_DELTA_MAX:
+                self.merge()
+                self.main = self.main.insert(*entries)
+            else:
+                self.delta = self.delta.insert(*entries)
+            ids = df_new["id"].to_numpy(dtype=np.int64)
+            unscored = (df_new["home_score"].fillna(MISSING_SCORE).to_numpy() == MISSING_SCORE) | \
+                       (df_new["away_score"].fillna(MISSING_SCORE).to_numpy() == MISSING_SCORE)
+            self.pending = np.union1d(self.pending, ids[unscored])
+            self.last_id = max(self.last_id, int(ids.max()))
+            changed += len(entries[0])
+        return changed
+
+    def merge(self):
+        """
+        Fold the delta run into the main run.
+        """
+        if len(self.delta):
+            d = self.delta
+            self.main = self.main.insert(d.keys, d.match_ids, d.scored, d.conceded)
+            self.delta = _Run(*_empty())
+
+    def _resolve(self, resolved):
+        missing = [c for c in ("date", "home_team_id", "away_team_id") if c not in resolved]
+        if missing:
+            raise ValueError(f"resolved needs {missing} to find the two entries of a match")
+        ids = resolved["id"].to_numpy(dtype=np.int64)
+        days = _days(resolved["date"])
+        hs = resolved["home_score"].to_numpy(dtype=np.int64)
+        aa = resolved["away_score"].to_numpy(dtype=np.int64)
+        keys = np.concatenate([_keys(resolved["home_team_id"], days), _keys(resolved["away_team_id"], days)])
+        match_ids = np.concatenate([ids, ids])
+        scored = np.concatenate([hs, aa])
+        conceded = np.concatenate([aa, hs])
+        changed = 0
+        for run in (self.main, self.delta):
+            at = run.find(keys, match_ids)
+            hit = at >= 0
+            if hit.any():
+                run.patch(at[hit], scored[hit], conceded[hit])
+                changed += int(hit.sum())
+        self.pending = np.setdiff1d(self.pending, ids)
+        return changed
+
+    def update_from_db(self, session=None):
+        """
+        Fold in rows inserted past the high-water mark and pending matches that got their score.
+        Returns the number of entries added or changed.
+        """
+        from src.data_loader import load_matches_from_db
+
+        if session is None:
+            with ReaderSession() as own:
+                return self.update_from_db(own)
+        resolved = []
+        pending = [int(i) for i in self.pending]
+        for start in range(0, len(pending), 500):
+            resolved.extend(session.execute(
+                select(Match.id, Match.date, Match.home_team_id, Match.away_team_id, Match.home_score,
+                       Match.away_score).where(
+                    Match.id.in_(pending[start:start + 500]),
+                    Match.home_score.is_not(None),
+                    Match.away_score.is_not(None),
+                )
+            ).all())
+        resolved = pd.DataFrame(resolved, columns=["id", "date", "home_team_id", "away_team_id", "home_score",
+                                                   "away_score"])
+        return self.update(load_matches_from_db(after_id=self.last_id), resolved)
+
+    # ---- queries ------------------------------------------------------------------
+
+    def lookup(self, team_ids, dates, last_n=5, inclusive=False, before_ids=None):
+        """
+        Rolling stats of many (team id, date) pairs in one call.
+        inclusive: also count matches played on the date itself (state at the end of that day);
+                   by default only matches before the date count (state at kickoff of the first match)
+        before_ids: optional match ids; matches on the same date count only if their id is smaller,
+                    which reproduces compute_recent_stats' pre-match features exactly
+        Returns dict: avg_scored / avg_conceded / form float arrays (NaN for teams without history)
+        and n, the number of matches in each window.
+        """
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        q = _keys(team_ids, _days(dates))
+        if before_ids is not None:
+            before_ids = np.asarray(before_ids, dtype=np.int64)
+        main_start, main_end = self.main.positions(team_ids, q, inclusive, before_ids)
+        delta_start, delta_end = self.delta.positions(team_ids, q, inclusive, before_ids)
+        main_count, delta_count = main_end - main_start, delta_end - delta_start
+        n = np.minimum(main_count + delta_count, last_n)
+        if len(self.delta):
+            k = _main_share(self.main, self.delta, main_end, delta_end, main_count, delta_count, n)
+        else:
+            k = n
+        out = {"n": n}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name in STATS:
+                sums = self.main.window_sums(name, main_end, k) + self.delta.window_sums(name, delta_end, n - k)
+                values = sums if name == "form" else sums / n
+                out[name] = np.where(n > 0, values, np.nan)
+        return out
+
+    def lookup_names(self, names, dates, last_n=5, inclusive=False):
+        """
+        lookup() keyed by team names; unknown teams get NaN stats.
+        """
+        ids = team_names.lookup(list(names))
+        out = self.lookup(np.maximum(ids, 0), dates, last_n=last_n, inclusive=inclusive)
+        unknown = ids < 0
+        out["n"] = np.where(unknown, 0, out["n"])
+        for name in STATS:
+            out[name] = np.where(unknown, np.nan, out[name])
+        return out
+
+    def as_of(self, team, date, last_n=5, inclusive=False):
+        """
+        Stats dict of one team (name) as of date, or None without history.
+        """
+        out = self.lookup_names([team], [date], last_n=last_n, inclusive=inclusive)
+        if out["n"][0] == 0:
+            return None
+        return {name: float(out[name][0]) for name in STATS}
+
+    # ---- persistence --------------------------------------------------------------
+
+    def save(self, path=TEAM_INDEX_PATH):
+        buf = io.BytesIO()
+        np.savez(buf, last_id=np.int64(self.last_id), pending=self.pending,
+                 cum_scored=self.main.cum["avg_scored"], cum_conceded=self.main.cum["avg_conceded"],
+                 cum_form=self.main.cum["form"],
+                 **{name: getattr(self.main, name) for name in _ARRAYS},
+                 **{f"delta_{name}": getattr(self.delta, name) for name in _ARRAYS})
+        atomic_write_bytes(path, buf.getvalue())
+
+    @classmethod
+    def load(cls, path=TEAM_INDEX_PATH):
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            cum = {"avg_scored": data["cum_scored"], "avg_conceded": data["cum_conceded"], "form": data["cum_form"]}
+            index.main = _Run(*[data[name] for name in _ARRAYS], cum=cum)
+            if "delta_keys" in data:
+                index.delta = _Run(*[data[f"delta_{name}"] for name in _ARRAYS])
+            index.pending = data["pending"]
+            index.last_id = int(data["last_id"])
+        return index
+
+
+def load_or_build(path=TEAM_INDEX_PATH):
+    """
+    Load the persisted index and bring it up to date, or build it from the DB. Returns (index, changed).
+    """
+    if os.path.exists(path):
+        index = TeamIndex.load(path)
+        changed = index.update_from_db()
+    else:
+        index = TeamIndex.build_from_db()
+        changed = len(index)
+    if changed:
+        index.save(path)
+    return index, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Point-in-time per-team stats index")
+    parser.add_argument("command", choices=["build", "update", "query"])
+    parser.add_argument("team", nargs="?")
+    parser.add_argument("date", nargs="?")
+    parser.add_argument("--last-n", type=int, default=5)
+    parser.add_argument("--path", default=TEAM_INDEX_PATH)
+    args = parser.parse_args()
+    if args.command == "build":
+        index = TeamIndex.build_from_db()
+        index.save(args.path)
+        print(f"[team_index] built index with {len(index)} entries (last id {index.last_id})")
+    elif args.command == "update":
+        index, changed = load_or_build(args.path)
+        print(f"[team_index] {changed} entries added or changed, {len(index)} entries")
+    else:
+        if not args.team or not args.date:
+            parser.error("query needs TEAM and DATE")
+        index = TeamIndex.load(args.path)
+        print(args.team, args.date, index.as_of(args.team, args.date, last_n=args.last_n))
+
+
+if __name__ == "__main__":
+    main()
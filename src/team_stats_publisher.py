@@ -0,0 +1,91 @@
+"""
+Publishes per-team deltas of the team_stats artifact instead of "file changed" pings.
+
+When the artifact changes, the publisher loads it once (server side), diffs it against the previous
+version and publishes a "team_stats" event with only the changed / removed teams and a version number
+that increases by one per delta. Clients apply deltas in order; on a version gap (missed events,
+server restart detected through the epoch) they fetch the snapshot endpoint and continue from its
+version. Bandwidth and client CPU then scale with the matches played, not the teams tracked.
+
+Event payload:
+  {"epoch": ..., "version": 42, "changed": {"Team A": {...}, ...}, "removed": ["Team B"]}
+Snapshot payload:
+  {"epoch": ..., "version": 42, "team_stats": {...}}
+"""
+import math
+import threading
+import time
+
+
+def _same_value(a, b):
+    if a == b:
+        return True
+    # NaN != NaN: a team without history would otherwise be re-sent on every refresh
+    return isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b)
+
+
+def same_stats(old, new):
+    """
+    True when two stats dicts hold the same values, NaN equal to NaN.
+    """
+    if old is None or old.keys() != new.keys():
+        return False
+    return all(_same_value(old[field], new[field]) for field in new)
+
+
+def diff_team_stats(old, new):
+    """
+    Returns (changed, removed): changed maps team -> new stats for teams that are new or whose stats
+    differ, removed lists teams no longer present.
+    """
+    changed = {team: stats for team, stats in new.items() if not same_stats(old.get(team), stats)}
+    removed = sorted(team for team in old if team not in new)
+    return changed, removed
+
+
+def load_team_stats_file(path):
+    import joblib
+
+    return joblib.load(path)
+
+
+class TeamStatsPublisher:
+    def __init__(self, path, hub, loader=load_team_stats_file):
+        self.path = path
+        self.hub = hub
+        self.loader = loader
+        # identifies this publisher's version sequence; changes when the server restarts
+        self.epoch = int(time.time() * 1000)
+        self.version = 0
+        self.team_stats = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Reload the artifact and publish the delta. Returns the published event, or None when
+        nothing changed or the artifact could not be read (e.g. caught mid-write).
+        """
+        try:
+            new = self.loader(self.path)
+        except Exception as e:
+            print("[team_stats_publisher] could not load", self.path, ":", e)
+            return None
+        with self._lock:
+            changed, removed = diff_team_stats(self.team_stats, new)
+            if not changed and not removed:
+                return None
+            self.version += 1
+            self.team_stats = new
+            payload = {
+                "epoch": self.epoch,
+                "version": self.version,
+                "changed": changed,
+                "removed": removed,
+                "timestamp": time.time(),
+            }
+            # publish under the lock so events leave in version order
+            return self.hub.publish(payload, event_type="team_stats")
+
+    def snapshot(self):
+        with self._lock:
+            return {"epoch": self.epoch, "version": self.version, "team_stats": self.team_stats}
@@ -0,0 +1,208 @@
+"""
+Versioned, memory-mappable binary format for the team_stats artifact.
+
+Instead of a pickled dict of dicts that every prediction worker has to unpickle, team_stats are stored
+as a NumPy structured array (one record per team) plus a sorted, fixed-width team-name index:
+
+  magic "FTSTATS\\0" | uint32 format version | uint32 header length | JSON header | padding
+  records: RECORD_DTYPE[count]      (sorted by team name)
+  names:   |S<name_width>[count]    (UTF-8, sorted, used for binary search)
+
+Workers open it with np.memmap read-only, so all processes on a host share the same page-cache pages
+without copies. Writers publish a new version with write-to-temp + rename (src/artifact_io.py);
+readers call reload_if_changed() to pick it up, while an open mapping keeps the old file alive.
+
+open_team_stats() also reads the legacy joblib dict for compatibility.
+"""
+import os
+import json
+import struct
+import datetime
+import numpy as np
+
+from src.artifact_io import atomic_write
+
+MAGIC = b"FTSTATS\0"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+RECORD_DTYPE = np.dtype([
+    ("avg_scored", "<f8"),
+    ("avg_conceded", "<f8"),
+    ("form", "<f8"),
+    ("last_n", "<i4"),  # number of matches in the team's window
+    ("as_of", "<M8[D]"),  # date of the team's latest match (NaT if unknown)
+])
+
+STAT_FIELDS = ("avg_scored", "avg_conceded", "form")
+
+
+def _aligned(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def build_records(team_stats, last_n=None, as_of=None):
+    """
+    Convert a team_stats dict into (names, records) sorted by name.
+    last_n / as_of: optional dicts team -> window size / latest match date.
+    """
+    names = sorted(team_stats)
+    records = np.zeros(len(names), dtype=RECORD_DTYPE)
+    for i, team in enumerate(names):
+        stats = team_stats[team]
+        for field in STAT_FIELDS:
+            records[field][i] = stats[field]
+    records["last_n"] = [(last_n or {}).get(t, 0) for t in names]
+    records["as_of"] = [np.datetime64((as_of or {}).get(t), "D") if (as_of or {}).get(t) else np.datetime64("NaT")
+                        for t in names]
+    return names, records
+
+
+def write_team_stats_array(path, names, records, meta=None):
+    """
+    Atomically write (names, records) to path. names must be sorted and aligned with records.
+    meta: optional JSON-serializable dict stored in the header (e.g. fallback means, last_n).
+    """
+    encoded = np.array([n.encode("utf-8") for n in names], dtype=bytes)
+    if len(encoded) and np.any(encoded[1:] < encoded[:-1]):
+        raise ValueError("team names must be sorted")
+    width = max(1, encoded.dtype.itemsize)
+    encoded = encoded.astype(f"S{width}")
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "count": len(names),
+        "name_width": width,
+        "record_dtype": RECORD_DTYPE.descr,
+        "written_at": datetime.datetime.utcnow().isoformat(),
+        "meta": meta or {},
+    }
+    # two passes so the header can contain its own offsets
+    header_bytes = b""
+    for _ in range(2):
+        records_offset = _aligned(len(MAGIC) + 8 + len(header_bytes))
+        names_offset = _aligned(records_offset + len(names) * RECORD_DTYPE.itemsize)
+        header.update(records_offset=records_offset, names_offset=names_offset)
+        header_bytes = json.dumps(header, sort_keys=True).encode()
+
+    def write(tmp):
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<II", FORMAT_VERSION, len(header_bytes)) + header_bytes)
+            f.write(b"\0" * (records_offset - f.tell()))
+            f.write(np.ascontiguousarray(records, dtype=RECORD_DTYPE).tobytes())
+            f.write(b"\0" * (names_offset - f.tell()))
+            f.write(encoded.tobytes())
+
+    atomic_write(path, write)
+
+
+def write_team_stats(path, team_stats, last_n=None, as_of=None, meta=None):
+    names, records = build_records(team_stats, last_n=last_n, as_of=as_of)
+    write_team_stats_array(path, names, records, meta=meta)
+
+
+def is_team_stats_array(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class TeamStatsArtifact:
+    """
+    Read-only view of a team_stats artifact. For the binary format, records and names are np.memmap
+    views of the file; for a legacy joblib file they are built in memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._stat = None
+        self._load()
+
+    def _load(self):
+        st = os.stat(self.path)
+        if is_team_stats_array(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(len(MAGIC))
+                version, header_len = struct.unpack("<II", f.read(8))
+                if version > FORMAT_VERSION:
+                    raise ValueError(f"{self.path}: unsupported team_stats format version {version}")
+                header = json.loads(f.read(header_len))
+            count = header["count"]
+            if count:
+                self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r",
+                                         offset=header["records_offset"], shape=(count,))
+                self.names = np.memmap(self.path, dtype=f"S{header['name_width']}", mode="r",
+                                       offset=header["names_offset"], shape=(count,))
+            else:
+                self.records = np.zeros(0, dtype=RECORD_DTYPE)
+                self.names = np.zeros(0, dtype="S1")
+            self.meta = header.get("meta", {})
+            self.format = "array"
+        else:
+            import joblib  # legacy format only
+
+            names, records = build_records(joblib.load(self.path))
+            self.records = records
+            self.names = np.array([n.encode("utf-8") for n in names], dtype=bytes)
+            self.meta = {}
+            self.format = "joblib"
+        self._stat = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def reload_if_changed(self):
+        """
+        Re-open the artifact if it was replaced since it was loaded. Returns True if reloaded.
+        """
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        if (st.st_ino, st.st_mtime_ns, st.st_size) == self._stat:
+            return False
+        self._load()
+        return True
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, team):
+        return self.index_of([team])[0] >= 0
+
+    def index_of(self, teams):
+        """
+        Vectorized lookup: array of record indices for team names, -1 for unknown teams.
+        """
+        keys = np.array([t.encode("utf-8") for t in teams], dtype=bytes)
+        if len(self.names) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        idx = np.searchsorted(self.names, keys)
+        idx = np.minimum(idx, len(self.names) - 1)
+        found = self.names[idx] == keys
+        return np.where(found, idx, -1).astype(np.int64)
+
+    def get(self, team, default=None):
+        i = self.index_of([team])[0]
+        if i < 0:
+            return default
+        rec = self.records[i]
+        return {field: float(rec[field]) for field in STAT_FIELDS}
+
+    def to_dict(self):
+        """
+        Materialize the legacy dict-of-dicts view.
+        """
+        names = [n.decode("utf-8") for n in np.asarray(self.names)]
+        records = np.asarray(self.records)
+        return {
+            name: {field: float(records[field][i]) for field in STAT_FIELDS}
+            for i, name in enumerate(names)
+        }
+
+
+def open_team_stats(path):
+    return TeamStatsArtifact(path)
+
+
+def load_team_stats(path):
+    """
+    team_stats dict from either format (binary array or legacy joblib).
+    """
+    return TeamStatsArtifact(path).to_dict()
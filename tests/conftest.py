@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+import pytest
+
+# the engines are created when src.db is first imported, so point them at a scratch DB before that
+_DB_DIR = tempfile.mkdtemp(prefix="matches-test-")
+os.environ["MATCHES_DATABASE_URL"] = f"sqlite:///{_DB_DIR}/matches.db"
+os.environ.pop("MATCHES_READ_DATABASE_URL", None)
+
+
+@pytest.fixture
+def db():
+    """
+    Empty, initialized test DB with cold name caches; every table is cleared afterwards.
+    """
+    from src.db import init_db, writer_engine
+    from src.models import Base
+    from src.interning import teams, leagues
+
+    init_db()
+    teams.invalidate()
+    leagues.invalidate()
+    yield writer_engine
+    with writer_engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    teams.invalidate()
+    leagues.invalidate()
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from test_features import synthetic_matches
+
+pytest.importorskip("pyarrow")
+
+from src.archive import archive_matches, compare_views, current_archive, verify_archive  # noqa: E402
+from src.data_loader import load_matches_from_db  # noqa: E402
+from src.db import WriterSession  # noqa: E402
+from src.import_csv_to_db import import_frame  # noqa: E402
+
+
+def fill_db(n=2400):
+    """
+    Three seasons of finished matches; the unplayed fixtures (NULL scores) are the most recent ones.
+    """
+    df = synthetic_matches(n=n, seed=11)
+    scores = df[["home_score", "away_score"]].fillna(1.0)
+    df[["home_score", "away_score"]] = scores.where(scores >= 0).astype("Int64")
+    df["date"] = df["date"].dt.date
+    with WriterSession() as session:
+        import_frame(session, df)
+        session.commit()
+
+
+def test_archived_db_loads_like_the_db_alone(db, tmp_path):
+    fill_db()
+    before = load_matches_from_db()
+
+    first = archive_matches(keep_seasons=2, directory=str(tmp_path))  # runs compare_views before deleting
+    assert 0 < first.rows < len(before)
+    assert current_archive() is not None and verify_archive() == []
+    pd.testing.assert_frame_equal(load_matches_from_db(), before)
+
+    # a second generation is checked against the first one
+    second = archive_matches(keep_seasons=1)
+    assert second.generation == 2 and second.rows > first.rows
+    assert verify_archive() == []
+    pd.testing.assert_frame_equal(load_matches_from_db(), before)
+
+
+def test_compare_views_catches_missing_rows(db, tmp_path):
+    fill_db()
+    first = archive_matches(keep_seasons=2, directory=str(tmp_path))
+    compare_views(first, first)
+    with pytest.raises(AssertionError):
+        compare_views(None, first)  # the DB alone no longer has the archived seasons
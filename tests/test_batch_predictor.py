@@ -0,0 +1,110 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from src.batch_predictor import MicroBatcher, Snapshot, stats_mask
+
+
+def test_each_request_gets_the_context_that_scored_its_batch():
+    started, release = threading.Event(), threading.Event()
+    state = {"version": 1}
+
+    def predict(home, away):
+        version = state["version"]
+        if version == 1:
+            started.set()
+            release.wait(5)
+        return np.column_stack([home, away]), version
+
+    batcher = MicroBatcher(predict, max_wait_ms=0)
+    try:
+        first = batcher.submit([1], [2])
+        assert started.wait(5)
+        second = batcher.submit([3, 4], [5, 6])  # queued while batch 1 runs
+        state["version"] = 2  # a reload swaps the snapshot before the second batch runs
+        release.set()
+
+        rows, version = first.result(5)
+        assert rows.tolist() == [[1, 2]] and version == 1
+        rows, version = second.result(5)
+        assert rows.tolist() == [[3, 5], [4, 6]] and version == 2
+    finally:
+        batcher.stop()
+
+
+def test_coalesced_requests_get_their_own_rows():
+    release = threading.Event()
+    calls = []
+
+    def predict(home, away):
+        release.wait(5)
+        calls.append(len(home))
+        return np.column_stack([home, away]), len(calls)
+
+    batcher = MicroBatcher(predict, max_wait_ms=50)
+    try:
+        futures = [batcher.submit([i], [i + 100]) for i in range(5)]
+        release.set()
+        results = [f.result(5) for f in futures]
+    finally:
+        batcher.stop()
+    assert [rows.tolist() for rows, _ in results] == [[[i, i + 100]] for i in range(5)]
+    assert sum(calls) == 5
+
+
+class GoalsModel:
+    """
+    Stub model: "probabilities" are the home and away avg_scored features, so tests can see which
+    stats row scored each fixture.
+    """
+    classes_ = np.array([0, 1, 2])
+
+    def predict_proba(self, X):
+        return np.column_stack([X["home_avg_scored"], X["away_avg_scored"], np.zeros(len(X))])
+
+
+def make_snapshot(version, avg_scored, fallback=0.5):
+    """
+    Snapshot with stats for {DB team id: avg_scored}.
+    """
+    ids = np.array(sorted(avg_scored), dtype=np.int64)
+    stats = np.tile([fallback, 1.0, 0.0], (int(ids.max()) + 2, 1))
+    stats[ids, 0] = [avg_scored[i] for i in ids]
+    return Snapshot(model=GoalsModel(), stats=stats, fallback=stats[-1], team_ids={f"id{i}": int(i) for i in ids},
+                    has_stats=stats_mask(ids, len(stats) - 1), loaded_at=time.time(), version=version)
+
+
+@pytest.mark.parametrize("newer_scores", [True, False])
+def test_known_describes_the_snapshot_that_scored_the_batch(db, monkeypatch, newer_scores):
+    from app import prediction
+    from src.db import WriterSession
+    from src.interning import teams
+
+    with WriterSession() as session:
+        a, b, c = teams.ids_for(session, ["A", "B", "C"]).tolist()
+        session.commit()
+    old = make_snapshot(1, {a: 1.0, b: 2.0})
+    new = make_snapshot(2, {a: 1.0, b: 2.0, c: 3.0})  # C first appears in the newer snapshot
+    resolved_with, scored_with = (old, new) if newer_scores else (new, old)
+
+    def swap_then_predict(home, away):
+        prediction.predictor.snapshot = scored_with  # a reload lands between resolve and scoring
+        return prediction.predictor.predict_batch(home, away)
+
+    monkeypatch.setattr(prediction.predictor, "snapshot", resolved_with)
+    batcher = MicroBatcher(swap_then_predict, max_wait_ms=0)
+    monkeypatch.setattr(prediction, "batcher", batcher)
+    try:
+        resp = prediction.app.test_client().post("/predict", json={"fixtures": [["A", "C"], ["A", "B"], ["A", "X"]]})
+    finally:
+        batcher.stop()
+    body = resp.get_json()
+    assert resp.status_code == 200 and body["snapshot"] == scored_with.version
+    known = [p["known"] for p in body["predictions"]]
+    away_scored = [p["draw"] for p in body["predictions"]]
+    if newer_scores:
+        assert known == [True, True, False] and away_scored == [3.0, 2.0, 0.5]
+    else:
+        assert known == [False, True, False] and away_scored == [0.5, 2.0, 0.5]
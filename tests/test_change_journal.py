@@ -0,0 +1,85 @@
+import pandas as pd
+import pytest
+from sqlalchemy import select, func
+
+from src.change_journal import ChangeConsumer, compact, head, compacted_through
+from src.db import WriterSession, ReaderSession
+from src.import_csv_to_db import import_frame
+from src.models import MatchChange
+
+
+def insert_matches(n, start=0):
+    frame = pd.DataFrame({
+        "date": pd.date_range("2023-01-01", periods=n, freq="D").date,
+        "home_team": [f"H{i}" for i in range(start, start + n)],
+        "away_team": [f"A{i}" for i in range(start, start + n)],
+        "home_score": pd.array([1] * n, dtype="Int64"),
+        "away_score": pd.array([0] * n, dtype="Int64"),
+        "league": ["L"] * n,
+    })
+    with WriterSession() as session:
+        inserted = import_frame(session, frame)
+        session.commit()
+    return inserted
+
+
+def journal_head():
+    with ReaderSession() as session:
+        return head(session)
+
+
+def retained():
+    with ReaderSession() as session:
+        return session.execute(select(func.count()).select_from(MatchChange.__table__)).scalar()
+
+
+def test_poll_does_not_move_the_cursor_until_ack(db):
+    insert_matches(5)
+    consumer = ChangeConsumer("test", batch_size=3)
+    batch = consumer.poll()
+    assert [c.op for c in batch] == ["insert"] * 3
+    assert consumer.poll() == batch  # redelivered: nothing acknowledged yet
+    consumer.ack(batch[-1].seq)
+    assert [c.seq for c in consumer.poll()] == [batch[-1].seq + 1, batch[-1].seq + 2]
+    assert consumer.lag() == 2
+    consumer.ack(batch[0].seq)  # cursors never move backwards
+    assert consumer.cursor == batch[-1].seq
+    with pytest.raises(ValueError):
+        consumer.ack(journal_head() + 1)
+
+
+def test_batches_redeliver_a_batch_whose_processing_failed(db):
+    insert_matches(4)
+    base = journal_head() - 4
+    consumer = ChangeConsumer("test", batch_size=2)
+    with pytest.raises(RuntimeError):
+        for batch in consumer.batches():
+            raise RuntimeError("consumer crashed")
+    seen = [c.seq for batch in consumer.batches() for c in batch]
+    assert seen == [base + 1, base + 2, base + 3, base + 4]
+    assert consumer.lag() == 0
+
+
+def test_compaction_keeps_what_consumers_have_not_acknowledged(db):
+    insert_matches(6)
+    base = journal_head() - 6
+    fast, slow = ChangeConsumer("fast"), ChangeConsumer("slow")
+    fast.ack(base + 6)
+    slow.ack(base + 2)
+    assert compact() == 2
+    assert retained() == 4
+    late = ChangeConsumer("late")  # starts at the oldest retained entry
+    assert [c.seq for c in late.poll()] == [base + 3, base + 4, base + 5, base + 6]
+    for consumer in (fast, slow, late):
+        consumer.drop()
+
+
+def test_compaction_without_consumers_keeps_the_newest_entries(db):
+    insert_matches(10)
+    assert compact(retain=3) == 7
+    assert retained() == 3
+    assert compact(retain=3) == 0
+    insert_matches(2, start=10)
+    assert compact(retain=3) == 2
+    with ReaderSession() as session:
+        assert compacted_through(session) == head(session) - 3
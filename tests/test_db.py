@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.db import ReaderSession, WriterSession, reader_engine, writer_engine, set_meta, get_meta
+
+
+def test_reader_sessions_refuse_writes(db):
+    assert reader_engine is not writer_engine
+    with ReaderSession() as session:
+        with pytest.raises(OperationalError, match="readonly"):
+            set_meta(session, "reader_write", 1)
+            session.commit()
+    with ReaderSession() as session:
+        assert get_meta(session, "reader_write") is None
+
+
+def test_connections_use_wal(db):
+    for engine in (writer_engine, reader_engine):
+        with engine.connect() as conn:
+            assert conn.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+    with reader_engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA query_only").scalar() == 1
+
+
+def test_reader_reads_while_a_write_transaction_is_open(db):
+    with WriterSession() as session:
+        set_meta(session, "snapshot", "old")
+        session.commit()
+
+    writer = writer_engine.raw_connection()
+    try:
+        # EXCLUSIVE keeps readers out in rollback-journal mode; under WAL it only excludes writers
+        cursor = writer.cursor()
+        cursor.execute("BEGIN EXCLUSIVE")
+        cursor.execute("UPDATE meta SET value = 'new' WHERE key = 'snapshot'")
+        with reader_engine.connect() as conn:
+            timeout = conn.exec_driver_sql("PRAGMA busy_timeout").scalar()
+            conn.exec_driver_sql("PRAGMA busy_timeout=0")  # fail instead of waiting for the lock
+            try:
+                value = conn.exec_driver_sql("SELECT value FROM meta WHERE key = 'snapshot'").scalar()
+            finally:
+                conn.exec_driver_sql(f"PRAGMA busy_timeout={timeout}")
+        assert value == "old"
+        writer.commit()
+    finally:
+        writer.close()
+
+    with ReaderSession() as reader:
+        assert get_meta(reader, "snapshot") == "new"
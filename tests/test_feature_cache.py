@@ -0,0 +1,69 @@
+import fcntl
+
+import pandas as pd
+import pytest
+
+from src.db import WriterSession
+from src.data_loader import load_and_featurize_from_db
+from src.feature_cache import FeatureCache, _open_lock
+from src.import_csv_to_db import import_frame
+from test_features import synthetic_matches
+
+
+def insert(df):
+    with WriterSession() as session:
+        import_frame(session, df)
+        session.commit()
+
+
+@pytest.fixture
+def history(db):
+    df = synthetic_matches(n=400, seed=5)
+    df[["home_score", "away_score"]] = df[["home_score", "away_score"]].fillna(0)
+    df["date"] = df["date"].dt.date
+    return df
+
+
+def assert_same(cached, fresh):
+    X, y, meta, team_stats = cached
+    X_ref, y_ref, meta_ref, team_stats_ref = fresh
+    pd.testing.assert_frame_equal(X, X_ref)
+    assert y.tolist() == y_ref.tolist()
+    assert meta["home_team"].astype(str).tolist() == meta_ref["home_team"].astype(str).tolist()
+    assert team_stats == team_stats_ref
+
+
+def test_cache_is_opt_in(history, tmp_path, monkeypatch):
+    insert(history)
+    monkeypatch.setattr("src.feature_cache.FEATURE_CACHE_DIR", str(tmp_path))
+    load_and_featurize_from_db()
+    assert not any(tmp_path.iterdir())
+
+
+def test_hit_and_extend_match_the_uncached_path(history, tmp_path, monkeypatch):
+    insert(history.iloc[:300])
+    cache = FeatureCache(str(tmp_path))
+    evictions = []
+    monkeypatch.setattr(cache, "_evict", lambda keep=None: evictions.append(keep))
+
+    assert_same(cache.load(), load_and_featurize_from_db(cache=False))
+    assert cache.last_status == "rebuilt" and len(evictions) == 1
+    cache.load()
+    assert cache.last_status == "hit" and len(evictions) == 1
+
+    insert(history.iloc[300:])
+    assert_same(cache.load(), load_and_featurize_from_db(cache=False))
+    assert cache.last_status in ("extended", "tail") and len(evictions) == 2
+
+
+def test_eviction_skips_entries_in_use(history, tmp_path):
+    insert(history)
+    cache = FeatureCache(str(tmp_path), max_bytes=1)
+    cache.load("default")
+    default_dir = cache.key_dir("default", 5)
+
+    with _open_lock(default_dir, fcntl.LOCK_SH):
+        cache.load("multi_window")
+        assert cache.status()[0]["key"].startswith("default")
+    cache.load("multi_window", rebuild=True)
+    assert [e["key"].split("-")[0] for e in cache.status()] == ["multi_window"]
@@ -0,0 +1,43 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.feature_registry import compute_features, FEATURES
+from test_features import synthetic_matches
+
+
+def played(df):
+    df[["home_score", "away_score"]] = df[["home_score", "away_score"]].fillna(0).clip(lower=0)
+    return df
+
+
+def test_concurrent_passes_do_not_share_online_state():
+    small = played(synthetic_matches(n=200, seed=1))
+    large = played(synthetic_matches(n=3000, teams_per_league=30, seed=2))
+    expected = {id(df): compute_features(df, "extended")[0] for df in (small, large)}
+
+    results, errors = {}, []
+
+    def run(df, key):
+        try:
+            results[key] = compute_features(df, "extended")[0]
+        except Exception as e:  # an IndexError here means a pass read another pass's ratings
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(df, (id(df), i))) for i in range(4) for df in (small, large)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    for (df_id, _), features in results.items():
+        pd.testing.assert_frame_equal(features, expected[df_id])
+    assert not hasattr(FEATURES["elo"], "ratings")
+
+
+def test_elo_columns_start_at_the_initial_rating():
+    features, _, _ = compute_features(synthetic_matches(n=50), "extended")
+    assert features.loc[0, "home_elo"] == FEATURES["elo"].initial
+    assert np.isfinite(features["home_elo"]).all()
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.data_loader import load_matches_from_db
+from src.db import ReaderSession, WriterSession
+from src.feature_state import FeatureState
+from src.features import compute_recent_stats
+from src.import_csv_to_db import import_frame
+from src.live_fetcher import insert_matches_db
+from test_features import team_stats_frame
+
+
+def fixtures(rows):
+    """
+    (date, home, away, home score, away score) tuples -> matches frame; None scores are unknown.
+    """
+    df = pd.DataFrame(rows, columns=["date", "home_team", "away_team", "home_score", "away_score"])
+    df["date"] = pd.to_datetime(df["date"]).dt.date
+    for col in ("home_score", "away_score"):
+        df[col] = pd.array(df[col], dtype="Int64")
+    df["league"] = "L"
+    return df
+
+
+def import_rows(rows):
+    with WriterSession() as session:
+        import_frame(session, fixtures(rows))
+        session.commit()
+
+
+def bootstrapped(last_n):
+    state = FeatureState(last_n=last_n)
+    with ReaderSession() as session:
+        state.bootstrap(session)
+    return state
+
+
+def assert_matches_full_recompute(state):
+    df = load_matches_from_db()
+    _, team_stats = compute_recent_stats(df, last_n=state.last_n)
+    mean = float(df[["home_score", "away_score"]].to_numpy().mean())
+    pd.testing.assert_frame_equal(team_stats_frame(state.team_stats()), team_stats_frame(team_stats))
+    assert state.global_means() == pytest.approx((mean, mean))
+    assert state.n_finished == int(((df["home_score"] >= 0) & (df["away_score"] >= 0)).sum())
+
+    fresh = bootstrapped(state.last_n)
+    assert state.team_stats() == fresh.team_stats()
+    assert (state.n_matches, state.sum_scores, state.last_id) == (fresh.n_matches, fresh.sum_scores, fresh.last_id)
+    assert state.pending == fresh.pending
+
+
+def test_one_sided_score_is_not_counted_twice(db):
+    import_rows([("2024-05-01", "A", "B", 2, None)])
+    state = bootstrapped(5)
+    insert_matches_db(fixtures([("2024-05-01", "A", "B", 2, 1)]))
+    with ReaderSession() as session:
+        assert state.advance(session) == 1
+    assert state.global_means() == (1.5, 1.5)
+    assert not state.pending
+    assert_matches_full_recompute(state)
+
+
+@pytest.mark.parametrize("last_n", [2, 5])
+def test_advance_matches_bootstrap_and_compute_recent_stats(db, last_n):
+    rng = np.random.default_rng(5)
+    teams = [f"T{i}" for i in range(6)]
+    days = pd.date_range("2024-01-01", periods=40, freq="D")
+
+    def random_rows(dates, unknown=0.0):
+        rows = []
+        for day in dates:
+            home, away = rng.choice(teams, 2, replace=False)
+            hs, aa = (int(v) for v in rng.integers(0, 5, 2))
+            hs = None if rng.random() < unknown else hs
+            aa = None if rng.random() < unknown else aa
+            rows.append((day.date().isoformat(), home, away, hs, aa))
+        return rows
+
+    first = random_rows(days[:30], unknown=0.3)
+    import_rows(first)
+    state = bootstrapped(last_n)
+    assert state.pending
+    assert_matches_full_recompute(state)
+
+    # new rows, late rows dated before the teams' latest matches, one-sided and full score updates
+    unknown = [r for r in first if r[3] is None or r[4] is None]
+    updates = [(d, h, a, 3 if hs is None else hs, aa) for d, h, a, hs, aa in unknown[::2]]
+    updates += [(d, h, a, 1 if hs is None else hs, 0 if aa is None else aa) for d, h, a, hs, aa in unknown[1::2]]
+    late = [(days[i].date().isoformat(), "T0", "T5", 4, 4) for i in (3, 11)]
+    batch = random_rows(days[30:], unknown=0.2) + late + updates
+    insert_matches_db(fixtures(batch))
+    with ReaderSession() as session:
+        assert state.advance(session) > 0
+    assert_matches_full_recompute(state)
+
+    # settle everything that is still pending
+    rows = load_matches_from_db()
+    still = rows[(rows["home_score"] < 0) | (rows["away_score"] < 0)]
+    insert_matches_db(fixtures([
+        (d.date().isoformat(), h, a, 2, 2) for d, h, a in zip(still["date"], still["home_team"], still["away_team"])
+    ]))
+    with ReaderSession() as session:
+        state.advance(session)
+    assert not state.pending
+    assert_matches_full_recompute(state)
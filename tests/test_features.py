@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import parallel_features
+from src.features import compute_recent_stats, FEATURE_COLUMNS
+
+
+def synthetic_matches(n=600, teams_per_league=8, leagues=2, seed=7):
+    """
+    Matches inside separate leagues (independent team components for the parallel engine) with
+    same-day fixtures, a few NaN scores and unplayed fixtures (-1, as the DB loader returns them).
+    """
+    rng = np.random.default_rng(seed)
+    league = rng.integers(0, leagues, n)
+    home = rng.integers(0, teams_per_league, n)
+    away = (home + rng.integers(1, teams_per_league, n)) % teams_per_league
+    df = pd.DataFrame({
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(np.sort(rng.integers(0, n // 3, n)), unit="D"),
+        "home_team": [f"L{l}T{h}" for l, h in zip(league, home)],
+        "away_team": [f"L{l}T{a}" for l, a in zip(league, away)],
+        "home_score": rng.integers(0, 5, n).astype(float),
+        "away_score": rng.integers(0, 5, n).astype(float),
+        "league": [f"L{l}" for l in league],
+    })
+    nan_rows = rng.choice(n, 6, replace=False)
+    df.loc[nan_rows[:3], "home_score"] = np.nan
+    df.loc[nan_rows[3:], "away_score"] = np.nan
+    df.loc[n - 20:, ["home_score", "away_score"]] = -1.0
+    return df
+
+
+def team_stats_frame(team_stats):
+    return pd.DataFrame.from_dict(team_stats, orient="index").sort_index()
+
+
+@pytest.mark.parametrize("last_n", [1, 5])
+def test_engines_agree_with_nan_and_unplayed_scores(monkeypatch, last_n):
+    monkeypatch.setattr(parallel_features, "FEATURE_WORKERS", 2)
+    df = synthetic_matches()
+
+    loop, loop_stats = compute_recent_stats(df, last_n=last_n, engine="loop")
+    for engine in ("vectorized", "parallel"):
+        features, team_stats = compute_recent_stats(df, last_n=last_n, engine=engine)
+        pd.testing.assert_frame_equal(features[FEATURE_COLUMNS + ["target"]], loop[FEATURE_COLUMNS + ["target"]],
+                                      check_dtype=False)
+        pd.testing.assert_frame_equal(team_stats_frame(team_stats), team_stats_frame(loop_stats))
+
+
+def test_nan_score_only_affects_its_teams():
+    df = synthetic_matches(n=300, leagues=1)
+    df[["home_score", "away_score"]] = df[["home_score", "away_score"]].clip(lower=0).fillna(1.0)
+    df.loc[0, "home_score"] = np.nan
+    features, _ = compute_recent_stats(df, engine="vectorized")
+    teams = {df.loc[0, "home_team"], df.loc[0, "away_team"]}
+
+    later = features.iloc[50:]
+    others = later[~later["home_team"].isin(teams)]
+    assert len(others) and not others["home_avg_scored"].isna().any()
@@ -0,0 +1,59 @@
+import os
+import time
+
+import pytest
+
+from src.fake_football_api import FakeFootballAPI
+from src.fetch_client import FetchClient, ResponseCache, RateLimiter
+
+
+@pytest.fixture
+def api():
+    api = FakeFootballAPI(teams=6).start()
+    yield api
+    api.stop()
+
+
+def client_for(api, cache):
+    return FetchClient(api.url, cache=cache, rate_limiter=RateLimiter(rate_per_minute=0), max_workers=2)
+
+
+def test_not_modified_is_served_from_cache(api):
+    client = client_for(api, ResponseCache(None))
+    first = client.fetch_range("2024-05-01", "2024-05-02")
+    assert client.fetch_range("2024-05-01", "2024-05-02") == first
+    assert client.last_stats["not_modified"] == 2
+
+
+def test_not_modified_without_cached_body_refetches(api):
+    cache = ResponseCache(None)
+    client = client_for(api, cache)
+    params = {"dateFrom": "2024-05-01", "dateTo": "2024-05-01"}
+    body = client.get_json(params)
+    key = cache.key(api.url, params)
+    # validators survived, the body did not (e.g. a proxy answering the conditional request)
+    cache.put(key, {"etag": cache.get(key)["etag"], "last_modified": None, "params": params})
+
+    stats = {"downloaded": 0, "not_modified": 0, "retries": 0}
+    assert client.get_json(params, stats) == body
+    assert stats["downloaded"] == 1 and api.not_modified == 1
+
+
+def test_memory_entries_are_bounded_lru():
+    cache = ResponseCache(None, max_entries=2)
+    cache.put("a", {"body": 1})
+    cache.put("b", {"body": 2})
+    cache.get("a")
+    cache.put("c", {"body": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"body": 1} and cache.get("c") == {"body": 3}
+
+
+def test_prune_deletes_expired_files(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age_days=1)
+    cache.put("old", {"body": 1})
+    cache.put("new", {"body": 2})
+    stale = time.time() - 2 * 86400
+    os.utime(tmp_path / "old.json", (stale, stale))
+    assert cache.prune() == 1
+    assert cache.get("old") is None and cache.get("new") == {"body": 2}
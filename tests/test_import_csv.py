@@ -0,0 +1,42 @@
+import pandas as pd
+
+from src.import_csv_to_db import parse_chunk, import_csv_bulk
+
+CSV = """date,home_team,away_team,home_score,away_score,league
+2021-03-01,A,B,2,1,L
+2021-03-01,C,D,1.5,0,L
+2021-03-02,A,C,inf,0,L
+2021-03-02,B,D,x,0,L
+2021-03-03,,D,1,1,L
+not a date,A,D,1,1,L
+2021-03-04,B,C,,,L
+2021-03-05,D,A,3.0,0,L
+"""
+
+
+def test_parse_chunk_counts_non_integral_scores_as_invalid():
+    chunk = pd.read_csv(pd.io.common.StringIO(CSV), dtype=str, keep_default_na=False)
+    frame, invalid = parse_chunk(chunk)
+    assert invalid == 5
+    assert list(zip(frame["home_team"], frame["away_team"])) == [("A", "B"), ("B", "C"), ("D", "A")]
+    assert frame["home_score"].tolist() == [2, pd.NA, 3]
+
+
+def test_bulk_import_counts(db, tmp_path):
+    path = tmp_path / "matches.csv"
+    path.write_text(CSV)
+    assert import_csv_bulk(str(path), chunk_size=3) == {"inserted": 3, "skipped": 0, "archived": 0, "invalid": 5}
+    assert import_csv_bulk(str(path)) == {"inserted": 0, "skipped": 3, "archived": 0, "invalid": 5}
+
+
+def test_bulk_import_filters_archived_rows_once_per_chunk(db, tmp_path, monkeypatch):
+    from src import archive
+
+    calls = []
+    drop_archived = archive.drop_archived
+    monkeypatch.setattr(archive, "drop_archived", lambda session, frame: calls.append(len(frame))
+                        or drop_archived(session, frame))
+    path = tmp_path / "matches.csv"
+    path.write_text(CSV)
+    assert import_csv_bulk(str(path), chunk_size=4)["inserted"] == 3
+    assert len(calls) == 2
@@ -0,0 +1,30 @@
+from src.db import WriterSession
+from src.interning import teams
+
+
+def test_rolled_back_ids_are_not_cached(db):
+    with WriterSession() as session:
+        assert teams.ids_for(session, ["A", "B"]).tolist() == [1, 2]
+        session.rollback()
+
+    with WriterSession() as session:
+        cd = teams.ids_for(session, ["C", "D"]).tolist()
+        session.commit()
+    assert cd == [1, 2]  # SQLite hands the rolled-back ids out again
+
+    assert teams.lookup(["A", "B"]).tolist() == [-1, -1]
+    assert teams.names_for(cd).tolist() == ["C", "D"]
+    with WriterSession() as session:
+        ab = teams.ids_for(session, ["A", "B"]).tolist()
+        session.commit()
+    assert ab == [3, 4]
+    assert teams.lookup(["A", "B", "C", "D"]).tolist() == [3, 4, 1, 2]
+
+
+def test_uncommitted_ids_are_private_to_their_session(db):
+    with WriterSession() as writer:
+        ids = teams.ids_for(writer, ["E"]).tolist()
+        assert teams.ids_for(writer, ["E"]).tolist() == ids
+        assert teams.lookup(["E"]).tolist() == [-1]
+        writer.commit()
+    assert teams.lookup(["E"]).tolist() == ids
@@ -0,0 +1,93 @@
+import pandas as pd
+from sqlalchemy import event, select
+
+from src.change_journal import changes_after, head
+from src.db import ReaderSession, writer_engine
+from src.live_fetcher import insert_matches_db
+from src.models import Match
+
+
+def fetched(rows):
+    """
+    (date, home, away, home score, away score) tuples as live_fetcher.matches_to_frame returns them.
+    """
+    df = pd.DataFrame(rows, columns=["date", "home_team", "away_team", "home_score", "away_score"])
+    df["league"] = "L"
+    return df
+
+
+def scores():
+    with ReaderSession() as session:
+        rows = session.execute(select(Match.id, Match.home_score, Match.away_score).order_by(Match.id)).all()
+    return {mid: (hs, aa) for mid, hs, aa in rows}
+
+
+def journal_after(seq):
+    with ReaderSession() as session:
+        return [(c.op, c.match_id, c.home_score, c.away_score) for c in changes_after(session, seq)]
+
+
+def journal_head():
+    with ReaderSession() as session:
+        return head(session)
+
+
+FIXTURES = [
+    ("2024-05-01", "A", "B", 2, 1),
+    ("2024-05-01", "C", "D", None, None),
+    ("2024-05-02", "A", "C", 3, None),
+    ("2024-05-02", "B", "D", None, None),
+]
+
+
+def test_inserts_are_counted_and_journaled_and_duplicates_ignored(db):
+    start = journal_head()
+    # the same fixture twice in one fetch is inserted once (the last occurrence wins)
+    assert insert_matches_db(fetched(FIXTURES + [("2024-05-01", "A", "B", 2, 1)])) == {"inserted": 4, "updated": 0}
+    ids = scores()
+    assert sorted(ids.values(), key=str) == sorted([(2, 1), (None, None), (3, None), (None, None)], key=str)
+    assert journal_after(start) == [("insert", mid, hs, aa) for mid, (hs, aa) in ids.items()]
+
+    seq = journal_head()
+    assert insert_matches_db(fetched(FIXTURES)) == {"inserted": 0, "updated": 0}
+    assert scores() == ids
+    assert journal_after(seq) == []
+
+
+def test_only_unknown_scores_are_updated(db):
+    insert_matches_db(fetched(FIXTURES))
+    a_b, c_d, a_c, b_d = scores()
+    seq = journal_head()
+
+    counts = insert_matches_db(fetched([
+        ("2024-05-01", "A", "B", 0, 0),  # final scores are never overwritten
+        ("2024-05-01", "C", "D", 1, 1),  # NULL -> final
+        ("2024-05-02", "A", "C", 3, 2),  # one known side -> final
+        ("2024-05-02", "B", "D", 4, None),  # still incomplete: not an update
+    ]))
+    assert counts == {"inserted": 0, "updated": 2}
+    assert scores() == {a_b: (2, 1), c_d: (1, 1), a_c: (3, 2), b_d: (None, None)}
+    assert journal_after(seq) == [("update", c_d, 1, 1), ("update", a_c, 3, 2)]
+
+
+def test_update_skips_rows_resolved_after_they_were_read(db):
+    insert_matches_db(fetched(FIXTURES))
+    _, c_d, a_c, _ = scores()
+    seq = journal_head()
+
+    def resolve_first(conn, cursor, statement, parameters, context, executemany):
+        # another writer finalizes C - D between the key lookup and the UPDATE
+        if statement.startswith("UPDATE matches"):
+            conn.connection.dbapi_connection.execute(
+                "UPDATE matches SET home_score = 5, away_score = 5 WHERE id = ?", (c_d,))
+
+    event.listen(writer_engine, "before_cursor_execute", resolve_first)
+    try:
+        counts = insert_matches_db(fetched([("2024-05-01", "C", "D", 1, 1), ("2024-05-02", "A", "C", 3, 2)]))
+    finally:
+        event.remove(writer_engine, "before_cursor_execute", resolve_first)
+
+    assert counts == {"inserted": 0, "updated": 1}
+    assert scores()[c_d] == (5, 5) and scores()[a_c] == (3, 2)
+    # the guarded row is journaled again with the values it really has
+    assert journal_after(seq) == [("update", c_d, 5, 5), ("update", a_c, 3, 2)]
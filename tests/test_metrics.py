@@ -0,0 +1,72 @@
+import re
+import threading
+
+import pytest
+
+from src.metrics import Registry, export_snapshot, load_snapshots, render_prometheus
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)\{((?:[a-zA-Z_]\w*="(?:[^"\\]|\\.)*",?)*)\} (\S+)$')
+
+
+def test_spans_nest_per_thread_and_record_errors():
+    reg = Registry("test")
+    with reg.span("poll") as poll:
+        with reg.span("poll.fetch") as fetch:
+            fetch.rows = 10
+        with reg.span("poll.insert"):
+            # a span in another thread has its own stack: it is not a phase of this poll
+            thread = threading.Thread(target=lambda: reg.span("other").__enter__().__exit__(None, None, None))
+            thread.start()
+            thread.join()
+        with pytest.raises(ValueError):
+            with reg.span("poll.fetch"):
+                raise ValueError("boom")
+
+    assert list(poll.phases) == ["poll.fetch", "poll.insert"]
+    assert poll.phases["poll.fetch"] >= fetch.seconds
+    assert re.fullmatch(r"fetch \d+\.\d\ds, insert \d+\.\d\ds", poll.summary())
+    assert reg.spans["poll.fetch"]["count"] == 2 and reg.spans["poll.fetch"]["errors"] == 1
+    assert reg.spans["poll.fetch"]["rows_total"] == 10 and reg.spans["poll"]["count"] == 1
+    assert reg.spans["other"]["count"] == 1 and "other" not in poll.phases
+    assert reg._stack() == []
+
+
+def test_render_prometheus_merges_exported_snapshots(tmp_path):
+    updater = Registry("live_updater")
+    with updater.span("poll") as s:
+        s.rows = 5
+    updater.inc("matches_inserted", 3, source="live")
+    updater.inc("matches_inserted", 2, source="live")
+    export_snapshot(str(tmp_path), updater)
+    assert [p.name for p in tmp_path.iterdir()] == ["live_updater.json"]
+    assert load_snapshots(str(tmp_path))[0]["spans"]["poll"]["rows_total"] == 5
+
+    server = Registry("streaming")
+    with server.span("sse"):
+        pass
+    server.inc("requests", path='/a"b\\c')
+    text = render_prometheus(str(tmp_path), server)
+
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, metric, kind = line.split(" ")
+            assert metric not in types
+            types[metric] = kind
+        elif not line.startswith("# HELP "):
+            match = SAMPLE.match(line)
+            assert match, line
+            samples.append(match.groups())
+    values = {(name, labels): float(value) for name, labels, value in samples}
+
+    assert types["pipeline_span_seconds"] == "summary" and types["pipeline_matches_inserted_total"] == "counter"
+    assert values[("pipeline_span_seconds_count", 'process="live_updater",span="poll"')] == 1
+    assert values[("pipeline_span_seconds_count", 'process="streaming",span="sse"')] == 1
+    assert values[("pipeline_span_rows_total", 'process="live_updater",span="poll"')] == 5
+    assert values[("pipeline_matches_inserted_total", 'process="live_updater",source="live"')] == 5
+    assert values[("pipeline_requests_total", 'process="streaming",path="/a\\"b\\\\c"')] == 1
+    assert {labels for name, labels, _ in samples if name == "process_resident_memory_bytes"} == {
+        'process="streaming"', 'process="live_updater"'}
+    # every sample belongs to a declared metric family
+    for name, _, _ in samples:
+        assert any(name == m or name in (f"{m}_count", f"{m}_sum") for m in types), name
@@ -0,0 +1,84 @@
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from src import poll_planner
+from src.poll_planner import PollPlanner
+from src.db import WriterSession
+from src.import_csv_to_db import import_frame
+
+NOW = datetime(2024, 5, 10, 15, 30)
+TODAY = NOW.date()
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    for name, value in [("LIVE_POLL_MINUTES", 10), ("ADAPTIVE_LIVE_MINUTES", 2.0), ("ADAPTIVE_NEAR_MINUTES", 60.0),
+                        ("ADAPTIVE_IDLE_MAX_MINUTES", 360.0), ("ADAPTIVE_LOOKAHEAD_DAYS", 3),
+                        ("ADAPTIVE_STALE_DAYS", 2)]:
+        monkeypatch.setattr(poll_planner, name, value)
+
+
+def days(*offsets):
+    return [(TODAY + timedelta(days=i)).isoformat() for i in offsets]
+
+
+def test_live_fixtures_poll_their_days_at_the_live_interval():
+    planner = PollPlanner(path=None)
+    plan = planner.plan(now=NOW, pending={TODAY - timedelta(days=1): 2, TODAY: 3, TODAY + timedelta(days=4): 1})
+    assert plan.interval_seconds == 120 and plan.at == NOW + timedelta(minutes=2)
+    assert plan.days == days(-1, 0)
+    assert plan.pending == 6 and "5 unfinished fixtures" in plan.reason
+
+
+def test_upcoming_fixtures_wake_up_when_their_day_starts():
+    planner = PollPlanner(path=None)
+    in_three_days = TODAY + timedelta(days=3)
+    plan = planner.plan(now=NOW, pending={in_three_days: 4})
+    # capped by the idle maximum, the fixture day itself is always polled
+    assert plan.interval_seconds == 360 * 60
+    assert plan.days == days(0, 1, 2, 3)
+
+    far = TODAY + timedelta(days=20)
+    plan = planner.plan(now=NOW, pending={far: 1})
+    assert plan.days == days(0, 1, 2, 3) + [far.isoformat()]
+
+    # tomorrow: at most ADAPTIVE_NEAR_MINUTES ahead, to pick up schedule changes
+    plan = planner.plan(now=NOW, pending={TODAY + timedelta(days=1): 2})
+    assert plan.interval_seconds == 60 * 60 and plan.days == days(0, 1)
+    late = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=23, minutes=30)
+    assert planner.plan(now=late, pending={TODAY + timedelta(days=1): 2}).interval_seconds == 30 * 60
+    almost = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=23, minutes=59)
+    assert planner.plan(now=almost, pending={TODAY + timedelta(days=1): 2}).interval_seconds == 120
+
+
+def test_idle_backoff_grows_to_its_cap_and_resets():
+    planner = PollPlanner(path=None)
+    intervals = [planner.plan(now=NOW, pending={}).interval_seconds / 60 for _ in range(7)]
+    assert intervals == [10, 20, 40, 80, 160, 320, 360]
+    assert planner.next_plan.days == days(0, 1, 2, 3)
+
+    planner.plan(now=NOW, pending={TODAY: 1})
+    assert planner.plan(now=NOW, pending={}).interval_seconds == 10 * 60
+
+
+def test_plan_from_the_db_ignores_stale_fixtures(db, tmp_path):
+    rows = pd.DataFrame({
+        "date": [TODAY - timedelta(days=5), TODAY - timedelta(days=1), TODAY + timedelta(days=2), TODAY],
+        "home_team": ["A", "B", "C", "D"],
+        "away_team": ["E", "F", "G", "H"],
+        "home_score": pd.array([None, 1, None, 2], dtype="Int64"),
+        "away_score": pd.array([None, None, None, 0], dtype="Int64"),
+        "league": "L",
+    })
+    with WriterSession() as session:
+        import_frame(session, rows)
+        session.commit()
+
+    path = tmp_path / "poll_plan.json"
+    plan = PollPlanner(path=str(path)).plan(now=NOW)
+    assert plan.days == days(-1, 0) and plan.pending == 2 and plan.interval_seconds == 120
+    written = json.loads(path.read_text())
+    assert written["days"] == plan.days and written["at"] == plan.at.isoformat() + "Z"
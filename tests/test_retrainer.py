@@ -0,0 +1,98 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.retrainer import Retrainer, read_retrain_mark, RETRAIN_MARK_KEY
+from src.db import ReaderSession, get_meta
+
+
+class StubJob:
+    """
+    Stand-in for train_and_publish (src/model.py is not part of the tree): each call blocks until
+    released, then returns a row count or raises.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.started = threading.Semaphore(0)
+        self.release = threading.Semaphore(0)
+        self.fail = False
+
+    def __call__(self):
+        self.calls += 1
+        self.started.release()
+        assert self.release.acquire(timeout=5)
+        if self.fail:
+            raise RuntimeError("fit failed")
+        return 100
+
+
+def in_thread(retrainer):
+    # the job runs in a thread instead of a spawned process; everything else is unchanged
+    retrainer._executor = ThreadPoolExecutor(max_workers=1)
+    return retrainer
+
+
+def wait_idle(retrainer):
+    deadline = time.monotonic() + 5
+    while retrainer.running:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    with retrainer._lock:  # held by the done callback until the mark is stored
+        pass
+
+
+@pytest.fixture
+def job():
+    return StubJob()
+
+
+def test_baseline_is_persisted_and_survives_a_restart(db, job):
+    retrainer = Retrainer(threshold=10, job=job)
+    assert retrainer.maybe_retrain(50) == ("baseline", 0)
+    with ReaderSession() as session:
+        assert get_meta(session, RETRAIN_MARK_KEY) == "50"
+
+    restarted = Retrainer(threshold=10, job=job)
+    assert restarted.maybe_retrain(55) == ("skipped", 5)
+    assert job.calls == 0
+
+
+def test_triggers_while_running_coalesce_into_one_rerun(db, job):
+    retrainer = in_thread(Retrainer(threshold=10, job=job))
+    retrainer.maybe_retrain(50)
+
+    assert retrainer.maybe_retrain(60) == ("started", 10)
+    assert job.started.acquire(timeout=5)
+    assert retrainer.maybe_retrain(65) == ("skipped", 5)  # measured from the running job's mark
+    assert retrainer.maybe_retrain(75) == ("coalesced", 15)
+    assert retrainer.maybe_retrain(90) == ("coalesced", 30)
+    assert job.calls == 1
+
+    job.release.release()  # first job finishes: its mark is stored, one rerun starts for the latest
+    assert job.started.acquire(timeout=5)
+    assert read_retrain_mark() == 60 and job.calls == 2
+    job.release.release()
+    wait_idle(retrainer)
+    assert read_retrain_mark() == 90 and retrainer.mark == 90 and job.calls == 2
+    assert retrainer.maybe_retrain(95) == ("skipped", 5)
+    retrainer.shutdown(wait=True)
+
+
+def test_failed_retrain_keeps_the_mark(db, job):
+    retrainer = in_thread(Retrainer(threshold=10, job=job))
+    retrainer.maybe_retrain(50)
+    job.fail = True
+    assert retrainer.maybe_retrain(70)[0] == "started"
+    job.release.release()
+    wait_idle(retrainer)
+    assert read_retrain_mark() == 50
+
+    job.fail = False
+    assert retrainer.maybe_retrain(70) == ("started", 20)  # retried on the next poll
+    job.release.release()
+    wait_idle(retrainer)
+    assert read_retrain_mark() == 70
+    retrainer.shutdown(wait=True)
@@ -0,0 +1,102 @@
+import asyncio
+import time
+
+import pytest
+
+from app import streaming
+from src.broadcast_hub import BroadcastHub
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = BroadcastHub(buffer_size=3)
+    monkeypatch.setattr(streaming, "hub", hub)
+    return hub
+
+
+def test_ring_buffer_keeps_the_newest_events(hub):
+    for i in range(5):
+        hub.publish({"n": i})
+    events, complete = hub.events_after(2)
+    assert complete and [e.id for e in events] == [3, 4, 5]
+    assert hub.events_after(5) == ([], True)
+    assert not hub.events_after(1)[1]  # event 2 fell out of the buffer
+    assert not hub.events_after(9)[1]  # id from a previous server process
+
+
+def test_initial_messages_replay_or_reset(hub):
+    for i in range(5):
+        hub.publish({"n": i})
+
+    text, sent = streaming.initial_messages(None)
+    assert sent == 5 and "id:" not in text
+
+    text, sent = streaming.initial_messages(3)
+    assert sent == 5
+    assert "id: 4\n" in text and "id: 5\n" in text and "id: 3\n" not in text
+
+    text, sent = streaming.initial_messages(1)
+    assert sent == 5 and "event: reset" in text and "id: 5\n" in text
+
+
+async def _request(port, path, headers=""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: test\r\n{headers}\r\n".encode())
+    await writer.drain()
+    return reader, writer
+
+
+async def _read_until(reader, marker, timeout=5):
+    data = b""
+    while marker.encode() not in data:
+        data += await asyncio.wait_for(reader.read(4096), timeout)
+    return data.decode()
+
+
+def test_stream_replays_heartbeats_and_stays_live_during_slow_routes(hub, monkeypatch):
+    monkeypatch.setattr(streaming, "HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setitem(streaming.PLAIN_ROUTES, "/slow", lambda: (time.sleep(0.5), (200, "text/plain", "done"))[1])
+    hub.publish({"n": 1})
+    hub.publish({"n": 2})
+
+    async def scenario():
+        server = await asyncio.start_server(streaming.handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await _request(port, "/updates", "Last-Event-ID: 1\r\n")
+            text = await _read_until(reader, "id: 2\n")
+            assert "id: 1\n" not in text
+
+            # the slow route runs off the loop: heartbeats keep flowing while it is served
+            slow_reader, slow_writer = await _request(port, "/slow")
+            started = time.monotonic()
+            heartbeats = (await _read_until(reader, "heartbeat")).count("heartbeat")
+            while time.monotonic() - started < 0.3:
+                heartbeats += (await _read_until(reader, "heartbeat")).count("heartbeat")
+            assert heartbeats >= 3
+            assert (await slow_reader.read()).decode().endswith("done")
+
+            hub.publish({"n": 3})
+            assert '"n": 3' in await _read_until(reader, "id: 3\n")
+            for w in (writer, slow_writer):
+                w.close()
+
+    asyncio.run(scenario())
+
+
+def test_failing_route_answers_500(monkeypatch):
+    def broken():
+        raise ValueError("boom")
+
+    monkeypatch.setitem(streaming.PLAIN_ROUTES, "/broken", broken)
+
+    async def scenario():
+        server = await asyncio.start_server(streaming.handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            reader, writer = await _request(port, "/broken")
+            response = (await reader.read()).decode()
+            writer.close()
+        return response
+
+    assert asyncio.run(scenario()).startswith("HTTP/1.1 500 Internal Server Error\r\n")
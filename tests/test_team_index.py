@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import team_index
+from src.team_index import TeamIndex
+
+
+def matches(n, teams=10, seed=3):
+    rng = np.random.default_rng(seed)
+    home = rng.integers(1, teams + 1, n)
+    away = (home + rng.integers(1, teams, n) - 1) % teams + 1
+    return pd.DataFrame({
+        "id": np.arange(1, n + 1),
+        # ids are insertion order, dates are not: later batches backfill earlier days too
+        "date": pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 200, n), unit="D"),
+        "home_team_id": home,
+        "away_team_id": away,
+        "home_score": rng.integers(0, 5, n),
+        "away_score": rng.integers(0, 5, n),
+    })
+
+
+def brute_force(df, team, date, last_n):
+    played = df[((df["home_team_id"] == team) | (df["away_team_id"] == team)) & (df["date"] < date)]
+    played = played.sort_values(["date", "id"]).tail(last_n)
+    home = played["home_team_id"] == team
+    scored = np.where(home, played["home_score"], played["away_score"])
+    conceded = np.where(home, played["away_score"], played["home_score"])
+    if not len(played):
+        return np.nan, np.nan
+    return scored.mean(), np.sign(scored - conceded).sum()
+
+
+@pytest.mark.parametrize("delta_max", [0, 40, 10_000])
+def test_incremental_updates_match_a_fresh_build(monkeypatch, delta_max):
+    monkeypatch.setattr(team_index, "TEAM_INDEX_DELTA_MAX", delta_max)
+    df = matches(600)
+    final = df.copy()
+    unplayed = df["id"] % 7 == 0
+    df.loc[unplayed, ["home_score", "away_score"]] = -1
+
+    index = TeamIndex.from_frame(df.iloc[:300])
+    for start in range(300, 600, 25):
+        index.update(df.iloc[start:start + 25])
+    resolved = final[unplayed.to_numpy()]
+    index.update(None, resolved[["id", "date", "home_team_id", "away_team_id", "home_score", "away_score"]])
+    assert len(index.pending) == 0
+
+    reference = TeamIndex.from_frame(final)
+    rng = np.random.default_rng(0)
+    team_ids = rng.integers(1, 11, 500)
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 210, 500), unit="D")
+    before_ids = rng.integers(1, 601, 500)
+    for kwargs in ({}, {"inclusive": True}, {"before_ids": before_ids}):
+        got = index.lookup(team_ids, dates, last_n=5, **kwargs)
+        want = reference.lookup(team_ids, dates, last_n=5, **kwargs)
+        for name in ("n",) + team_index.STATS:
+            np.testing.assert_allclose(got[name], want[name], err_msg=name)
+
+    for team, date in zip(team_ids[:20], dates[:20]):
+        got = index.lookup([team], [date], last_n=5)
+        avg_scored, form = brute_force(final, team, date, 5)
+        np.testing.assert_allclose([got["avg_scored"][0], got["form"][0]], [avg_scored, form])
+
+
+def test_save_and_load_keep_the_delta(monkeypatch, tmp_path):
+    monkeypatch.setattr(team_index, "TEAM_INDEX_DELTA_MAX", 1000)
+    df = matches(200)
+    index = TeamIndex.from_frame(df.iloc[:150])
+    index.update(df.iloc[150:])
+    assert len(index.delta) == 100
+    path = str(tmp_path / "team_index.npz")
+    index.save(path)
+    loaded = TeamIndex.load(path)
+    assert len(loaded) == 400 and loaded.last_id == 200
+    dates = pd.to_datetime(["2022-03-01", "2022-07-30"])
+    for name, values in index.lookup([1, 2], dates).items():
+        np.testing.assert_allclose(loaded.lookup([1, 2], dates)[name], values)
@@ -0,0 +1,62 @@
+import json
+import math
+
+from app import streaming
+from src.broadcast_hub import BroadcastHub
+from src.team_stats_publisher import TeamStatsPublisher, diff_team_stats, same_stats
+from src.team_stats_store import write_team_stats, load_team_stats
+
+NAN = float("nan")
+
+
+def stats(scored, conceded=1.0, form=0.0):
+    return {"avg_scored": scored, "avg_conceded": conceded, "form": form}
+
+
+def test_nan_stats_are_not_reported_as_changed():
+    old = {"A": stats(NAN), "B": stats(1.0)}
+    assert diff_team_stats(old, {"A": stats(NAN), "B": stats(1.0)}) == ({}, [])
+    assert diff_team_stats(old, {"A": stats(2.0), "B": stats(1.0)}) == ({"A": stats(2.0)}, [])
+    changed, removed = diff_team_stats(old, {"A": stats(NAN, conceded=NAN)})
+    assert list(changed) == ["A"] and removed == ["B"]
+
+
+def test_refresh_sends_only_changed_teams_with_increasing_versions(tmp_path):
+    path = str(tmp_path / "team_stats.ftstats")
+    hub = BroadcastHub()
+    publisher = TeamStatsPublisher(path, hub, loader=load_team_stats)
+    team_stats = {"A": stats(1.0), "B": stats(NAN), "C": stats(2.0, form=3.0)}
+
+    write_team_stats(path, team_stats)
+    first = publisher.refresh()
+    assert first.data["version"] == 1 and sorted(first.data["changed"]) == ["A", "B", "C"]
+
+    write_team_stats(path, team_stats)  # rewritten, same values (NaN included)
+    assert publisher.refresh() is None and publisher.version == 1
+
+    team_stats["C"] = stats(2.5, form=1.0)
+    del team_stats["A"]
+    write_team_stats(path, team_stats)
+    second = publisher.refresh()
+    assert second.data["version"] == 2 and second.id > first.id
+    assert second.data["changed"] == {"C": stats(2.5, form=1.0)} and second.data["removed"] == ["A"]
+    assert second.data["epoch"] == first.data["epoch"]
+
+
+def test_snapshot_endpoint_matches_the_artifact(tmp_path, monkeypatch):
+    path = str(tmp_path / "team_stats.ftstats")
+    team_stats = {"A": stats(1.0), "B": stats(NAN), "Ç": stats(0.5, form=-2.0)}
+    write_team_stats(path, team_stats)
+    publisher = TeamStatsPublisher(path, BroadcastHub(), loader=load_team_stats)
+    publisher.refresh()
+    monkeypatch.setattr(streaming, "team_stats_publisher", publisher)
+    monkeypatch.setattr(streaming, "start_watcher", lambda: None)
+
+    status, content_type, body = streaming.team_stats_snapshot()
+    snapshot = json.loads(body)
+    assert status == 200 and content_type == "application/json"
+    assert snapshot["version"] == publisher.version == 1
+    artifact = load_team_stats(path)
+    assert snapshot["team_stats"].keys() == artifact.keys() == team_stats.keys()
+    assert all(same_stats(artifact[team], snapshot["team_stats"][team]) for team in artifact)
+    assert math.isnan(snapshot["team_stats"]["B"]["avg_scored"])
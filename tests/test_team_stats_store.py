@@ -0,0 +1,80 @@
+import datetime
+
+import joblib
+import numpy as np
+
+from src.team_stats_store import TeamStatsArtifact, load_team_stats, write_team_stats
+
+TEAM_STATS = {
+    "A": {"avg_scored": 1.0, "avg_conceded": 2.0, "form": -1.0},
+    "Ab": {"avg_scored": 1.5, "avg_conceded": 0.5, "form": 2.0},
+    "Borussia Mönchengladbach": {"avg_scored": 2.2, "avg_conceded": 1.4, "form": 3.0},
+    "Zürich": {"avg_scored": 0.4, "avg_conceded": 0.6, "form": 0.0},
+    "Ünion": {"avg_scored": 3.0, "avg_conceded": 0.0, "form": 5.0},
+    "東京": {"avg_scored": 1.2, "avg_conceded": 1.2, "form": 1.0},
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "team_stats.ftstats")
+    as_of = {"A": datetime.date(2024, 5, 1), "東京": datetime.date(2024, 4, 2)}
+    write_team_stats(path, TEAM_STATS, last_n={"A": 5, "Ab": 3}, as_of=as_of, meta={"fallback_scored": 1.3})
+
+    artifact = TeamStatsArtifact(path)
+    assert artifact.format == "array" and isinstance(artifact.records, np.memmap)
+    assert artifact.to_dict() == TEAM_STATS == load_team_stats(path)
+    assert artifact.meta == {"fallback_scored": 1.3}
+    records = {name: rec for name, rec in zip(sorted(TEAM_STATS), np.asarray(artifact.records))}
+    assert records["A"]["last_n"] == 5 and records["Ab"]["last_n"] == 3 and records["Zürich"]["last_n"] == 0
+    assert records["東京"]["as_of"] == np.datetime64("2024-04-02")
+    assert np.isnat(records["Ab"]["as_of"])
+
+
+def test_name_lookup(tmp_path):
+    path = str(tmp_path / "team_stats.ftstats")
+    write_team_stats(path, TEAM_STATS)
+    artifact = TeamStatsArtifact(path)
+
+    names = list(TEAM_STATS)
+    assert artifact.index_of(names).tolist() == [sorted(names).index(n) for n in names]
+    for name, stats in TEAM_STATS.items():
+        assert name in artifact and artifact.get(name) == stats
+    # prefixes, extensions, names sorting past the end and longer than the widest name
+    for name in ["", "a", "Zu", "Zürich FC", "東", "東京都", "￿", "x" * 100]:
+        assert name not in artifact and artifact.get(name, "missing") == "missing"
+    assert artifact.index_of([]).tolist() == []
+
+
+def test_empty_artifact(tmp_path):
+    path = str(tmp_path / "team_stats.ftstats")
+    write_team_stats(path, {})
+    artifact = TeamStatsArtifact(path)
+    assert len(artifact) == 0 and artifact.to_dict() == {} and "A" not in artifact
+
+
+def test_legacy_joblib_reader(tmp_path):
+    path = str(tmp_path / "team_stats.joblib")
+    joblib.dump(TEAM_STATS, path)
+    artifact = TeamStatsArtifact(path)
+    assert artifact.format == "joblib" and artifact.meta == {}
+    assert artifact.to_dict() == TEAM_STATS == load_team_stats(path)
+    assert artifact.get("Zürich") == TEAM_STATS["Zürich"] and "Zurich" not in artifact
+
+
+def test_atomic_replacement_keeps_open_mappings_valid(tmp_path):
+    path = str(tmp_path / "team_stats.ftstats")
+    write_team_stats(path, TEAM_STATS)
+    reader = TeamStatsArtifact(path)
+    old_records = reader.records
+    assert not reader.reload_if_changed()
+
+    updated = {name: dict(stats, form=stats["form"] + 10) for name, stats in TEAM_STATS.items()}
+    updated["New"] = {"avg_scored": 0.0, "avg_conceded": 0.0, "form": 0.0}
+    write_team_stats(path, updated)
+    assert [p.name for p in tmp_path.iterdir()] == ["team_stats.ftstats"]  # no temp file left behind
+
+    # the mapping still sees the file it opened, complete and unchanged
+    assert np.asarray(old_records)["form"].tolist() == [TEAM_STATS[n]["form"] for n in sorted(TEAM_STATS)]
+    assert reader.to_dict() == TEAM_STATS
+    assert reader.reload_if_changed()
+    assert reader.to_dict() == updated and "New" in reader